@@ -0,0 +1,168 @@
+"""
+Time the event service against a generated event store.
+
+    python -m benchmarks.run 1m --output results.json
+    python -m benchmarks.run 1m --compare results.json
+
+The first run for a tier generates its events with the pes_generate
+command into benchmarks/benchmark-<tier>.sqlite3; later runs reuse it.
+Each scenario (see benchmarks/scenarios.py) runs --repeat times through
+the Django test client, and the first (cold) run, the median and the
+fastest are reported along with the queries the first run made.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        'events', nargs='?', default='1m',
+        help='Events in the store: a tier (1m, 10m) or a count such as 250k.'
+    )
+    parser.add_argument(
+        '--database',
+        help='SQLite file to benchmark. Defaults to one per tier in benchmarks/.'
+    )
+    parser.add_argument('--seed', type=int, default=0, help='Seed for pes_generate.')
+    parser.add_argument(
+        '--repeat', type=int, default=5, help='Number of times each scenario runs.'
+    )
+    parser.add_argument(
+        '--scenario', action='append', dest='scenarios',
+        help='Run only the named scenario. May be given more than once.'
+    )
+    parser.add_argument('--output', help='File to write the results to as JSON.')
+    parser.add_argument(
+        '--compare', help='Results file from an earlier run to compare against.'
+    )
+    return parser.parse_args(argv)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=BENCHMARK_DIR, stderr=subprocess.DEVNULL
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_scenario(scenario, client, workload, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings = []
+    queries = None
+    for run in range(repeat):
+        if queries is None:
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                scenario(client, workload, run)
+                timings.append(time.perf_counter() - started)
+            queries = len(captured)
+        else:
+            started = time.perf_counter()
+            scenario(client, workload, run)
+            timings.append(time.perf_counter() - started)
+    return {
+        'cold_ms': round(timings[0] * 1000, 2),
+        'median_ms': round(statistics.median(timings) * 1000, 2),
+        'min_ms': round(min(timings) * 1000, 2),
+        'queries': queries,
+    }
+
+
+def compare(results, previous, stdout):
+    stdout.write('\nCompared with %s:\n' % (previous.get('commit') or 'the earlier run'))
+    for name, result in results['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before or not before.get('median_ms'):
+            stdout.write('  %-28s new\n' % name)
+            continue
+        change = (result['median_ms'] - before['median_ms']) / before['median_ms']
+        stdout.write('  %-28s %9.2f ms -> %9.2f ms  %+6.1f%%\n' % (
+            name, before['median_ms'], result['median_ms'], change * 100
+        ))
+
+
+def main(argv=None, stdout=sys.stdout):
+    args = parse_args(argv)
+    if args.repeat < 1:
+        sys.exit('--repeat must be at least 1.')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    os.environ['PES_BENCH_DB'] = args.database or os.path.join(
+        BENCHMARK_DIR, 'benchmark-%s.sqlite3' % args.events.lower()
+    )
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.test import Client
+    from premis_event_service.management.commands.pes_generate import parse_count
+    from premis_event_service.models import Event
+    from benchmarks.scenarios import SCENARIOS, Workload
+
+    scenarios = SCENARIOS
+    if args.scenarios:
+        names = {scenario.__name__: scenario for scenario in SCENARIOS}
+        unknown = set(args.scenarios) - set(names)
+        if unknown:
+            sys.exit('Unknown scenario: %s. Choose from: %s.' % (
+                ', '.join(sorted(unknown)), ', '.join(names)
+            ))
+        scenarios = [names[name] for name in args.scenarios]
+
+    call_command('migrate', verbosity=0)
+    if not Event.objects.exists():
+        stdout.write('Generating %d events into %s\n' % (
+            parse_count(args.events), os.environ['PES_BENCH_DB']
+        ))
+        generated = time.perf_counter()
+        with open(os.devnull, 'w') as devnull:
+            call_command('pes_generate', args.events, seed=args.seed, stdout=devnull)
+        stdout.write('Generated in %.0f seconds\n' % (time.perf_counter() - generated))
+
+    workload = Workload()
+    # The APP views build absolute URLs from the Host header.
+    client = Client(HTTP_HOST='testserver')
+    results = {
+        'commit': git_commit(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': os.path.basename(os.environ['PES_BENCH_DB']),
+        'events': workload.events,
+        'link_objects': workload.objects,
+        'repeat': args.repeat,
+        'scenarios': {},
+    }
+    for scenario in scenarios:
+        result = time_scenario(scenario, client, workload, args.repeat)
+        results['scenarios'][scenario.__name__] = result
+        stdout.write('%-28s cold %9.2f ms  median %9.2f ms  min %9.2f ms  %4d queries\n' % (
+            scenario.__name__, result['cold_ms'], result['median_ms'], result['min_ms'],
+            result['queries']
+        ))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+            output.write('\n')
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(results, json.load(previous), stdout)
+    return results
+
+
+if __name__ == '__main__':
+    main()
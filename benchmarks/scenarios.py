@@ -0,0 +1,220 @@
+"""
+The requests timed by the benchmark suite.
+
+Each scenario is a function taking the test client, the Workload describing
+the generated store and the number of the run, and making one or more
+requests. Scenarios run in the order they are listed, and the ones that add
+events run last so they don't change what the others read.
+"""
+from codalib.xsdatetime import xsDateTime_format
+from django.db.models import Max, Sum
+from django.urls import reverse
+from lxml import etree
+
+from premis_event_service.management.commands.pes_generate import (
+    ARK_TYPE, DEFAULT_AGENT, EventGenerator, generated_object_identifier
+)
+from premis_event_service.models import (Event, EventRollup, LinkObject,
+                                         normalize_object_identifier)
+from premis_event_service.views import EVENT_SEARCH_PER_PAGE
+
+ATOM_LINK = '{http://www.w3.org/2005/Atom}link'
+
+# Pages of the APP/event/ feed followed by the feed_crawl scenario.
+CRAWL_PAGES = 10
+# Entries in the feed POSTed by the ingest_feed scenario.
+INGEST_FEED_SIZE = 100
+# Events read by the export scenario.
+EXPORT_EVENTS = 10000
+
+ENTRY_XML = """<entry xmlns="http://www.w3.org/2005/Atom">
+  <title>{event.event_identifier}</title>
+  <id>{event.event_identifier}</id>
+  <updated>{event_date_time}</updated>
+  <content type="application/xml">
+    <premis:event xmlns:premis="info:lc/xmlns/premis-v2">
+      <premis:eventIdentifier>
+        <premis:eventIdentifierType>{event.event_identifier_type}</premis:eventIdentifierType>
+        <premis:eventIdentifierValue>{event.event_identifier}</premis:eventIdentifierValue>
+      </premis:eventIdentifier>
+      <premis:eventType>{event.event_type}</premis:eventType>
+      <premis:eventDateTime>{event_date_time}</premis:eventDateTime>
+      <premis:eventDetail>{event.event_detail}</premis:eventDetail>
+      <premis:eventOutcomeInformation>
+        <premis:eventOutcome>{event.event_outcome}</premis:eventOutcome>
+      </premis:eventOutcomeInformation>
+      <premis:linkingAgentIdentifier>
+        <premis:linkingAgentIdentifierType>{event.linking_agent_identifier_type}</premis:linkingAgentIdentifierType>
+        <premis:linkingAgentIdentifierValue>{event.linking_agent_identifier_value}</premis:linkingAgentIdentifierValue>
+      </premis:linkingAgentIdentifier>
+      {linking_objects}
+    </premis:event>
+  </content>
+</entry>"""  # noqa: E501
+
+LINKING_OBJECT_XML = """<premis:linkingObjectIdentifier>
+        <premis:linkingObjectIdentifierType>{object_type}</premis:linkingObjectIdentifierType>
+        <premis:linkingObjectIdentifierValue>{object_identifier}</premis:linkingObjectIdentifierValue>
+      </premis:linkingObjectIdentifier>"""  # noqa: E501
+
+
+class Workload(object):
+    """What the scenarios need to know about the generated store."""
+
+    def __init__(self):
+        self.events = Event.objects.count()
+        self.objects = LinkObject.objects.count()
+        self.last_ordinal = Event.objects.aggregate(Max('ordinal'))['ordinal__max'] or 0
+        typeCounts = (
+            EventRollup.objects.values_list('event_type')
+            .annotate(total=Sum('count')).order_by('-total')
+        )
+        self.event_type, self.event_type_count = typeCounts.first() or ('', 0)
+        # Objects are numbered by popularity, so the first has the most events.
+        popular = generated_object_identifier(0)
+        if not LinkObject.objects.filter(pk=popular).exists():
+            popular = LinkObject.objects.values_list('pk', flat=True).first()
+        self.popular_object = popular
+        self.typical_object = (
+            LinkObject.objects.order_by('pk').values_list('pk', flat=True)
+            [self.objects // 2] if self.objects else None
+        )
+        # Unseeded, so ingested events never repeat the identifiers of
+        # generated ones or of those ingested by an earlier run.
+        self.generator = EventGenerator(
+            INGEST_FEED_SIZE * 1000, max(self.objects, 1), 1, [DEFAULT_AGENT]
+        )
+        self.ingested = 0
+
+    def deep_page(self, count, per_page):
+        """Return the page halfway through count events."""
+        return max(1, count // per_page // 2)
+
+    def entries_xml(self, size):
+        """Return Atom entries for size new events."""
+        events, eventLinks = self.generator.events(self.ingested, size)
+        self.ingested += size
+        linkingObjects = {}
+        for link in eventLinks:
+            linkingObjects.setdefault(link.event_id_id, []).append(LINKING_OBJECT_XML.format(
+                object_type=ARK_TYPE, object_identifier=link.linkobject_id_id
+            ))
+        return [
+            ENTRY_XML.format(
+                event=event,
+                event_date_time=xsDateTime_format(event.event_date_time),
+                linking_objects='\n'.join(linkingObjects[event.event_identifier]),
+            )
+            for event in events
+        ]
+
+
+def check(response):
+    if response.status_code >= 300:
+        raise AssertionError('%s returned %d' % (response.request['PATH_INFO'],
+                                                 response.status_code))
+    return response
+
+
+def consume(response):
+    check(response)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def html_search_shallow(client, workload, run):
+    check(client.get(reverse('event-search'), {'event_type': workload.event_type}))
+
+
+def html_search_deep(client, workload, run):
+    page = workload.deep_page(workload.event_type_count, EVENT_SEARCH_PER_PAGE)
+    check(client.get(reverse('event-search'),
+                     {'event_type': workload.event_type, 'page': page}))
+
+
+def html_search_unfiltered_deep(client, workload, run):
+    page = workload.deep_page(workload.events, EVENT_SEARCH_PER_PAGE)
+    check(client.get(reverse('event-search'), {'page': page}))
+
+
+def json_search_shallow(client, workload, run):
+    consume(client.get(reverse('event-search-json'), {'event_type': workload.event_type}))
+
+
+def json_search_deep(client, workload, run):
+    page = workload.deep_page(workload.event_type_count, EVENT_SEARCH_PER_PAGE)
+    consume(client.get(reverse('event-search-json'),
+                       {'event_type': workload.event_type, 'page': page}))
+
+
+def json_search_linked_object(client, workload, run):
+    consume(client.get(reverse('event-search-json'),
+                       {'linked_object_id': workload.popular_object}))
+
+
+def find_event_url(object_identifier):
+    # The bare form of the ARK, as the full form's slashes would be taken
+    # for the end of the identifier.
+    return reverse('find-event', args=[normalize_object_identifier(object_identifier)])
+
+
+def find_event_popular(client, workload, run):
+    check(client.get(find_event_url(workload.popular_object)))
+
+
+def find_event_typical(client, workload, run):
+    check(client.get(find_event_url(workload.typical_object)))
+
+
+def feed_page_deep(client, workload, run):
+    page = workload.deep_page(workload.events, EVENT_SEARCH_PER_PAGE)
+    check(client.get(reverse('app-event'), {'page': page}))
+
+
+def feed_crawl(client, workload, run):
+    """Follow the cursor feed's next links from the newest events."""
+    url = reverse('app-event') + '?cursor='
+    for _ in range(CRAWL_PAGES):
+        feed = etree.fromstring(check(client.get(url)).content)
+        url = next(
+            (link.get('href') for link in feed.iter(ATOM_LINK) if link.get('rel') == 'next'),
+            None
+        )
+        if url is None:
+            break
+
+
+def export(client, workload, run):
+    after = max(0, workload.last_ordinal - EXPORT_EVENTS)
+    consume(client.get(reverse('event-export-ndjson'), {'after': after}))
+
+
+def ingest_entry(client, workload, run):
+    check(client.post(reverse('app-event'), workload.entries_xml(1)[0],
+                      content_type='application/atom+xml'))
+
+
+def ingest_feed(client, workload, run):
+    feed = '<feed xmlns="http://www.w3.org/2005/Atom">%s</feed>' % ''.join(
+        workload.entries_xml(INGEST_FEED_SIZE)
+    )
+    check(client.post(reverse('app-event'), feed, content_type='application/atom+xml'))
+
+
+SCENARIOS = [
+    html_search_shallow,
+    html_search_deep,
+    html_search_unfiltered_deep,
+    json_search_shallow,
+    json_search_deep,
+    json_search_linked_object,
+    find_event_popular,
+    find_event_typical,
+    feed_page_deep,
+    feed_crawl,
+    export,
+    ingest_entry,
+    ingest_feed,
+]
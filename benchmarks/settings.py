@@ -0,0 +1,16 @@
+import os
+
+from tests.settings import *  # noqa: F401,F403
+from tests.settings import BASE_DIR
+
+# Timings shouldn't include the query log DEBUG keeps.
+DEBUG = False
+
+# Each tier of generated events gets its own database, so a store only has
+# to be generated once. benchmarks.run sets PES_BENCH_DB.
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('PES_BENCH_DB') or os.path.join(BASE_DIR, 'benchmark.sqlite3'),
+    }
+}
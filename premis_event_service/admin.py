@@ -19,6 +19,10 @@ class EventAdmin(admin.ModelAdmin):
         "linking_objects",
     )
 
+    def get_queryset(self, request):
+        # For link_objects_string, with one query for the whole page.
+        return super().get_queryset(request).prefetch_related('linking_objects')
+
 
 class AgentAdmin(admin.ModelAdmin):
     list_display = (
@@ -0,0 +1,121 @@
+"""
+Cache of serialized premis:event fragments.
+
+Events almost never change after ingest, so the XML built for them by
+objectToPremisEventXML is cached, keyed on the event identifier and
+event_added. Since event_added is bumped on every save, an updated event
+gets a new key; PUT and DELETE also drop the old entry explicitly.
+
+By default the fragments go in a size-bounded, least recently used cache
+local to the process. Set PES_EVENT_CACHE to the alias of a cache in
+CACHES to share them between processes, or to None to disable caching.
+"""
+import threading
+from urllib.parse import quote
+
+from lxml import etree
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from premis_event_service import settings
+from .metrics import count_cache_lookups
+from .presentation import objectToPremisEventXML, objectsToPremisEventXML
+
+LOCAL_CACHE = 'local'
+
+_local_cache = None
+_counters_lock = threading.Lock()
+_counters = {'hits': 0, 'misses': 0}
+
+
+def get_cache():
+    """Return the cache backend for event fragments, or None if disabled."""
+    global _local_cache
+    alias = settings.PES_EVENT_CACHE
+    if not alias:
+        return None
+    if alias != LOCAL_CACHE:
+        return caches[alias]
+    if _local_cache is None:
+        max_entries = settings.PES_EVENT_CACHE_MAX_ENTRIES
+        _local_cache = LocMemCache('premis_event_service.event_cache', {
+            'TIMEOUT': None,
+            # Culling max_entries // CULL_FREQUENCY entries at a time drops
+            # just the least recently used one.
+            'OPTIONS': {'MAX_ENTRIES': max_entries, 'CULL_FREQUENCY': max_entries},
+        })
+    return _local_cache
+
+
+def cache_key(eventObject):
+    return 'pes:event:%s:%s' % (
+        quote(eventObject.event_identifier, safe=''),
+        eventObject.event_added.isoformat(),
+    )
+
+
+def _count(hits, misses):
+    with _counters_lock:
+        _counters['hits'] += hits
+        _counters['misses'] += misses
+    count_cache_lookups(hits, misses)
+
+
+def stats():
+    """Return the hit and miss counts for this process."""
+    with _counters_lock:
+        return dict(_counters)
+
+
+def get_event_xml(eventObject, linkingObjects=None):
+    """
+    Event Django Object -> XML, from the cache when possible
+    """
+
+    cache = get_cache()
+    if cache is None:
+        return objectToPremisEventXML(eventObject, linkingObjects)
+    key = cache_key(eventObject)
+    fragment = cache.get(key)
+    if fragment is not None:
+        _count(1, 0)
+        return etree.fromstring(fragment)
+    _count(0, 1)
+    eventXML = objectToPremisEventXML(eventObject, linkingObjects)
+    cache.set(key, etree.tostring(eventXML))
+    return eventXML
+
+
+def get_events_xml(eventObjects):
+    """
+    List of Event Django Objects -> list of XML, from the cache when possible
+
+    The events that miss are serialized together, so their linking objects
+    are fetched with a single query.
+    """
+
+    eventObjects = list(eventObjects)
+    cache = get_cache()
+    if cache is None:
+        return objectsToPremisEventXML(eventObjects)
+    keys = [cache_key(e) for e in eventObjects]
+    fragments = cache.get_many(keys)
+    missed = [(k, e) for k, e in zip(keys, eventObjects) if k not in fragments]
+    _count(len(eventObjects) - len(missed), len(missed))
+    missedXML = dict(zip(
+        [k for k, _ in missed],
+        objectsToPremisEventXML([e for _, e in missed])
+    ))
+    if missedXML:
+        cache.set_many({k: etree.tostring(x) for k, x in missedXML.items()})
+    return [
+        missedXML[k] if k in missedXML else etree.fromstring(fragments[k])
+        for k in keys
+    ]
+
+
+def invalidate(eventObject):
+    """Drop the cached fragment for an event as it currently stands."""
+    cache = get_cache()
+    if cache is not None:
+        cache.delete(cache_key(eventObject))
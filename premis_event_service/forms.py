@@ -29,3 +29,16 @@ class EventSearchForm(forms.Form):
         widget=forms.TextInput(attrs={'placeholder': 'Linked Object ID', 'class': 'input-medium'}),
         max_length=64,
         required=False)
+
+
+class EventStatsForm(forms.Form):
+    event_outcome = forms.CharField(required=False)
+    event_type = forms.CharField(required=False)
+    start_date = forms.DateField(required=False)
+    end_date = forms.DateField(required=False)
+    bucket = forms.ChoiceField(
+        choices=[(b, b) for b in ('day', 'week', 'month', 'year')],
+        required=False)
+    group_by = forms.MultipleChoiceField(
+        choices=[(f, f) for f in ('event_type', 'event_outcome')],
+        required=False)
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.functions import TruncDate
+
+from premis_event_service.models import Event, EventRollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the daily event rollups behind event/stats.json from the "
+        "events, reading them in chunks of ordinals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=100000,
+            help='Range of ordinals rolled up per query.'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        # In one transaction, so a failure leaves the old rollups in place,
+        # and saves and deletes adjusting the rollups meanwhile wait on the
+        # rows it rewrites rather than being counted twice or lost. Events
+        # added after the last ordinal is read are rolled up as they are
+        # saved, so only those up to it need to be read.
+        with transaction.atomic():
+            EventRollup.objects.all().delete()
+            last = Event.objects.aggregate(Max('ordinal'))['ordinal__max'] or 0
+            start = 0
+            while start < last:
+                end = min(start + chunk_size, last)
+                rows = (
+                    Event.objects.filter(ordinal__gt=start, ordinal__lte=end)
+                    .annotate(day=TruncDate('event_date_time'))
+                    .values_list('day', 'event_type', 'event_outcome')
+                    .annotate(count=Count('ordinal'))
+                    .order_by()
+                )
+                EventRollup.objects.adjust(
+                    {(day, t, o): count for day, t, o, count in rows}
+                )
+                self.stdout.write('Rolled up events through ordinal %d of %d' % (end, last))
+                start = end
+        self.stdout.write('Done: %d rollups.' % EventRollup.objects.count())
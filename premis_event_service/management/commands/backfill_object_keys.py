@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from premis_event_service.models import LinkObject, normalize_object_identifier
+
+
+class Command(BaseCommand):
+    help = (
+        "Set the normalized lookup key of every linking object, e.g. after "
+        "upgrading or changing ARK_NAAN."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Number of linking objects updated per transaction.'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        last = ''
+        updated = 0
+        while True:
+            linkObjects = list(
+                LinkObject.objects.filter(object_identifier__gt=last)
+                .order_by('object_identifier')
+                .only('object_identifier', 'object_key')[:chunk_size]
+            )
+            if not linkObjects:
+                break
+            changed = []
+            for linkObject in linkObjects:
+                key = normalize_object_identifier(linkObject.object_identifier)
+                if linkObject.object_key != key:
+                    linkObject.object_key = key
+                    changed.append(linkObject)
+            with transaction.atomic():
+                LinkObject.objects.bulk_update(changed, ['object_key'])
+            updated += len(changed)
+            last = linkObjects[-1].object_identifier
+        self.stdout.write('Done: %d linking objects updated.' % updated)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from premis_event_service.models import EventLinkObject, LatestEvent
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the record of the latest event of each type for each "
+        "linking object, used by event/find/, from the stored events."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Number of event links read per query.'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        # Links added from here on are recorded as they are saved.
+        with transaction.atomic():
+            LatestEvent.objects.all().delete()
+            last = EventLinkObject.objects.aggregate(Max('pk'))['pk__max'] or 0
+        start = 0
+        while start < last:
+            end = min(start + chunk_size, last)
+            links = EventLinkObject.objects.filter(
+                pk__gt=start, pk__lte=end
+            ).order_by('pk').values_list(
+                'linkobject_id', 'event_id__event_type', 'event_id__event_date_time',
+                'event_id'
+            )
+            with transaction.atomic():
+                LatestEvent.objects.record(list(links))
+            self.stdout.write('Recorded event links through %d of %d' % (end, last))
+            start = end
+        self.stdout.write('Done: %d latest events.' % LatestEvent.objects.count())
@@ -0,0 +1,122 @@
+import time
+
+from lxml import etree
+from django.core.management.base import BaseCommand
+from django.db import InterfaceError, OperationalError
+
+from premis_event_service import settings, spool
+from premis_event_service.metrics import count_ingested
+from premis_event_service.presentation import (premisEventXMLListToObjects,
+                                               entryXMLToPremisEventXML,
+                                               DuplicateEventError)
+
+
+# Errors that say nothing about the entries, such as a lost connection,
+# after which the batch is retried rather than marked invalid.
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+
+def outcome(result):
+    """Return the (status, event identifier, message) of an entry's result."""
+    if isinstance(result, DuplicateEventError):
+        return (
+            spool.DUPLICATE, str(result),
+            "An event with id='{}' exists.".format(result)
+        )
+    if isinstance(result, Exception):
+        return (spool.INVALID, None, str(result))
+    return (spool.CREATED, result.event_identifier, None)
+
+
+class Command(BaseCommand):
+    help = (
+        "Save the event entries spooled by APP/event/ when PES_ASYNC_INGEST "
+        "is enabled, committing them in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.PES_INGEST_BATCH_SIZE,
+            help='Number of spooled entries saved per transaction.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Seconds to sleep when the spool is empty.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Drain the spool and exit instead of waiting for new entries.'
+        )
+        parser.add_argument(
+            '--claim-timeout', type=int, default=300,
+            help='Seconds after which entries claimed by a dead worker are retried.'
+        )
+        parser.add_argument(
+            '--retention', type=int, default=7 * 24 * 60 * 60,
+            help='Seconds to keep the status of finished entries.'
+        )
+
+    def handle(self, *args, **options):
+        ingest_spool = spool.get_spool()
+        ingest_spool.prune(options['retention'])
+        while True:
+            rows = ingest_spool.claim(
+                options['batch_size'], claim_timeout=options['claim_timeout']
+            )
+            if rows:
+                self.ingest(ingest_spool, rows)
+                continue
+            if options['once']:
+                break
+            ingest_spool.prune(options['retention'])
+            time.sleep(options['interval'])
+
+    def ingest(self, ingest_spool, rows):
+        outcomes = {}
+        batch = []
+        for row in rows:
+            try:
+                eventXML = entryXMLToPremisEventXML(etree.fromstring(row['body']))
+            except etree.LxmlError as e:
+                outcomes[row['id']] = (spool.INVALID, None, str(e))
+                continue
+            batch.append((row['id'], eventXML))
+        try:
+            results = premisEventXMLListToObjects([x for _, x in batch])
+        except TRANSIENT_ERRORS:
+            ingest_spool.release([row['id'] for row in rows])
+            raise
+        except Exception:
+            # An entry broke the batch; save them one at a time so only
+            # that entry fails rather than every entry queued behind it.
+            results = self.ingest_singly(ingest_spool, batch, outcomes)
+        for (spool_id, _), result in zip(batch, results):
+            outcomes[spool_id] = outcome(result)
+        ingest_spool.complete(
+            [(spool_id,) + outcome for spool_id, outcome in outcomes.items()]
+        )
+        created = sum(1 for o in outcomes.values() if o[0] == spool.CREATED)
+        duplicates = sum(1 for o in outcomes.values() if o[0] == spool.DUPLICATE)
+        count_ingested(created, duplicates, len(outcomes) - created - duplicates)
+        self.stdout.write(
+            'Ingested %d of %d spooled entries.' % (created, len(rows))
+        )
+
+    def ingest_singly(self, ingest_spool, batch, outcomes):
+        """Return the result of saving each entry of the batch on its own."""
+        results = []
+        for position, (spool_id, eventXML) in enumerate(batch):
+            try:
+                results.extend(premisEventXMLListToObjects([eventXML]))
+            except TRANSIENT_ERRORS:
+                # Record the entries saved so far and retry the rest later.
+                ingest_spool.complete([
+                    (saved_id,) + outcome(result)
+                    for (saved_id, _), result in zip(batch, results)
+                ] + [(bad_id,) + o for bad_id, o in outcomes.items()])
+                ingest_spool.release([entry_id for entry_id, _ in batch[position:]])
+                raise
+            except Exception as e:
+                self.stderr.write('Spooled entry %d could not be saved: %r' % (spool_id, e))
+                results.append(e)
+        return results
@@ -0,0 +1,172 @@
+import collections
+import os
+import re
+import time
+
+from lxml import etree
+from django.core.management.base import BaseCommand, CommandError
+
+from premis_event_service.presentation import (premisEventXMLListToObjects,
+                                               entryXMLToPremisEventXML,
+                                               DuplicateEventError)
+
+# The first start tag in the file, skipping the XML declaration, comments
+# and doctype.
+ROOT_START_TAG = re.compile(rb'<(?![?!/])[^>]*>')
+ENTRY_START_TAG = re.compile(rb'<(?:[\w.-]+:)?entry[\s>/]')
+HEAD_SIZE = 64 * 1024
+
+
+class RecordOffsetReader(object):
+    """
+    File wrapper that notes the byte offset just past each closing tag of
+    the record element as the parser reads through the file.
+
+    lxml doesn't report where in the input an element ends, so the offsets
+    are found by scanning the raw bytes for the record's closing tag. The
+    k-th offset belongs to the k-th record the parser hands back.
+    """
+
+    def __init__(self, fileobj, record_name, offset=0, prefix=b''):
+        self.fileobj = fileobj
+        self.pattern = re.compile(
+            rb'</(?:[\w.-]+:)?' + record_name.encode('ascii') + rb'\s*>'
+        )
+        self.offset = offset
+        self.prefix = prefix
+        self.tail = b''
+        self.ends = collections.deque()
+
+    def read(self, size=-1):
+        if self.prefix:
+            data, self.prefix = self.prefix, b''
+            return data
+        data = self.fileobj.read(size if size and size > 0 else HEAD_SIZE)
+        if data:
+            buf = self.tail + data
+            base = self.offset - len(self.tail)
+            for match in self.pattern.finditer(buf):
+                # Matches that end inside the tail were counted last read.
+                if match.end() > len(self.tail):
+                    self.ends.append(base + match.end())
+            self.offset += len(data)
+            self.tail = buf[-256:]
+        return data
+
+
+class Command(BaseCommand):
+    help = (
+        "Load PREMIS events from a (possibly very large) XML file of Atom "
+        "entries or premis:event elements, committing them in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='XML file to load.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of events saved per transaction.'
+        )
+        parser.add_argument(
+            '--offset', type=int, default=None,
+            help='Byte offset to resume from, as reported by a previous run.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording the resume offset after every batch. If it '
+                 'exists and --offset is not given, loading resumes from it.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        batch_size = options['batch_size']
+        checkpoint = options['checkpoint']
+        offset = options['offset']
+        if offset is None and checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as checkpoint_file:
+                offset = int(checkpoint_file.read().strip() or 0)
+        offset = offset or 0
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        with open(path, 'rb') as xml_file:
+            head = xml_file.read(HEAD_SIZE)
+            record_name = 'entry' if ENTRY_START_TAG.search(head) else 'event'
+            prefix = b''
+            if offset:
+                root_tag = ROOT_START_TAG.search(head)
+                if root_tag is None:
+                    raise CommandError('Unable to find the root element in %s.' % path)
+                # Re-open the root element so the namespace declarations on
+                # it still apply to the records after the offset.
+                prefix = root_tag.group(0)
+            xml_file.seek(offset)
+            reader = RecordOffsetReader(
+                xml_file, record_name, offset=offset, prefix=prefix
+            )
+            self.load(reader, record_name, batch_size, offset, checkpoint)
+
+    def load(self, reader, record_name, batch_size, offset, checkpoint):
+        counts = collections.Counter()
+        started = time.time()
+        batch = []
+        context = etree.iterparse(
+            reader, events=('end',), tag='{*}%s' % record_name,
+            huge_tree=True
+        )
+        try:
+            for _, element in context:
+                batch.append((element, reader.ends.popleft()))
+                if len(batch) >= batch_size:
+                    offset = self.save(batch, record_name, counts)
+                    self.report(counts, started, offset, checkpoint)
+                    batch = []
+        except etree.XMLSyntaxError as e:
+            # Everything before the error is still worth keeping.
+            if batch:
+                offset = self.save(batch, record_name, counts)
+                self.report(counts, started, offset, checkpoint)
+            raise CommandError('Stopped at offset %d: %s' % (offset, e))
+        if batch:
+            offset = self.save(batch, record_name, counts)
+            self.report(counts, started, offset, checkpoint)
+        self.stdout.write(
+            'Done: %d created, %d duplicate, %d invalid.' % (
+                counts['created'], counts['duplicate'], counts['invalid']
+            )
+        )
+
+    def save(self, batch, record_name, counts):
+        """Save a batch of record elements and return the resume offset."""
+        if record_name == 'entry':
+            eventXMLList = [entryXMLToPremisEventXML(e) for e, _ in batch]
+        else:
+            eventXMLList = [e for e, _ in batch]
+        for result in premisEventXMLListToObjects(eventXMLList):
+            if isinstance(result, DuplicateEventError):
+                counts['duplicate'] += 1
+            elif isinstance(result, Exception):
+                counts['invalid'] += 1
+            else:
+                counts['created'] += 1
+        for element, _ in batch:
+            # Free the saved records and anything before them so memory
+            # stays flat however large the file is.
+            element.clear()
+            parent = element.getparent()
+            while parent is not None and element.getprevious() is not None:
+                del parent[0]
+        return batch[-1][1]
+
+    def report(self, counts, started, offset, checkpoint):
+        if checkpoint:
+            with open(checkpoint, 'w') as checkpoint_file:
+                checkpoint_file.write('%d\n' % offset)
+        elapsed = time.time() - started
+        total = sum(counts.values())
+        self.stdout.write(
+            '%d events (%d created, %d duplicate, %d invalid), '
+            '%.0f events/sec, resume offset %d' % (
+                total, counts['created'], counts['duplicate'], counts['invalid'],
+                total / elapsed if elapsed else 0, offset
+            )
+        )
@@ -0,0 +1,86 @@
+import itertools
+import re
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from premis_event_service.forms import EventSearchForm
+from premis_event_service.models import Event, LinkObject
+from premis_event_service.settings import ARK_NAAN
+from premis_event_service.views import EVENT_SEARCH_PER_PAGE
+
+# What a full table (or index) scan and a sort the indexes don't cover look
+# like in each backend's EXPLAIN output.
+PLAN_FLAGS = {
+    'sqlite': (
+        # SCAN ... USING [COVERING] INDEX walks an index, not the table.
+        ('full scan', re.compile(r'\bSCAN\b(?!.*\bUSING (?:COVERING )?INDEX\b)')),
+        ('sort', re.compile(r'USE TEMP B-TREE FOR ORDER BY')),
+    ),
+    'postgresql': (
+        ('full scan', re.compile(r'\bSeq Scan\b')),
+        ('sort', re.compile(r'(?:^|->)\s*(?:Incremental )?Sort\s', re.MULTILINE)),
+    ),
+    'mysql': (
+        ('full scan', re.compile(r'\bALL\b')),
+        ('sort', re.compile(r'Using filesort')),
+    ),
+}
+
+
+def first_choice(choices):
+    return next((value for value, _ in choices if value), 'example')
+
+
+def sample_values():
+    """Return a value to search on for each field of EventSearchForm."""
+    fields = EventSearchForm.base_fields
+    linkObject = LinkObject.objects.only('object_identifier').first()
+    return {
+        'event_outcome': first_choice(fields['event_outcome'].choices),
+        'event_type': first_choice(fields['event_type'].choices),
+        'start_date': date.today() - timedelta(days=365),
+        'end_date': date.today(),
+        'linked_object_id': (linkObject.object_identifier if linkObject
+                             else 'ark:/%s/example' % ARK_NAAN),
+    }
+
+
+def search_shapes():
+    """Return every combination of EventSearchForm fields, smallest first."""
+    names = list(EventSearchForm.base_fields)
+    return [
+        shape for size in range(1, len(names) + 1)
+        for shape in itertools.combinations(names, size)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the query behind a page of event search results for every "
+        "combination of search fields, flagging full scans and sorts. Use "
+        "--verbosity 2 to print the plans."
+    )
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        vendor = connections[Event.objects.db].vendor
+        flags = PLAN_FLAGS.get(vendor)
+        if flags is None:
+            self.stdout.write('No plan checks for %s; plans are shown unflagged.' % vendor)
+            verbosity = max(verbosity, 2)
+        values = sample_values()
+        flagged = 0
+        shapes = search_shapes()
+        for shape in shapes:
+            events = Event.objects.search(**{name: values[name] for name in shape})
+            plan = events[:EVENT_SEARCH_PER_PAGE].explain()
+            found = [name for name, pattern in flags or () if pattern.search(plan)]
+            if found:
+                flagged += 1
+            self.stdout.write('%s: %s' % (', '.join(shape), ', '.join(found) or 'ok'))
+            if verbosity >= 2:
+                for line in plan.splitlines():
+                    self.stdout.write('    %s' % line)
+        self.stdout.write('%d of %d search shapes flagged.' % (flagged, len(shapes)))
@@ -0,0 +1,201 @@
+import random
+import re
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from premis_event_service.models import (Agent, Event, EventLinkObject, LinkObject,
+                                         normalize_object_identifier)
+from premis_event_service.settings import (ARK_NAAN, EVENT_TYPE_CHOICES,
+                                           EVENT_OUTCOME_CHOICES)
+
+TIERS = {'1m': 1000000, '10m': 10000000}
+COUNT_SUFFIXES = {'': 1, 'k': 1000, 'm': 1000000}
+
+UUID_TYPE = 'http://purl.org/net/untl/vocabularies/identifier-qualifiers/#UUID'
+URL_TYPE = 'http://purl.org/net/untl/vocabularies/identifier-qualifiers/#URL'
+ARK_TYPE = 'http://purl.org/net/untl/vocabularies/identifier-qualifiers/#ARK'
+DEFAULT_AGENT = 'http://example.com/agent/pesgenerate'
+
+# Each event type is this much less common than the one listed before it,
+# so the first (fixity checks, by default) makes up about half the events.
+TYPE_SKEW = 0.5
+# Likewise for outcomes, so about 97% of events have the first (success).
+OUTCOME_SKEW = 0.03
+# Objects are picked as objects * random() ** FANOUT_SKEW, so a few objects
+# have thousands of events and most have a handful.
+FANOUT_SKEW = 3
+# The share of events linked to a second object.
+MULTI_LINK_RATE = 0.05
+
+
+def parse_count(value):
+    """Return the number of events for a tier name or a count like 250k."""
+    value = value.strip().lower()
+    if value in TIERS:
+        return TIERS[value]
+    match = re.match(r'^(\d+)([km]?)$', value)
+    if match is None:
+        raise CommandError(
+            'Expected a tier (%s) or a count such as 50000 or 250k.' % ', '.join(TIERS)
+        )
+    return int(match.group(1)) * COUNT_SUFFIXES[match.group(2)]
+
+
+def skewed_weights(choices, skew):
+    return [skew ** position for position, _ in enumerate(choices)]
+
+
+def generated_object_identifier(number):
+    return 'ark:/%s/pesgen%09d' % (ARK_NAAN, number)
+
+
+class EventGenerator(object):
+    """
+    Builds unsaved events with their link objects, dated evenly (with some
+    jitter) from days ago to now in the order they are generated, so
+    ordinals rise with event dates as they do in a real store.
+    """
+
+    def __init__(self, total, objects, days, agents, seed=None):
+        self.random = random.Random(seed)
+        self.total = total
+        self.objects = objects
+        self.agents = agents
+        self.types = [value for value, _ in EVENT_TYPE_CHOICES if value]
+        self.outcomes = [value for value, _ in EVENT_OUTCOME_CHOICES if value]
+        self.type_weights = skewed_weights(self.types, TYPE_SKEW)
+        self.outcome_weights = skewed_weights(self.outcomes, OUTCOME_SKEW)
+        self.end = timezone.now()
+        self.span = timedelta(days=days)
+        self.start = self.end - self.span
+
+    def object_number(self):
+        return int(self.objects * self.random.random() ** FANOUT_SKEW)
+
+    def link_objects(self, start, size):
+        """Return unsaved LinkObjects for the given range of objects."""
+        linkObjects = []
+        for number in range(start, min(start + size, self.objects)):
+            identifier = generated_object_identifier(number)
+            linkObjects.append(LinkObject(
+                object_identifier=identifier,
+                object_type=ARK_TYPE,
+                object_role=None,
+                object_key=normalize_object_identifier(identifier),
+            ))
+        return linkObjects
+
+    def links(self):
+        """Return the identifiers of the objects an event is linked to."""
+        numbers = {self.object_number()}
+        if self.random.random() < MULTI_LINK_RATE:
+            numbers.add(self.object_number())
+        return [generated_object_identifier(number) for number in sorted(numbers)]
+
+    def event(self, position):
+        rand = self.random
+        eventDate = self.start + self.span * position / self.total
+        eventDate += timedelta(seconds=rand.randrange(3600))
+        return Event(
+            event_identifier=str(uuid.UUID(int=rand.getrandbits(128), version=4)),
+            event_identifier_type=UUID_TYPE,
+            event_type=rand.choices(self.types, self.type_weights)[0],
+            event_date_time=min(eventDate, self.end),
+            event_detail='Generated by pes_generate',
+            event_outcome=rand.choices(self.outcomes, self.outcome_weights)[0],
+            event_outcome_detail='',
+            linking_agent_identifier_type=URL_TYPE,
+            linking_agent_identifier_value=rand.choice(self.agents),
+            linking_agent_role='',
+        )
+
+    def events(self, start, size):
+        """Return unsaved Events and EventLinkObjects for a range of events."""
+        events = []
+        eventLinks = []
+        for position in range(start, min(start + size, self.total)):
+            event = self.event(position)
+            events.append(event)
+            for identifier in self.links():
+                eventLinks.append(EventLinkObject(
+                    event_id_id=event.event_identifier,
+                    linkobject_id_id=identifier,
+                ))
+        return events, eventLinks
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic events and link objects for "
+        "benchmarking, such as a 1m or 10m event tier. Event types, outcomes "
+        "and the number of events per object are skewed like a real store."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'events',
+            help='Number of events to generate: a tier (%s) or a count such '
+                 'as 50000 or 250k.' % ', '.join(TIERS)
+        )
+        parser.add_argument(
+            '--objects', type=int, default=None,
+            help='Number of link objects to spread the events over. '
+                 'Defaults to one for every ten events.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=3650,
+            help='Number of days, up to now, the event dates cover.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Number of events saved per transaction.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Seed for the random generator, to generate the same events '
+                 'again.'
+        )
+
+    def handle(self, *args, **options):
+        total = parse_count(options['events'])
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1.')
+        objects = options['objects'] or max(1, total // 10)
+        agents = sorted(Agent.objects.registry()) or [DEFAULT_AGENT]
+        generator = EventGenerator(
+            total, objects, options['days'], agents, seed=options['seed']
+        )
+        started = time.time()
+        for start in range(0, objects, batch_size):
+            LinkObject.objects.bulk_create(
+                generator.link_objects(start, batch_size), ignore_conflicts=True
+            )
+        self.stdout.write('%d link objects' % objects)
+        for start in range(0, total, batch_size):
+            events, eventLinks = generator.events(start, batch_size)
+            with transaction.atomic():
+                Event.objects.bulk_create(events)
+                EventLinkObject.objects.bulk_create(eventLinks)
+            done = start + len(events)
+            elapsed = time.time() - started
+            self.stdout.write('%d of %d events, %.0f events/sec' % (
+                done, total, done / elapsed if elapsed else 0
+            ))
+        # The rows were inserted without the signals and bookkeeping of a
+        # normal save, so rebuild what those would have maintained.
+        commandOptions = {'stdout': self.stdout, 'verbosity': options['verbosity']}
+        call_command('reconcile_event_counts', **commandOptions)
+        call_command('backfill_event_rollups', **commandOptions)
+        call_command('build_latest_events', **commandOptions)
+        self.stdout.write('Done: %d events generated in %.0f seconds.' % (
+            total, time.time() - started
+        ))
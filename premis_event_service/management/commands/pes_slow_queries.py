@@ -0,0 +1,87 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from premis_event_service.slow_queries import get_slow_query_log
+
+
+def milliseconds(seconds):
+    return '%.0f ms' % (seconds * 1000)
+
+
+class Command(BaseCommand):
+    help = (
+        "Browse the slow queries recorded by SlowQueryMiddleware: the "
+        "slowest query shapes by total time, the latest queries with "
+        "--recent, or one query and its plan with --show."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recent', type=int, metavar='COUNT',
+            help='List the latest COUNT slow queries instead of the summary.'
+        )
+        parser.add_argument(
+            '--show', type=int, metavar='ID',
+            help='Show a query with its parameters and plan.'
+        )
+        parser.add_argument(
+            '--view',
+            help='Only queries made by this view, such as find-event.'
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete the recorded queries.'
+        )
+
+    def handle(self, *args, **options):
+        log = get_slow_query_log()
+        if options['clear']:
+            self.stdout.write('Deleted %d slow queries.' % log.clear())
+        elif options['show'] is not None:
+            self.show(log, options['show'])
+        elif options['recent'] is not None:
+            self.recent(log, options['recent'], options['view'])
+        else:
+            self.summary(log, options['view'])
+
+    def summary(self, log, view):
+        groups = log.summary(view)
+        for group in groups:
+            self.stdout.write('%s: %dx, %s in total, slowest %s%s' % (
+                group['view'] or 'no view', group['count'],
+                milliseconds(group['total']), milliseconds(group['slowest']),
+                ', plan in #%d' % group['plan_id'] if group['plan_id'] else ''
+            ))
+            self.stdout.write('    %s' % group['fingerprint'][:300])
+        self.stdout.write('%d query shapes.' % len(groups))
+
+    def recent(self, log, count, view):
+        for query in log.recent(count, view):
+            self.stdout.write('#%d %s %s %s %s%s' % (
+                query['id'],
+                datetime.fromtimestamp(query['recorded']).isoformat(' ', 'seconds'),
+                milliseconds(query['duration']), query['view'] or 'no view',
+                query['path'] or '', ' (plan)' if query['plan'] else ''
+            ))
+            self.stdout.write('    %s' % query['fingerprint'][:300])
+
+    def show(self, log, query_id):
+        query = log.get(query_id)
+        if query is None:
+            raise CommandError('There is no slow query #%d.' % query_id)
+        self.stdout.write('#%d at %s took %s' % (
+            query['id'],
+            datetime.fromtimestamp(query['recorded']).isoformat(' ', 'seconds'),
+            milliseconds(query['duration'])
+        ))
+        self.stdout.write('%s %s (%s)' % (
+            query['method'] or '', query['path'] or '', query['view'] or 'no view'
+        ))
+        self.stdout.write(query['sql'])
+        if query['params']:
+            self.stdout.write('Parameters: %s' % query['params'])
+        if query['plan']:
+            self.stdout.write('Plan:')
+            for line in query['plan'].splitlines():
+                self.stdout.write('    %s' % line)
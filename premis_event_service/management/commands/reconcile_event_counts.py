@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from premis_event_service.models import Event, Counter, EVENT_COUNTER
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the events and correct the maintained event count, which "
+        "can drift if events are added or removed outside of Django."
+    )
+
+    def handle(self, *args, **options):
+        old, new = Counter.objects.reconcile(EVENT_COUNTER, Event.objects.all())
+        if old == new:
+            self.stdout.write('%s: %d (correct)' % (EVENT_COUNTER, new))
+        else:
+            self.stdout.write('%s: %d corrected to %d' % (EVENT_COUNTER, old, new))
@@ -0,0 +1,283 @@
+"""
+Service metrics in the Prometheus text format.
+
+With PES_METRICS_ENABLED, requests (counted by MetricsMiddleware, with
+their latency and database queries, per view), ingested events by result
+and event cache lookups are counted in each process. If PES_METRICS_PATH
+is set, every PES_METRICS_FLUSH_INTERVAL seconds a background thread adds
+the counts to a SQLite file there shared by all the worker processes on
+the host, so requests never wait on it. The metrics/ view reports the
+totals. With PES_METRICS_PATH set to None, each process reports only its
+own counts.
+"""
+import atexit
+import collections
+import logging
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from premis_event_service import settings
+from premis_event_service.timing import instrument_queries
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the request latency histogram's buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS = collections.OrderedDict([
+    ('pes_http_requests_total', (
+        'counter', 'Requests handled, by view, method and status.'
+    )),
+    ('pes_http_request_duration_seconds', (
+        'histogram', 'Time taken to handle requests, by view.'
+    )),
+    ('pes_db_queries_total', (
+        'counter', 'Database queries made while handling requests, by view.'
+    )),
+    ('pes_events_ingested_total', (
+        'counter', 'Events submitted for ingest, by result: created, duplicate or error.'
+    )),
+    ('pes_event_cache_lookups_total', (
+        'counter', 'Event cache lookups, by result: hit or miss.'
+    )),
+])
+
+LE_LABEL = re.compile(r'(?:^|,)le="([^"]*)"$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sample (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels)
+);
+"""
+
+
+def format_labels(*pairs):
+    """Return label pairs in the exposition format, such as a="1",b="2"."""
+    return ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+                     .replace('\n', '\\n'))
+        for name, value in pairs
+    )
+
+
+class MetricsStore(object):
+    """Sample totals of every process, kept in a SQLite file."""
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None))
+
+    def add(self, samples):
+        """Add a dict of (name, labels) -> value to the totals."""
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT INTO sample (name, labels, value) VALUES (?, ?, ?) '
+                    'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                    [(name, labels, value) for (name, labels), value in samples.items()]
+                )
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def samples(self):
+        with self._connect() as conn:
+            return {
+                (name, labels): value
+                for name, labels, value in conn.execute('SELECT name, labels, value FROM sample')
+            }
+
+
+class Metrics(object):
+    """The counts of one process, added to the store now and then."""
+
+    def __init__(self, path=None, flush_interval=10):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.store = None
+        if path:
+            try:
+                self.store = MetricsStore(path)
+            except sqlite3.Error:
+                # Counting must never fail a request, so keep the counts
+                # in memory instead.
+                logger.warning('Could not open the metrics store %s', path, exc_info=True)
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.flusher = None
+
+    def _add(self, samples):
+        with self.lock:
+            for key, value in samples:
+                self.pending[key] = self.pending.get(key, 0) + value
+            if self.store is not None and (self.flusher is None or not self.flusher.is_alive()):
+                # Started on first use, so each forked worker has its own.
+                self.flusher = threading.Thread(
+                    target=self._flush_periodically, name='pes-metrics-flush', daemon=True
+                )
+                self.flusher.start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def inc(self, name, labels='', value=1):
+        self._add([((name, labels), value)])
+
+    def observe(self, name, labels, value, buckets):
+        """Record a value in a histogram."""
+        prefix = labels + ',' if labels else ''
+        samples = [
+            ((name + '_bucket', prefix + format_labels(('le', le))), 1)
+            for le in buckets if value <= le
+        ]
+        samples.extend([
+            ((name + '_bucket', prefix + format_labels(('le', '+Inf'))), 1),
+            ((name + '_sum', labels), value),
+            ((name + '_count', labels), 1),
+        ])
+        self._add(samples)
+
+    def flush(self):
+        """
+        Add the counts made since the last flush to the store. If the store
+        can't be written the error is logged and the counts are kept for the
+        next flush.
+        """
+        if self.store is None:
+            return
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        try:
+            self.store.add(pending)
+        except sqlite3.Error:
+            logger.warning('Could not flush metrics to %s', self.path, exc_info=True)
+            with self.lock:
+                for key, value in pending.items():
+                    self.pending[key] = self.pending.get(key, 0) + value
+
+    def samples(self):
+        """Return the totals as a dict of (name, labels) -> value."""
+        with self.lock:
+            samples = dict(self.pending)
+        if self.store is not None:
+            for key, value in self.store.samples().items():
+                samples[key] = samples.get(key, 0) + value
+        return samples
+
+
+_metrics = None
+
+
+def get_metrics():
+    """Return the Metrics of this process, as configured by the settings."""
+    global _metrics
+    path = settings.PES_METRICS_PATH
+    if _metrics is None or _metrics.path != path:
+        if _metrics is not None:
+            _metrics.flush()
+        _metrics = Metrics(path, settings.PES_METRICS_FLUSH_INTERVAL)
+    return _metrics
+
+
+@atexit.register
+def _flush_at_exit():
+    if _metrics is not None:
+        _metrics.flush()
+
+
+def count_request(view, method, status, seconds, queries):
+    if not settings.PES_METRICS_ENABLED:
+        return
+    metrics = get_metrics()
+    labels = format_labels(('view', view))
+    metrics.inc('pes_http_requests_total', format_labels(
+        ('view', view), ('method', method), ('status', status)
+    ))
+    metrics.observe('pes_http_request_duration_seconds', labels, seconds, LATENCY_BUCKETS)
+    if queries:
+        metrics.inc('pes_db_queries_total', labels, queries)
+
+
+def count_ingested(created=0, duplicate=0, error=0):
+    if not settings.PES_METRICS_ENABLED:
+        return
+    metrics = get_metrics()
+    for result, count in (('created', created), ('duplicate', duplicate), ('error', error)):
+        if count:
+            metrics.inc('pes_events_ingested_total', format_labels(('result', result)), count)
+
+
+def count_cache_lookups(hits, misses):
+    if not settings.PES_METRICS_ENABLED:
+        return
+    metrics = get_metrics()
+    for result, count in (('hit', hits), ('miss', misses)):
+        if count:
+            metrics.inc('pes_event_cache_lookups_total', format_labels(('result', result)), count)
+
+
+def _sample_order(item):
+    (name, labels), _ = item
+    # Buckets in order of their upper bound rather than alphabetically.
+    match = LE_LABEL.search(labels)
+    if match is None:
+        return (name, labels, 0)
+    return (name, labels[:match.start()], float(match.group(1)))
+
+
+def exposition(samples):
+    """Return samples as a Prometheus text format document."""
+    lines = []
+    byName = collections.defaultdict(list)
+    for item in sorted(samples.items(), key=_sample_order):
+        byName[item[0][0]].append(item)
+    for name, (kind, description) in METRICS.items():
+        lines.append('# HELP %s %s' % (name, description))
+        lines.append('# TYPE %s %s' % (name, kind))
+        names = [name + suffix for suffix in ('_bucket', '_sum', '_count')] \
+            if kind == 'histogram' else [name]
+        for sampleName in names:
+            for (_, labels), value in byName[sampleName]:
+                value = int(value) if float(value).is_integer() else value
+                if labels:
+                    lines.append('%s{%s} %s' % (sampleName, labels, value))
+                else:
+                    lines.append('%s %s' % (sampleName, value))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware(object):
+    """Counts each request, its latency and its queries, by view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with instrument_queries() as queries:
+            count = queries.count
+            response = self.get_response(request)
+            count = queries.count - count
+        match = getattr(request, 'resolver_match', None)
+        count_request(
+            match.view_name if match else 'unmatched', request.method,
+            response.status_code, time.perf_counter() - started, count
+        )
+        return response
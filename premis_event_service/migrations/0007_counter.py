@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+def count_events(apps, schema_editor):
+    Counter = apps.get_model('premis_event_service', 'Counter')
+    Event = apps.get_model('premis_event_service', 'Event')
+    db_alias = schema_editor.connection.alias
+    Counter.objects.using(db_alias).create(
+        name='events', value=Event.objects.using(db_alias).count()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('premis_event_service', '0006_alter_event_ordinal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('premis_event_service', '0008_eventrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(max_length=255)),
+                ('event_date_time', models.DateTimeField()),
+                ('event', models.ForeignKey(db_column='event_id', on_delete=django.db.models.deletion.CASCADE, to='premis_event_service.event', to_field='event_identifier')),
+                ('linkobject', models.ForeignKey(db_column='linkobject_id', on_delete=django.db.models.deletion.CASCADE, to='premis_event_service.linkobject')),
+            ],
+            options={
+                'unique_together': {('linkobject', 'event_type')},
+            },
+        ),
+    ]
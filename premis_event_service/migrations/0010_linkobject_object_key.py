@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('premis_event_service', '0009_latestevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='linkobject',
+            name='object_key',
+            field=models.CharField(db_index=True, default='', editable=False, help_text='The identifier normalized for lookups.', max_length=255),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:00
+
+from django.db import migrations, models
+
+LINK_TABLE = 'premis_event_service_event_linking_objects'
+LINK_INDEX = 'pes_link_object_event'
+
+
+# The linking table isn't a model migrations know about, so its index is
+# created directly.
+def add_link_index(apps, schema_editor):
+    quote = schema_editor.quote_name
+    schema_editor.execute('CREATE INDEX %s ON %s (%s, %s)' % (
+        quote(LINK_INDEX), quote(LINK_TABLE), quote('linkobject_id'), quote('event_id')
+    ))
+
+
+def remove_link_index(apps, schema_editor):
+    quote = schema_editor.quote_name
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX %s ON %s' % (quote(LINK_INDEX), quote(LINK_TABLE)))
+    else:
+        schema_editor.execute('DROP INDEX %s' % quote(LINK_INDEX))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('premis_event_service', '0010_linkobject_object_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['event_type', 'event_outcome', 'ordinal'], name='pes_event_type_outcome_ord'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['event_outcome', 'ordinal'], name='pes_event_outcome_ord'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['event_date_time', 'ordinal'], name='pes_event_date_ord'),
+        ),
+        migrations.RunPython(add_link_index, remove_link_index),
+    ]
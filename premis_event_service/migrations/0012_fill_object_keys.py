@@ -0,0 +1,50 @@
+import re
+
+from django.db import migrations
+
+from premis_event_service import settings
+
+CHUNK_SIZE = 10000
+
+
+# A copy of models.normalize_object_identifier as it was when this migration
+# was written, so later changes to it don't change what the migration does.
+ARK_PREFIX_REGEX = re.compile(r'^ark:/?%s/' % settings.ARK_NAAN, re.IGNORECASE)
+
+
+def normalize_object_identifier(identifier):
+    return ARK_PREFIX_REGEX.sub('', identifier.strip()).lower()
+
+
+# Linking objects saved before object_key existed are matched on it too.
+def fill_object_keys(apps, schema_editor):
+    LinkObject = apps.get_model('premis_event_service', 'LinkObject')
+    linkObjects = LinkObject.objects.using(schema_editor.connection.alias)
+    last = ''
+    while True:
+        chunk = list(
+            linkObjects.filter(object_identifier__gt=last)
+            .order_by('object_identifier')
+            .only('object_identifier', 'object_key')[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        changed = []
+        for linkObject in chunk:
+            key = normalize_object_identifier(linkObject.object_identifier)
+            if linkObject.object_key != key:
+                linkObject.object_key = key
+                changed.append(linkObject)
+        linkObjects.bulk_update(changed, ['object_key'])
+        last = chunk[-1].object_identifier
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('premis_event_service', '0011_event_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_object_keys, migrations.RunPython.noop),
+    ]
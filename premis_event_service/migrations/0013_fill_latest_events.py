@@ -0,0 +1,80 @@
+from django.db import migrations
+
+CHUNK_SIZE = 10000
+
+
+# The latest event of each type for each linking object, for the events
+# stored before LatestEvent existed. Written against the historical models
+# rather than LatestEvent.objects.record, so later changes to it don't
+# change what the migration does.
+def fill_latest_events(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Event = apps.get_model('premis_event_service', 'Event')
+    # The links, as the automatically created through model of the field.
+    # Its event_id column holds event identifiers rather than primary keys,
+    # so the events are looked up by identifier instead of joined.
+    EventLinkObject = Event.linking_objects.through
+    LatestEvent = apps.get_model('premis_event_service', 'LatestEvent')
+    latestEvents = LatestEvent.objects.using(alias)
+    latestEvents.all().delete()
+    last = 0
+    while True:
+        chunk = list(
+            EventLinkObject.objects.using(alias).filter(pk__gt=last).order_by('pk')
+            .values_list('pk', 'linkobject_id', 'event_id')[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        events = {
+            event_identifier: (event_type, event_date_time)
+            for event_identifier, event_type, event_date_time in Event.objects.using(alias)
+            .filter(event_identifier__in={link[2] for link in chunk})
+            .values_list('event_identifier', 'event_type', 'event_date_time')
+        }
+        links = [
+            (object_identifier,) + events[event_identifier] + (event_identifier,)
+            for _, object_identifier, event_identifier in chunk
+            if event_identifier in events
+        ]
+        # Of events with the same date and time, the first linked is kept.
+        best = {}
+        for object_identifier, event_type, event_date_time, event_identifier in links:
+            key = (object_identifier, event_type)
+            if key not in best or event_date_time > best[key][0]:
+                best[key] = (event_date_time, event_identifier)
+        last = chunk[-1][0]
+        if not best:
+            continue
+        objects, event_types = (set(k) for k in zip(*best))
+        existing = {
+            (latest.linkobject_id, latest.event_type): latest
+            for latest in latestEvents.filter(
+                linkobject_id__in=objects, event_type__in=event_types
+            )
+        }
+        changed = []
+        missing = []
+        for key, (event_date_time, event_identifier) in best.items():
+            latest = existing.get(key)
+            if latest is None:
+                missing.append(LatestEvent(
+                    linkobject_id=key[0], event_type=key[1],
+                    event_date_time=event_date_time, event_id=event_identifier
+                ))
+            elif event_date_time > latest.event_date_time:
+                latest.event_date_time = event_date_time
+                latest.event_id = event_identifier
+                changed.append(latest)
+        latestEvents.bulk_create(missing)
+        latestEvents.bulk_update(changed, ['event_date_time', 'event_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('premis_event_service', '0012_fill_object_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_latest_events, migrations.RunPython.noop),
+    ]
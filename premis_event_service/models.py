@@ -1,7 +1,23 @@
+import collections
+import datetime
+import json
+import logging
+import re
+import time
+import types
 import uuid
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
 from django.urls import reverse
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models.signals import (pre_save, post_save, pre_delete, post_delete,
+                                      m2m_changed)
+from django.dispatch import receiver
+from django.utils import timezone
 
+from premis_event_service import settings
+
+logger = logging.getLogger(__name__)
 
 # construct choices for the agent type
 AGENT_TYPE_CHOICES = [
@@ -10,12 +26,77 @@ AGENT_TYPE_CHOICES = [
     ('Event', 'Event'),
     ('Software', 'Software'),
 ]
+AGENT_TYPE_LABELS = dict(AGENT_TYPE_CHOICES)
+
+AGENT_REGISTRY_VERSION_KEY = 'pes:agents:version'
 
 
 def get_event_identifier_default():
     return uuid.uuid4().hex
 
 
+class AgentManager(models.Manager):
+
+    # (version, registry, time loaded) as last loaded by this process.
+    _registry = (None, None, None)
+    _warned_local = False
+
+    def _version_cache(self):
+        alias = settings.PES_AGENT_REGISTRY_CACHE
+        if not alias:
+            return None
+        cache = caches[alias]
+        if isinstance(cache, LocMemCache) and not AgentManager._warned_local:
+            AgentManager._warned_local = True
+            logger.warning(
+                "PES_AGENT_REGISTRY_CACHE '%s' is a local memory cache, so agent "
+                "changes only reach other processes after PES_AGENT_REGISTRY_TIMEOUT; "
+                "use a cache shared between processes.", alias
+            )
+        return cache
+
+    def registry(self):
+        """Return every agent, keyed on agent_identifier.
+
+        The agents are loaded once per process into a read-only mapping,
+        in agent_name order, each with its agent_type_label already looked
+        up. Saving or deleting an agent changes the registry version kept
+        in the PES_AGENT_REGISTRY_CACHE cache, so every process sharing
+        that cache reloads on its next call. Each process also reloads
+        once the registry is PES_AGENT_REGISTRY_TIMEOUT seconds old, in
+        case the cache isn't shared; otherwise no query is run.
+        """
+        cache = self._version_cache()
+        version = None
+        if cache is not None:
+            version = cache.get(AGENT_REGISTRY_VERSION_KEY)
+            if version is None:
+                cache.add(AGENT_REGISTRY_VERSION_KEY, uuid.uuid4().hex, None)
+                version = cache.get(AGENT_REGISTRY_VERSION_KEY)
+        loaded_version, registry, loaded = AgentManager._registry
+        timeout = settings.PES_AGENT_REGISTRY_TIMEOUT
+        if registry is None or loaded_version != version or \
+                timeout is not None and time.monotonic() - loaded >= timeout:
+            agents = {}
+            for agent in self.get_queryset():
+                agent.agent_type_label = AGENT_TYPE_LABELS.get(
+                    agent.agent_type, agent.agent_type
+                )
+                agents[agent.agent_identifier] = agent
+            registry = types.MappingProxyType(agents)
+            # The version was read before loading, so a change made in the
+            # meantime just causes another reload.
+            AgentManager._registry = (version, registry, time.monotonic())
+        return registry
+
+    def invalidate_registry(self):
+        """Drop this process's registry and have every other process reload."""
+        AgentManager._registry = (None, None, None)
+        cache = self._version_cache()
+        if cache is not None:
+            cache.set(AGENT_REGISTRY_VERSION_KEY, uuid.uuid4().hex, None)
+
+
 class Agent(models.Model):
     """
     Structure for the half a dozen or so Agents we have in the system.
@@ -41,6 +122,8 @@ class Agent(models.Model):
         help_text="Optional note about agent."
     )
 
+    objects = AgentManager()
+
     def __str__(self):
         return self.agent_name
 
@@ -51,6 +134,27 @@ class Agent(models.Model):
         ordering = ['agent_name']
 
 
+@receiver(post_save, sender=Agent)
+@receiver(post_delete, sender=Agent)
+def invalidate_agent_registry(sender, **kwargs):
+    Agent.objects.invalidate_registry()
+    # Other processes could reload before the change is committed and keep
+    # the old agents, so they are told again once it is.
+    transaction.on_commit(Agent.objects.invalidate_registry)
+
+
+ARK_PREFIX_REGEX = re.compile(r'^ark:/?%s/' % settings.ARK_NAAN, re.IGNORECASE)
+
+
+def normalize_object_identifier(identifier):
+    """
+    Return the key a linking object identifier is matched on: lowercased,
+    without the ark:/NAAN/ prefix for this institution's NAAN, so the bare
+    and full forms of an ARK match each other.
+    """
+    return ARK_PREFIX_REGEX.sub('', identifier.strip()).lower()
+
+
 class LinkObject(models.Model):
     """
     A link object is the bag that is tied to an event.
@@ -71,13 +175,95 @@ class LinkObject(models.Model):
         help_text="A high-level characterization of the role of the object.",
         null=True
     )
+    object_key = models.CharField(
+        max_length=255,
+        help_text="The identifier normalized for lookups.",
+        db_index=True,
+        editable=False,
+        default=''
+    )
 
     def __str__(self):
         return self.object_identifier
 
+    def save(self, *args, **kwargs):
+        self.object_key = normalize_object_identifier(self.object_identifier)
+        super().save(*args, **kwargs)
+
+
+# The number of events matching a search. If not exact, count is either an
+# estimate or, if not estimated, the number the count stopped at.
+SearchCount = collections.namedtuple('SearchCount', ['count', 'exact', 'estimated'])
+
 
 class EventManager(models.Manager):
 
+    def total(self):
+        """Return the number of events, as configured by PES_EVENT_COUNT.
+
+        'counter' reads the maintained count from the Counter table,
+        'estimated' asks the database for its estimated row count (falling
+        back to the counter), and 'exact' runs COUNT(*).
+        """
+        strategy = settings.PES_EVENT_COUNT
+        if strategy == 'estimated':
+            estimate = Counter.objects.estimate(self.model)
+            if estimate is not None:
+                return estimate
+        if strategy == 'exact':
+            return self.count()
+        return Counter.objects.value(EVENT_COUNTER, self.get_queryset())
+
+    def search_count(self, **kwargs):
+        """Return a SearchCount for the Events matching search(**kwargs),
+        as configured by PES_SEARCH_COUNT.
+
+        'exact' runs COUNT(*). 'capped' counts no further than
+        PES_SEARCH_COUNT_CAP + 1 events, and past that returns the cap as
+        inexact. 'estimated' sums the daily rollups or, for searches on a
+        linked object, reads the row estimate from the query plan
+        (PostgreSQL only), falling back to a capped count.
+        """
+        events = self.search(**kwargs)
+        strategy = settings.PES_SEARCH_COUNT
+        if strategy == 'estimated':
+            estimate = self.estimate_search_count(events, **kwargs)
+            if estimate is not None:
+                return SearchCount(estimate, exact=False, estimated=True)
+        if strategy == 'exact':
+            return SearchCount(events.count(), exact=True, estimated=False)
+        cap = settings.PES_SEARCH_COUNT_CAP
+        count = events.order_by()[:cap + 1].count()
+        if count > cap:
+            return SearchCount(cap, exact=False, estimated=False)
+        return SearchCount(count, exact=True, estimated=False)
+
+    def estimate_search_count(self, events, **kwargs):
+        """
+        Return an estimate of the number of events, or None if there is no
+        cheap way to make one.
+        """
+        if kwargs.get('linked_object_id'):
+            connection = transaction.get_connection(self.db)
+            if connection.vendor != 'postgresql':
+                return None
+            plan = json.loads(events.order_by().explain(format='json'))
+            return int(plan[0]['Plan']['Plan Rows'])
+        rollups = EventRollup.objects.all()
+        start_date = kwargs.get('start_date')
+        end_date = kwargs.get('end_date')
+        if start_date:
+            rollups = rollups.filter(day__gte=rollup_day(start_date))
+        if end_date:
+            # The search ends at midnight, so the end date's own events are
+            # left out, apart from any at exactly midnight.
+            rollups = rollups.filter(day__lt=rollup_day(end_date))
+        if kwargs.get('event_outcome'):
+            rollups = rollups.filter(event_outcome=kwargs['event_outcome'])
+        if kwargs.get('event_type'):
+            rollups = rollups.filter(event_type=kwargs['event_type'])
+        return rollups.aggregate(total=models.Sum('count'))['total'] or 0
+
     def search(self, **kwargs):
         """Filter the Events based on
            - A start_date less than an event_date_time
@@ -116,7 +302,9 @@ class EventManager(models.Manager):
             events = events.filter(ordinal__lte=min_ordinal) if min_ordinal else events
 
         if linked_object_id:
-            events = events.filter(linking_objects__object_identifier=linked_object_id)
+            events = events.filter(
+                linking_objects__object_key=normalize_object_identifier(linked_object_id)
+            )
 
         return events
 
@@ -223,6 +411,16 @@ class Event(models.Model):
 
     class Meta:
         ordering = ["event_added"]
+        # Searches filter on these and order by ordinal, so one index can
+        # serve both the filter and the order (see the pes_explain command).
+        indexes = [
+            models.Index(
+                fields=['event_type', 'event_outcome', 'ordinal'],
+                name='pes_event_type_outcome_ord'
+            ),
+            models.Index(fields=['event_outcome', 'ordinal'], name='pes_event_outcome_ord'),
+            models.Index(fields=['event_date_time', 'ordinal'], name='pes_event_date_ord'),
+        ]
 
     def link_objects_string(self):
         # Django ORM requires a PK value before
@@ -231,10 +429,11 @@ class Event(models.Model):
         # accessing linking_objects.
         if not self.ordinal:
             self.save()
-        values = self.linking_objects.values()
+        # all() rather than values(), so linking objects prefetched by the
+        # admin's changelist are used instead of a query per event.
         idList = []
-        for value in values:
-            idList.append(value["object_identifier"])
+        for linkObject in self.linking_objects.all():
+            idList.append(linkObject.object_identifier)
         return "\n".join(idList)
 
     def is_good(self):
@@ -263,3 +462,410 @@ class EventLinkObject(models.Model):
         LinkObject, to_field='object_identifier', db_column='linkobject_id',
         on_delete=models.CASCADE
     )
+
+
+class CounterManager(models.Manager):
+
+    def adjust(self, name, delta):
+        """Add delta to a counter, if it has been initialized."""
+        self.filter(name=name).update(value=models.F('value') + delta)
+
+    def value(self, name, query_set):
+        """Return a counter's value, initializing it from query_set if needed."""
+        try:
+            return self.get(name=name).value
+        except self.model.DoesNotExist:
+            value = query_set.count()
+            try:
+                with transaction.atomic():
+                    self.create(name=name, value=value)
+            except IntegrityError:
+                # Another request initialized it first.
+                pass
+            return value
+
+    def reconcile(self, name, query_set):
+        """Reset a counter from query_set; return its (old, new) values."""
+        with transaction.atomic():
+            counter, _ = self.select_for_update().get_or_create(name=name)
+            old = counter.value
+            counter.value = query_set.count()
+            counter.save()
+        return old, counter.value
+
+    def estimate(self, model):
+        """
+        Return the database's estimate of the rows in a model's table, or
+        None if the backend doesn't keep one.
+        """
+        connection = transaction.get_connection(self.db)
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [table]
+                )
+            elif connection.vendor == 'mysql':
+                cursor.execute(
+                    'SELECT table_rows FROM information_schema.tables '
+                    'WHERE table_schema = DATABASE() AND table_name = %s',
+                    [table]
+                )
+            else:
+                return None
+            row = cursor.fetchone()
+        # PostgreSQL reports -1 for tables that haven't been analyzed yet.
+        if row is None or row[0] is None or row[0] < 0:
+            return None
+        return int(row[0])
+
+
+EVENT_COUNTER = 'events'
+
+
+class Counter(models.Model):
+    """
+    Running totals kept up to date as rows are added and removed, so they
+    can be read without counting.
+    """
+
+    objects = CounterManager()
+
+    name = models.CharField(max_length=64, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return '%s: %d' % (self.name, self.value)
+
+
+@receiver(post_save, sender=Event)
+def count_saved_event(sender, instance, created, **kwargs):
+    if created:
+        Counter.objects.adjust(EVENT_COUNTER, 1)
+
+
+@receiver(post_delete, sender=Event)
+def count_deleted_event(sender, instance, **kwargs):
+    Counter.objects.adjust(EVENT_COUNTER, -1)
+
+
+def rollup_day(value):
+    """Return the day a date or datetime is rolled up under."""
+    if not isinstance(value, datetime.datetime):
+        return value
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
+
+
+def rollup_key(event_date_time, event_type, event_outcome):
+    """Return the (day, event_type, event_outcome) an event is rolled up under."""
+    return (rollup_day(event_date_time), event_type, event_outcome)
+
+
+def event_rollup_key(event):
+    return rollup_key(event.event_date_time, event.event_type, event.event_outcome)
+
+
+class EventRollupManager(models.Manager):
+
+    def adjust(self, counts):
+        """
+        Add to the rollups; counts maps rollup keys to the change in count.
+
+        However many keys there are, the existing rollups are read and
+        updated with one query each, and the missing ones are created with
+        one insert.
+        """
+        counts = {key: delta for key, delta in counts.items() if delta}
+        if not counts:
+            return
+        days, event_types, event_outcomes = (set(k) for k in zip(*counts))
+        existing = self.filter(
+            day__in=days, event_type__in=event_types, event_outcome__in=event_outcomes
+        ).values_list('pk', 'day', 'event_type', 'event_outcome')
+        deltas = {}
+        for pk, *key in existing:
+            if tuple(key) in counts:
+                deltas[pk] = counts.pop(tuple(key))
+        if deltas:
+            self.filter(pk__in=list(deltas)).update(count=models.F('count') + models.Case(
+                *[models.When(pk=pk, then=models.Value(delta)) for pk, delta in deltas.items()]
+            ))
+        if not counts:
+            return
+        try:
+            with transaction.atomic():
+                self.bulk_create([
+                    self.model(day=day, event_type=event_type,
+                               event_outcome=event_outcome, count=delta)
+                    for (day, event_type, event_outcome), delta in counts.items()
+                ])
+        except IntegrityError:
+            # Another transaction created some of them first.
+            for key, delta in counts.items():
+                self._adjust_one(key, delta)
+
+    def _adjust_one(self, key, delta):
+        day, event_type, event_outcome = key
+        rollup = self.filter(day=day, event_type=event_type, event_outcome=event_outcome)
+        if rollup.update(count=models.F('count') + delta):
+            return
+        try:
+            with transaction.atomic():
+                self.create(day=day, event_type=event_type,
+                            event_outcome=event_outcome, count=delta)
+        except IntegrityError:
+            rollup.update(count=models.F('count') + delta)
+
+    def adjust_events(self, events, delta=1):
+        """Add (or with a negative delta, remove) events to the rollups."""
+        counts = collections.Counter()
+        for event in events:
+            counts[event_rollup_key(event)] += delta
+        self.adjust(counts)
+
+
+class EventRollup(models.Model):
+    """
+    The number of events of each type and outcome on each day, kept up to
+    date as events are added, changed and removed.
+    """
+
+    objects = EventRollupManager()
+
+    day = models.DateField()
+    event_type = models.CharField(max_length=255)
+    event_outcome = models.CharField(max_length=255)
+    count = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return '%s %s %s: %d' % (self.day, self.event_type, self.event_outcome, self.count)
+
+    class Meta:
+        unique_together = ('day', 'event_type', 'event_outcome')
+
+
+@receiver(pre_save, sender=Event)
+def remember_previous_values(sender, instance, raw=False, **kwargs):
+    """Note what an updated event's date, type and outcome were before."""
+    instance._previous_values = None
+    if not instance._state.adding and not raw:
+        instance._previous_values = Event.objects.filter(pk=instance.pk).values_list(
+            'event_date_time', 'event_type', 'event_outcome'
+        ).first()
+
+
+@receiver(post_save, sender=Event)
+def rollup_saved_event(sender, instance, created, **kwargs):
+    key = event_rollup_key(instance)
+    previous = getattr(instance, '_previous_values', None)
+    if created:
+        EventRollup.objects.adjust({key: 1})
+    elif previous is not None and rollup_key(*previous) != key:
+        EventRollup.objects.adjust({rollup_key(*previous): -1, key: 1})
+
+
+@receiver(post_delete, sender=Event)
+def rollup_deleted_event(sender, instance, **kwargs):
+    EventRollup.objects.adjust({event_rollup_key(instance): -1})
+
+
+class LatestEventManager(models.Manager):
+
+    def record(self, candidates):
+        """
+        Note events as the latest for their linking objects and type where
+        they are newer than the one recorded.
+
+        candidates is a list of (object identifier, event type, event date
+        time, event identifier). Of events with the same date and time, the
+        first recorded is kept.
+        """
+        best = collections.OrderedDict()
+        for object_identifier, event_type, event_date_time, event_identifier in candidates:
+            key = (object_identifier, event_type)
+            if key not in best or event_date_time > best[key][0]:
+                best[key] = (event_date_time, event_identifier)
+        if not best:
+            return
+        objects, event_types = (set(k) for k in zip(*best))
+        existing = {
+            (object_identifier, event_type): event_date_time
+            for object_identifier, event_type, event_date_time in self.filter(
+                linkobject_id__in=objects, event_type__in=event_types
+            ).values_list('linkobject_id', 'event_type', 'event_date_time')
+        }
+        missing = []
+        for key, (event_date_time, event_identifier) in best.items():
+            if key not in existing:
+                missing.append((key, event_date_time, event_identifier))
+            elif event_date_time > existing[key]:
+                self._replace_if_newer(key, event_date_time, event_identifier)
+        if not missing:
+            return
+        try:
+            with transaction.atomic():
+                self.bulk_create([
+                    self.model(linkobject_id=object_identifier, event_type=event_type,
+                               event_date_time=event_date_time, event_id=event_identifier)
+                    for (object_identifier, event_type), event_date_time, event_identifier
+                    in missing
+                ])
+        except IntegrityError:
+            # Another transaction recorded some of them first.
+            for (object_identifier, event_type), event_date_time, event_identifier in missing:
+                try:
+                    with transaction.atomic():
+                        self.create(
+                            linkobject_id=object_identifier, event_type=event_type,
+                            event_date_time=event_date_time, event_id=event_identifier
+                        )
+                except IntegrityError:
+                    self._replace_if_newer(
+                        (object_identifier, event_type), event_date_time, event_identifier
+                    )
+
+    def _replace_if_newer(self, key, event_date_time, event_identifier):
+        object_identifier, event_type = key
+        # Conditional, so a concurrent writer's newer event isn't overwritten.
+        self.filter(
+            linkobject_id=object_identifier, event_type=event_type,
+            event_date_time__lt=event_date_time
+        ).update(event_date_time=event_date_time, event_id=event_identifier)
+
+    def refresh(self, keys):
+        """Recompute the latest event for (object identifier, event type) keys."""
+        for object_identifier, event_type in set(keys):
+            latest = Event.objects.filter(
+                linking_objects=object_identifier, event_type=event_type
+            ).order_by('-event_date_time', 'ordinal').values_list(
+                'event_date_time', 'event_identifier'
+            ).first()
+            if latest is None:
+                self.filter(linkobject_id=object_identifier, event_type=event_type).delete()
+            else:
+                self.update_or_create(
+                    linkobject_id=object_identifier, event_type=event_type,
+                    defaults={'event_date_time': latest[0], 'event_id': latest[1]}
+                )
+
+    def latest_event(self, object_identifier, event_type=None):
+        """
+        Return the latest event linked to an object, given either form of
+        its identifier, or None. event_type may be any part of the type,
+        such as the fixityCheck of .../preservationEvents/#fixityCheck.
+        """
+        latest = self.filter(
+            linkobject__object_key=normalize_object_identifier(object_identifier)
+        )
+        if event_type:
+            latest = latest.filter(event_type__contains=event_type)
+        latest = latest.select_related('event').order_by(
+            '-event_date_time', 'event__ordinal'
+        ).first()
+        return latest.event if latest else None
+
+
+class LatestEvent(models.Model):
+    """
+    The most recent event of each type for each linking object, kept up to
+    date as events are added, changed and removed, for findEvent.
+    """
+
+    objects = LatestEventManager()
+
+    linkobject = models.ForeignKey(
+        LinkObject, to_field='object_identifier', db_column='linkobject_id',
+        on_delete=models.CASCADE
+    )
+    event_type = models.CharField(max_length=255)
+    event = models.ForeignKey(
+        Event, to_field='event_identifier', db_column='event_id',
+        on_delete=models.CASCADE
+    )
+    event_date_time = models.DateTimeField()
+
+    def __str__(self):
+        return '%s %s: %s' % (self.linkobject_id, self.event_type, self.event_id)
+
+    class Meta:
+        unique_together = ('linkobject', 'event_type')
+
+
+def latest_event_candidates(events):
+    """List of (event, linked object identifiers) -> LatestEvent candidates"""
+    return [
+        (object_identifier, event.event_type, event.event_date_time, event.event_identifier)
+        for event, object_identifiers in events
+        for object_identifier in object_identifiers
+    ]
+
+
+def linked_keys(event, event_types):
+    return [
+        (object_identifier, event_type)
+        for object_identifier in EventLinkObject.objects.filter(
+            event_id=event.event_identifier
+        ).values_list('linkobject_id', flat=True)
+        for event_type in event_types
+    ]
+
+
+@receiver(post_save, sender=Event)
+def refresh_latest_for_saved_event(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_values', None)
+    # New events have no links yet; they are recorded as links are added.
+    if created or previous is None:
+        return
+    previous_date_time, previous_type, _ = previous
+    if (previous_date_time, previous_type) != (instance.event_date_time, instance.event_type):
+        LatestEvent.objects.refresh(
+            linked_keys(instance, {previous_type, instance.event_type})
+        )
+
+
+@receiver(pre_delete, sender=Event)
+def remember_latest_for_deleted_event(sender, instance, **kwargs):
+    instance._latest_keys = list(
+        LatestEvent.objects.filter(event_id=instance.event_identifier)
+        .values_list('linkobject_id', 'event_type')
+    )
+
+
+@receiver(post_delete, sender=Event)
+def refresh_latest_for_deleted_event(sender, instance, **kwargs):
+    keys = getattr(instance, '_latest_keys', None)
+    if keys:
+        LatestEvent.objects.refresh(keys)
+
+
+@receiver(m2m_changed, sender=EventLinkObject)
+def refresh_latest_for_links(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        instance._latest_keys = (
+            [(o, instance.event_type) for o in instance.linking_objects.values_list(
+                'object_identifier', flat=True)]
+            if not reverse else
+            [(instance.object_identifier, t) for t in instance.event_set.values_list(
+                'event_type', flat=True).distinct()]
+        )
+    elif action == 'post_clear':
+        LatestEvent.objects.refresh(getattr(instance, '_latest_keys', []))
+    elif action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    elif not reverse:
+        if action == 'post_add':
+            LatestEvent.objects.record(latest_event_candidates([(instance, pk_set)]))
+        else:
+            LatestEvent.objects.refresh([(o, instance.event_type) for o in pk_set])
+    else:
+        # pk_set holds the through table's values, the event identifiers.
+        events = Event.objects.filter(event_identifier__in=pk_set)
+        if action == 'post_add':
+            LatestEvent.objects.record(latest_event_candidates(
+                [(e, [instance.object_identifier]) for e in events]))
+        else:
+            LatestEvent.objects.refresh(
+                [(instance.object_identifier, e.event_type) for e in events])
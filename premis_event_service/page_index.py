@@ -0,0 +1,299 @@
+"""
+Page boundary index for event searches.
+
+Search results are listed newest first, so reaching page N with OFFSET
+means reading past every event on the pages before it. Instead, the
+ordinals of a search's events are sampled once, ascending, every per_page
+events and the samples (checkpoints) are cached under a key for the
+normalized search. Any page can then be read with a seek on the nearest
+checkpoint and an offset of less than a page.
+
+Events only ever get higher ordinals, so an index is extended from its
+last checkpoint (its high-water mark) to take in events added since it was
+built. An index is built inside the request that first needs it, so no
+more than PES_PAGE_INDEX_MAX_EVENTS events are read for one; a search
+matching more is paged with OFFSET (unfiltered searches are mostly paged
+by seeking on the ordinals in their page links instead).
+
+Each index's key includes a generation for every term of its search: the
+type, outcome or linked object it filters on, any date range, or '*' for
+no filter. Updating, deleting or relinking an event changes the
+generations of the terms whose searches it may have joined or left, and
+only those indexes are rebuilt on next use.
+
+By default the indexes are kept in a cache local to the process, which is
+only correct when a single process serves and changes the events: the
+generations bumped by another worker never reach it, so only searches
+whose total is counted exactly notice the change. With several processes,
+set PES_PAGE_INDEX_CACHE to the alias of a cache in CACHES shared between
+them, such as memcached or Redis, or to None to page with OFFSET instead.
+"""
+import hashlib
+import uuid
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models.signals import m2m_changed, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from premis_event_service import settings
+from .models import Event, EventLinkObject, normalize_object_identifier
+
+LOCAL_CACHE = 'local'
+LOCAL_MAX_ENTRIES = 1000
+GENERATION_KEY = 'pes:pages:generation'
+TERM_GENERATION_KEY = 'pes:pages:generation:%s'
+
+# Ordinals read per query while building or extending an index.
+PAGE_INDEX_CHUNK_SIZE = 10000
+
+_local_cache = None
+
+
+def get_cache():
+    """Return the cache backend for page indexes, or None if disabled."""
+    global _local_cache
+    alias = settings.PES_PAGE_INDEX_CACHE
+    if not alias:
+        return None
+    if alias != LOCAL_CACHE:
+        return caches[alias]
+    if _local_cache is None:
+        _local_cache = LocMemCache('premis_event_service.page_index', {
+            'TIMEOUT': None,
+            'OPTIONS': {'MAX_ENTRIES': LOCAL_MAX_ENTRIES},
+        })
+    return _local_cache
+
+
+def search_signature(valid):
+    """
+    Return the search form's cleaned data as a canonical string, so
+    searches that match the same events share an index.
+    """
+    terms = []
+    for name, value in sorted(valid.items()):
+        if not value:
+            continue
+        if name == 'linked_object_id':
+            value = normalize_object_identifier(value)
+        terms.append('%s=%s' % (name, value))
+    return '&'.join(terms)
+
+
+def search_terms(valid):
+    """
+    Return the terms of a search that changes to events are matched
+    against: one for each type, outcome and linked object filtered on,
+    'date' for a date range, or '*' for an unfiltered search.
+    """
+    terms = [
+        '%s=%s' % (name, valid[name])
+        for name in ('event_type', 'event_outcome') if valid.get(name)
+    ]
+    if valid.get('start_date') or valid.get('end_date'):
+        terms.append('date')
+    if valid.get('linked_object_id'):
+        terms.append(linked_term(valid['linked_object_id']))
+    return terms or ['*']
+
+
+def linked_term(object_identifier):
+    return 'linked_object_id=%s' % normalize_object_identifier(object_identifier)
+
+
+def _term_key(term):
+    return TERM_GENERATION_KEY % hashlib.md5(term.encode('utf-8')).hexdigest()
+
+
+def _generations(cache, keys):
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, uuid.uuid4().hex, None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def cache_key(cache, valid, per_page):
+    keys = [GENERATION_KEY] + [_term_key(term) for term in search_terms(valid)]
+    digest = hashlib.md5('|'.join(
+        [search_signature(valid)] + _generations(cache, keys)
+    ).encode('utf-8')).hexdigest()
+    return 'pes:pages:%d:%s' % (per_page, digest)
+
+
+class PageIndex(object):
+    """
+    The ordinal of every per_page-th event matching a search, ascending,
+    and the number of events counted up to the latest one read. An index
+    that overflowed holds too many events to be used.
+    """
+
+    overflowed = False
+
+    def __init__(self, per_page, checkpoints=None, count=0):
+        self.per_page = per_page
+        self.checkpoints = checkpoints or []
+        self.count = count
+
+    def extend(self, events, max_events=None):
+        """
+        Read the events from the last checkpoint on and add checkpoints for
+        any new ones. Return True if anything was added.
+
+        If the search matches more than max_events events, stop reading and
+        mark the index as overflowed.
+        """
+        if self.checkpoints:
+            # The checkpoint itself is already counted, so only what follows
+            # it is re-read.
+            last = self.checkpoints[-1]
+            position = (len(self.checkpoints) - 1) * self.per_page + 1
+        else:
+            last = None
+            position = 0
+        start_count = self.count
+        ordinals = events.order_by('ordinal').values_list('ordinal', flat=True)
+        while True:
+            size = PAGE_INDEX_CHUNK_SIZE
+            if max_events is not None:
+                size = min(size, max_events + 1 - position)
+            chunk = ordinals if last is None else ordinals.filter(ordinal__gt=last)
+            chunk = list(chunk[:size])
+            for ordinal in chunk:
+                if position % self.per_page == 0:
+                    self.checkpoints.append(ordinal)
+                position += 1
+            if max_events is not None and position > max_events:
+                self.overflowed = True
+                self.checkpoints = []
+                break
+            if len(chunk) < size:
+                break
+            last = chunk[-1]
+        self.count = position
+        return self.count != start_count or self.overflowed
+
+    def page(self, events, page):
+        """
+        Return the events on the given page, newest first, reading from the
+        checkpoint nearest the start of the page.
+        """
+        top = self.count - 1 - (page - 1) * self.per_page
+        if top < 0:
+            return []
+        bottom = max(0, top - self.per_page + 1)
+        checkpoint = self.checkpoints[bottom // self.per_page]
+        offset = bottom % self.per_page
+        page_events = list(
+            events.filter(ordinal__gte=checkpoint)
+            .order_by('ordinal')[offset:offset + top - bottom + 1]
+        )
+        page_events.reverse()
+        return page_events
+
+
+def get_index(events, valid, per_page, expected_count=None):
+    """
+    Return the page index of the search with the form's cleaned data,
+    building or extending it as needed, or None if page indexes are
+    disabled or the search matches more than PES_PAGE_INDEX_MAX_EVENTS.
+
+    If the number of events indexed differs from expected_count, which
+    should only be given when it was actually counted, the index is stale
+    and is rebuilt: it missed events committed after later ones were read,
+    or events were deleted or changed through a process whose
+    invalidations this cache doesn't see.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+    max_events = settings.PES_PAGE_INDEX_MAX_EVENTS
+    key = cache_key(cache, valid, per_page)
+    index = cache.get(key)
+    if index is None:
+        index = PageIndex(per_page)
+        changed = index.extend(events, max_events)
+    elif index.overflowed:
+        return None
+    else:
+        changed = index.extend(events, max_events)
+    if not index.overflowed and expected_count is not None and \
+            index.count != expected_count:
+        index = PageIndex(per_page)
+        changed = index.extend(events, max_events)
+    if changed:
+        cache.set(key, index, None)
+    return None if index.overflowed else index
+
+
+def invalidate(terms=None):
+    """
+    Have the indexes of the searches on any of the terms (see
+    search_terms) rebuilt on their next use, or every index if no terms
+    are given.
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+    if terms is None:
+        cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+    elif terms:
+        cache.set_many({_term_key(term): uuid.uuid4().hex for term in terms}, None)
+
+
+@receiver(post_save, sender=Event)
+def invalidate_for_updated_event(sender, instance, created, **kwargs):
+    # New events are picked up by extending the indexes. An updated one has
+    # left the searches on its old values and joined those on its new ones.
+    if created:
+        return
+    previous = getattr(instance, '_previous_values', None)
+    if previous is None:
+        invalidate()
+        return
+    previous_date_time, previous_type, previous_outcome = previous
+    terms = []
+    if previous_date_time != instance.event_date_time:
+        terms.append('date')
+    for name, before, after in (
+            ('event_type', previous_type, instance.event_type),
+            ('event_outcome', previous_outcome, instance.event_outcome)):
+        if before != after:
+            terms.extend(['%s=%s' % (name, before), '%s=%s' % (name, after)])
+    invalidate(terms)
+
+
+@receiver(pre_delete, sender=Event)
+def remember_terms_of_deleted_event(sender, instance, **kwargs):
+    instance._page_index_terms = [
+        '*', 'date',
+        'event_type=%s' % instance.event_type,
+        'event_outcome=%s' % instance.event_outcome,
+    ] + [
+        linked_term(object_identifier)
+        for object_identifier in EventLinkObject.objects.filter(
+            event_id=instance.event_identifier
+        ).values_list('linkobject_id', flat=True)
+    ]
+
+
+@receiver(post_delete, sender=Event)
+def invalidate_for_deleted_event(sender, instance, **kwargs):
+    invalidate(getattr(instance, '_page_index_terms', None))
+
+
+@receiver(m2m_changed, sender=EventLinkObject)
+def invalidate_for_links(sender, instance, action, reverse, pk_set, **kwargs):
+    # An event linked to or unlinked from an object joins or leaves the
+    # searches on that object.
+    if action == 'pre_clear':
+        instance._page_index_terms = [linked_term(instance.object_identifier)] if reverse \
+            else [linked_term(o) for o in instance.linking_objects.values_list(
+                'object_identifier', flat=True)]
+    elif action == 'post_clear':
+        invalidate(getattr(instance, '_page_index_terms', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        invalidate([linked_term(o) for o in
+                    ([instance.object_identifier] if reverse else pk_set)])
@@ -1,25 +1,32 @@
 from datetime import datetime
 import uuid
 from urllib.parse import urlparse
+from http import HTTPStatus
 
 from lxml import etree
+from django.db import transaction
+from django.db.utils import DataError, IntegrityError
 from django.shortcuts import get_object_or_404
 
-from codalib.bagatom import (getValueByName,
-                             getNodeByName,
-                             getNodesByName,
-                             updateObjectFromXML)
+from codalib.bagatom import getNodeByName
 from codalib.xsdatetime import (xsDateTime_parse,
                                 xsDateTime_format,
-                                localize_datetime)
-from .models import Event, Agent, LinkObject, AGENT_TYPE_CHOICES
+                                localize_datetime,
+                                InvalidXSDateTime)
+from .models import (Event, Agent, LinkObject, EventLinkObject, Counter,
+                     EventRollup, LatestEvent, EVENT_COUNTER, AGENT_TYPE_LABELS,
+                     latest_event_candidates, normalize_object_identifier)
 from premis_event_service import settings
+from .timing import timed
 import collections
 
 PREMIS_NAMESPACE = 'info:lc/xmlns/premis-v2'
 PREMIS = '{%s}' % PREMIS_NAMESPACE
 PREMIS_NSMAP = {'premis': PREMIS_NAMESPACE}
 PES_AGENT_ID_TYPE = 'PES:Agent'
+DAV_NAMESPACE = 'DAV:'
+DAV = '{%s}' % DAV_NAMESPACE
+DAV_NSMAP = {'D': DAV_NAMESPACE}
 
 translateDict = collections.OrderedDict()
 translateDict['event_identifier_type'] = ['eventIdentifier', 'eventIdentifierType']
@@ -38,6 +45,21 @@ translateDict['linking_agent_identifier_value'] = [
     'linkingAgentIdentifier', 'linkingAgentIdentifierValue'
 ]
 
+# The PREMIS event skeleton built by objectToPremisEventXML, precomputed
+# from translateDict: (field name, top level tag, nested tags). Top level
+# elements are shared by the fields under them; nested ones never are.
+PREMIS_EVENT_TAG = PREMIS + 'event'
+EVENT_SKELETON = [
+    (fieldName, PREMIS + chain[0], tuple(PREMIS + c for c in chain[1:]))
+    for fieldName, chain in translateDict.items()
+]
+LINKING_OBJECT_TAGS = (
+    PREMIS + 'linkingObjectIdentifier',
+    PREMIS + 'linkingObjectIdentifierType',
+    PREMIS + 'linkingObjectIdentifierValue',
+    PREMIS + 'linkingObjectRole',
+)
+
 xpath_map = collections.OrderedDict()
 xpath_map['@namespaces'] = PREMIS_NSMAP
 xpath_map['event_identifier_type'] = 'premis:eventIdentifier/premis:eventIdentifierType'
@@ -54,6 +76,52 @@ xpath_map['linking_agent_identifier_value'] = 'premis:linkingAgentIdentifier' +
         '/premis:linkingAgentIdentifierValue'
 
 
+def _compileFieldPaths(mapping):
+    """
+    xpath_map style dict -> dict of Clark notation tag paths to field names
+    """
+
+    nsmap = mapping['@namespaces']
+    paths = {}
+    for fieldName, selector in mapping.items():
+        if fieldName.startswith('@'):
+            continue
+        steps = []
+        for step in selector.split('/'):
+            prefix, name = step.split(':')
+            steps.append('{%s}%s' % (nsmap[prefix], name))
+        paths[tuple(steps)] = fieldName
+    return paths
+
+
+# The event field paths are compiled once at import so an event can be read
+# in a single walk over its subtree rather than one XPath query per field.
+EVENT_FIELD_PATHS = _compileFieldPaths(xpath_map)
+EVENT_FIELD_PARENTS = set(
+    path[:i] for path in EVENT_FIELD_PATHS for i in range(1, len(path))
+)
+
+# Compiled XPath evaluators. Calling element.xpath() with a string parses
+# the expression on every call.
+XPATH_EVALUATORS = {
+    'event': etree.XPath('//premis:event', namespaces=PREMIS_NSMAP),
+    'event_entry_id': etree.XPath('//id'),
+    'event_identifier_value': etree.XPath(
+        '//premis:eventIdentifierValue', namespaces=PREMIS_NSMAP
+    ),
+    'agent': etree.XPath(
+        'descendant-or-self::premis:agent', namespaces=PREMIS_NSMAP
+    ),
+    'agent_identifier': etree.XPath(
+        'premis:agentIdentifier/premis:agentIdentifierValue',
+        namespaces=PREMIS_NSMAP
+    ),
+    'agent_name': etree.XPath('premis:agentName', namespaces=PREMIS_NSMAP),
+    'agent_type': etree.XPath('premis:agentType', namespaces=PREMIS_NSMAP),
+    'agent_note': etree.XPath('premis:agentNote', namespaces=PREMIS_NSMAP),
+}
+
+
 class DuplicateEventError(Exception):
     pass
 
@@ -62,52 +130,275 @@ class NoEventIdentifier(Exception):
     pass
 
 
+class InvalidEventError(Exception):
+    pass
+
+
 def premisEventXMLToObject(eventXML):
     """
     Event XML -> create Event object
+
+    Duplicates are detected by the unique constraint on event_identifier
+    rather than a lookup beforehand, and the event, its linking objects and
+    the links between them are written in a single transaction.
     """
 
-    newEventObject = updateObjectFromXML(eventXML, Event(), xpath_map)
-    linkingObjectIDNodes = getNodesByName(eventXML, "linkingObjectIdentifier")
+    submittedIdentifier, newEventObject, linkObjects = \
+        _premisEventXMLToUnsavedObject(eventXML)
+    # A replaced identifier can't collide on insert, so check that the
+    # submitted one isn't already in use.
+    if submittedIdentifier != newEventObject.event_identifier and \
+            Event.objects.filter(event_identifier=submittedIdentifier).exists():
+        raise DuplicateEventError(submittedIdentifier)
     try:
-        Event.objects.get(event_identifier=newEventObject.event_identifier)
-        raise DuplicateEventError(newEventObject.event_identifier)
-    except Event.DoesNotExist:
-        pass
-    except DuplicateEventError as e:
-        raise e
-    # if we dont have a uuid looking event_identifier
-    # create our own before we save.
+        with transaction.atomic():
+            newEventObject.save(force_insert=True)
+            _saveEventLinkObjects([(newEventObject, linkObjects)])
+    except IntegrityError:
+        if Event.objects.filter(
+                event_identifier=newEventObject.event_identifier).exists():
+            raise DuplicateEventError(submittedIdentifier)
+        raise
+    return newEventObject
+
+
+def entryXMLToPremisEventXML(entryXML):
+    """
+    Atom entry XML -> the premis:event element it contains, or None
+    """
+
+    contentXML = getNodeByName(entryXML, "content")
+    if contentXML is None:
+        return None
+    return getNodeByName(contentXML, "event")
+
+
+def premisLinkObjectXMLToObject(linkingObjectIDNode):
+    """
+    Linking object identifier XML -> unsaved LinkObject
+    """
+
+    values = {}
+    for child in linkingObjectIDNode:
+        if not isinstance(child.tag, str):
+            continue
+        name = etree.QName(child).localname
+        if name not in values:
+            values[name] = child.text.strip() if child.text else None
+    linkObject = LinkObject()
+    linkObject.object_identifier = values.get("linkingObjectIdentifierValue")
+    linkObject.object_type = values.get("linkingObjectIdentifierType")
+    linkObject.object_role = values.get("linkingObjectRole")
+    return linkObject
+
+
+def premisEventXMLToFields(eventXML):
+    """
+    Event XML -> (dict of Event field values, linkingObjectIdentifier nodes)
+
+    Fields are read with the same xpath_map paths as updateObjectFromXML,
+    taking the first match in document order, but in a single pass over
+    the premis:event subtree.
+    """
+
+    fields = {}
+    linkingObjectIDNodes = []
+
+    def visit(node, path):
+        for child in node:
+            childPath = path + (child.tag,)
+            fieldName = EVENT_FIELD_PATHS.get(childPath)
+            if fieldName is not None and fieldName not in fields:
+                fields[fieldName] = child.text
+            elif childPath in EVENT_FIELD_PARENTS:
+                visit(child, childPath)
+            elif not path and isinstance(child.tag, str) and \
+                    etree.QName(child).localname == "linkingObjectIdentifier":
+                # Matched by local name in any namespace, like getNodesByName.
+                linkingObjectIDNodes.append(child)
+
+    visit(eventXML, ())
+    return fields, linkingObjectIDNodes
+
+
+def updateEventFromXML(eventXML, eventObject):
+    """
+    Event XML -> update the fields of an Event object
+    """
+
+    fields, _ = premisEventXMLToFields(eventXML)
+    for fieldName, value in fields.items():
+        setattr(eventObject, fieldName, value)
+    return eventObject
+
+
+def getOrCreateLinkObjects(linkObjects):
+    """
+    Unsaved LinkObjects -> dict of saved LinkObjects keyed by identifier
+
+    Existing rows are fetched with a single IN query and the missing ones
+    are written with a single bulk insert. Rows inserted concurrently by
+    another writer are ignored rather than raising an IntegrityError.
+    """
+
+    identifiers = set(lo.object_identifier for lo in linkObjects)
+    if not identifiers:
+        return {}
+    existing = LinkObject.objects.in_bulk(identifiers)
+    missing = collections.OrderedDict()
+    for linkObject in linkObjects:
+        if linkObject.object_identifier not in existing:
+            missing.setdefault(linkObject.object_identifier, linkObject)
+    if missing:
+        # bulk_create doesn't call save(), which sets the lookup key.
+        for linkObject in missing.values():
+            linkObject.object_key = normalize_object_identifier(linkObject.object_identifier)
+        LinkObject.objects.bulk_create(
+            list(missing.values()), ignore_conflicts=True
+        )
+        existing.update(missing)
+    return existing
+
+
+def _premisEventXMLToUnsavedObject(eventXML):
+    """
+    Event XML -> (submitted identifier, unsaved Event, unsaved LinkObjects)
+    """
+
+    if eventXML is None:
+        raise InvalidEventError('Event element missing in entry.')
+    fields, linkingObjectIDNodes = premisEventXMLToFields(eventXML)
+    newEventObject = Event(**fields)
+    submittedIdentifier = newEventObject.event_identifier
     try:
         uuid.UUID(newEventObject.event_identifier)
     except Exception:
         newEventObject.event_identifier = uuid.uuid4().hex
-    if not isinstance(newEventObject.event_date_time, datetime):
+    try:
         newEventObject.event_date_time = xsDateTime_parse(
             newEventObject.event_date_time
         )
-    newEventObject.save()
+    except InvalidXSDateTime as e:
+        raise InvalidEventError(
+            "Invalid eventDateTime for event '%s': %s" % (
+                submittedIdentifier, e
+            )
+        )
+    linkObjects = []
     for linkingObjectIDNode in linkingObjectIDNodes:
-        identifierValue = getValueByName(
-            linkingObjectIDNode, "linkingObjectIdentifierValue")
-        try:
-            linkObject = LinkObject.objects.get(
-                object_identifier=identifierValue
+        linkObject = premisLinkObjectXMLToObject(linkingObjectIDNode)
+        if not linkObject.object_identifier:
+            raise InvalidEventError(
+                "Missing linkingObjectIdentifierValue for event '%s'." % (
+                    submittedIdentifier,
+                )
             )
-        except LinkObject.DoesNotExist:
-            linkObject = LinkObject()
-            linkObject.object_identifier = identifierValue
-            linkObject.object_type = getValueByName(
-                linkingObjectIDNode, "linkingObjectIdentifierType")
-            linkObject.object_role = getValueByName(
-                linkingObjectIDNode, "linkingObjectRole")
-            linkObject.save()
-        except LinkObject.MultipleObjectsReturned:
-            linkObject = LinkObject.objects.filter(
-                object_identifier=identifierValue
-            )[0]
-        newEventObject.linking_objects.add(linkObject)
-    return newEventObject
+        linkObjects.append(linkObject)
+    return submittedIdentifier, newEventObject, linkObjects
+
+
+def premisEventXMLListToObjects(eventXMLList):
+    """
+    List of Event XML -> create Event objects in bulk
+
+    All of the events are written in a single transaction, with one query
+    for duplicate detection, one bulk insert for the events, two queries
+    to resolve the linking objects and one bulk insert for the links.
+
+    Returns a list holding, for each element of eventXMLList, either the
+    new Event or the DuplicateEventError/InvalidEventError that kept it
+    from being created. Entries the database rejects, such as one without
+    an eventType, get an InvalidEventError.
+    """
+
+    results = []
+    pending = []
+    for eventXML in eventXMLList:
+        try:
+            parsed = _premisEventXMLToUnsavedObject(eventXML)
+        except InvalidEventError as e:
+            results.append(e)
+            continue
+        results.append(None)
+        pending.append((len(results) - 1, parsed))
+    submittedIdentifiers = [p[1][0] for p in pending if p[1][0]]
+    seen = set(
+        Event.objects.filter(event_identifier__in=submittedIdentifiers)
+                     .values_list('event_identifier', flat=True)
+    )
+    submitted = {index: parsed[0] for index, parsed in pending}
+    newEvents = []
+    for index, (submittedIdentifier, newEventObject, linkObjects) in pending:
+        if submittedIdentifier and submittedIdentifier in seen:
+            results[index] = DuplicateEventError(submittedIdentifier)
+            continue
+        if submittedIdentifier == newEventObject.event_identifier:
+            # Replaced identifiers are new UUIDs, so only a kept identifier
+            # can be repeated later in the feed.
+            seen.add(submittedIdentifier)
+        results[index] = newEventObject
+        newEvents.append((newEventObject, linkObjects))
+    if not newEvents:
+        return results
+    try:
+        with transaction.atomic():
+            _bulkSaveEvents(newEvents)
+    except (IntegrityError, DataError):
+        # Another writer inserted one of these identifiers after our
+        # duplicate check, or an entry holds values the database rejects.
+        # Fall back to saving the events one at a time so each entry still
+        # gets its own result.
+        for index, eventXML in enumerate(eventXMLList):
+            if not isinstance(results[index], Event):
+                continue
+            try:
+                with transaction.atomic():
+                    results[index] = premisEventXMLToObject(eventXML)
+            except DuplicateEventError as e:
+                results[index] = e
+            except (IntegrityError, DataError) as e:
+                results[index] = InvalidEventError(
+                    "Event '%s' could not be saved: %s" % (submitted[index], e)
+                )
+    return results
+
+
+def _bulkSaveEvents(newEvents):
+    """
+    List of (unsaved Event, unsaved LinkObjects) -> saved rows
+    """
+
+    Event.objects.bulk_create([e for e, _ in newEvents])
+    # bulk_create doesn't send post_save, so count and roll up the events here.
+    Counter.objects.adjust(EVENT_COUNTER, len(newEvents))
+    EventRollup.objects.adjust_events([e for e, _ in newEvents])
+    _saveEventLinkObjects(newEvents)
+
+
+def _saveEventLinkObjects(newEvents):
+    """
+    List of (saved Event, unsaved LinkObjects) -> saved links between them
+    """
+
+    linkObjectMap = getOrCreateLinkObjects(
+        [lo for _, linkObjects in newEvents for lo in linkObjects]
+    )
+    eventLinkObjects = []
+    for newEventObject, linkObjects in newEvents:
+        linkIdentifiers = collections.OrderedDict(
+            (lo.object_identifier, None) for lo in linkObjects
+        )
+        for identifier in linkIdentifiers:
+            eventLinkObjects.append(EventLinkObject(
+                event_id_id=newEventObject.event_identifier,
+                linkobject_id_id=linkObjectMap[identifier].object_identifier,
+            ))
+    if eventLinkObjects:
+        EventLinkObject.objects.bulk_create(eventLinkObjects)
+        # bulk_create doesn't send m2m_changed, so note the latest events here.
+        LatestEvent.objects.record(latest_event_candidates(
+            [(e, [lo.object_identifier for lo in linkObjects]) for e, linkObjects in newEvents]
+        ))
 
 
 def premisAgentXMLToObject(agentXML):
@@ -117,7 +408,7 @@ def premisAgentXMLToObject(agentXML):
 
     # we need to make this xpath parseable, and not just raw text.
     entryRoot = etree.XML(agentXML)
-    agent_root = entryRoot.xpath('//premis:agent', namespaces=PREMIS_NSMAP)[0]
+    agent_root = XPATH_EVALUATORS['agent'](entryRoot)[0]
     # first, let's get the agent identifier and see if it exists already
     try:
         agent_object = premisAgentXMLgetObject(agent_root)
@@ -126,28 +417,27 @@ def premisAgentXMLToObject(agentXML):
         agent_object = Agent()
     try:
         # move to identifier node
-        agent_identifier = agent_root.xpath(
-            "//premis:agentIdentifierValue",
-            namespaces=PREMIS_NSMAP
+        agent_identifier = XPATH_EVALUATORS['agent_identifier'](
+            agent_root
         )[0].text.strip()
         agent_object.agent_identifier = agent_identifier
     except Exception as e:
         raise Exception("Unable to set 'agent_identifier' attribute: %s" % e)
     try:
-        agent_object.agent_name = agent_root.xpath(
-            "//premis:agentName", namespaces=PREMIS_NSMAP
+        agent_object.agent_name = XPATH_EVALUATORS['agent_name'](
+            agent_root
         )[0].text.strip()
     except Exception as e:
         raise Exception("Unable to set 'agent_name' attribute: %s" % e)
     try:
-        agent_object.agent_type = agent_root.xpath(
-            "//premis:agentType", namespaces=PREMIS_NSMAP
+        agent_object.agent_type = XPATH_EVALUATORS['agent_type'](
+            agent_root
         )[0].text.strip()
     except Exception as e:
         raise Exception("Unable to set 'agent_type' attribute: %s" % e)
     try:
-        agent_object.agent_note = agent_root.xpath(
-                "//premis:agentNote", namespaces=PREMIS_NSMAP
+        agent_object.agent_note = XPATH_EVALUATORS['agent_note'](
+            agent_root
         )[0].text.strip()
     except Exception:
         pass
@@ -163,15 +453,15 @@ def premisEventXMLgetObject(eventXML):
     identifierValue = None
     # Look for Event ID in entry metadata.
     try:
-        identifierValue = eventXML.xpath('//id')[0].text
+        identifierValue = XPATH_EVALUATORS['event_entry_id'](eventXML)[0].text
     except (etree.LxmlError, IndexError):
         pass
     # If no Event ID in entry metadata, look in
     # premis:event eventIdentifierValue element.
     if not identifierValue:
         try:
-            identifierValue = eventXML.xpath(
-                '//premis:eventIdentifierValue', namespaces=PREMIS_NSMAP
+            identifierValue = XPATH_EVALUATORS['event_identifier_value'](
+                eventXML
             )[0].text
         except (etree.LxmlError, IndexError):
             raise NoEventIdentifier('No event identifier in request XML.')
@@ -195,9 +485,9 @@ def premisAgentXMLgetObject(agentXML):
     """
     Agent XML -> existing object
     """
-    agent_xml = agentXML.xpath("//premis:agent", namespaces=PREMIS_NSMAP)[0]
-    agent_identifier = agent_xml.xpath(
-        "//premis:agentIdentifierValue", namespaces=PREMIS_NSMAP
+    agent_xml = XPATH_EVALUATORS['agent'](agentXML)[0]
+    agent_identifier = XPATH_EVALUATORS['agent_identifier'](
+        agent_xml
     )[0].text.strip()
     ExistingObject = get_object_or_404(
         Agent, agent_identifier=agent_identifier
@@ -205,54 +495,90 @@ def premisAgentXMLgetObject(agentXML):
     return ExistingObject
 
 
-def objectToPremisEventXML(eventObject):
+def _setEventText(node, value):
+    try:
+        node.text = value
+    except TypeError:
+        if isinstance(value, datetime):
+            if value.tzinfo is None:
+                value = localize_datetime(value)
+            node.text = xsDateTime_format(value)
+
+
+@timed('serialize')
+def objectToPremisEventXML(eventObject, linkingObjects=None):
     """
     Event Django Object -> XML
+
+    linkingObjects may be given to avoid querying for the event's linking
+    objects; see objectsToPremisEventXML.
     """
 
-    eventXML = etree.Element("%sevent" % PREMIS, nsmap=PREMIS_NSMAP)
-    for fieldName, chain in translateDict.items():
+    eventXML = etree.Element(PREMIS_EVENT_TAG, nsmap=PREMIS_NSMAP)
+    baseNodes = {}
+    for fieldName, baseTag, chainTags in EVENT_SKELETON:
         if not hasattr(eventObject, fieldName):
             continue
-        baseName = chain[0]
-        baseNode = getNodeByName(eventXML, baseName)
-        chain = chain[1:]
+        baseNode = baseNodes.get(baseTag)
         if baseNode is None:
-            baseNode = etree.SubElement(eventXML, PREMIS + baseName)
-        for i in range(len(chain)):
-            chainItem = chain[i]
-            parentNode = baseNode
-            baseNode = getNodeByName(eventXML, chainItem)
-            if baseNode is None:
-                baseNode = etree.SubElement(parentNode, PREMIS + chainItem)
-        try:
-            baseNode.text = getattr(eventObject, fieldName)
-        except TypeError:
-            value = getattr(eventObject, fieldName)
-            if isinstance(value, datetime):
-                if value.tzinfo is None:
-                    value = localize_datetime(value)
-                baseNode.text = xsDateTime_format(value)
-    linking_objects = eventObject.linking_objects.all()
-    for linking_object in linking_objects:
-        linkObjectIDXML = etree.SubElement(
-            eventXML, PREMIS + "linkingObjectIdentifier"
-        )
-        linkObjectIDTypeXML = etree.SubElement(
-            linkObjectIDXML, PREMIS + "linkingObjectIdentifierType"
-        )
-        linkObjectIDTypeXML.text = linking_object.object_type
-        linkObjectIDValueXML = etree.SubElement(
-            linkObjectIDXML, PREMIS + "linkingObjectIdentifierValue"
-        )
-        linkObjectIDValueXML.text = linking_object.object_identifier
-        linkObjectIDRoleXML = etree.SubElement(
-            linkObjectIDXML, PREMIS + "linkingObjectRole"
-        )
-        linkObjectIDRoleXML.text = linking_object.object_role
+            baseNode = baseNodes[baseTag] = etree.SubElement(eventXML, baseTag)
+        for chainTag in chainTags:
+            baseNode = etree.SubElement(baseNode, chainTag)
+        _setEventText(baseNode, getattr(eventObject, fieldName))
+    if linkingObjects is None:
+        linkingObjects = eventObject.linking_objects.all()
+    for linking_object in linkingObjects:
+        linkObjectIDXML = etree.SubElement(eventXML, LINKING_OBJECT_TAGS[0])
+        etree.SubElement(
+            linkObjectIDXML, LINKING_OBJECT_TAGS[1]
+        ).text = linking_object.object_type
+        etree.SubElement(
+            linkObjectIDXML, LINKING_OBJECT_TAGS[2]
+        ).text = linking_object.object_identifier
+        etree.SubElement(
+            linkObjectIDXML, LINKING_OBJECT_TAGS[3]
+        ).text = linking_object.object_role
     return eventXML
 
 
+def linkingObjectsByEvent(eventObjects):
+    """
+    List of Event Django Objects -> {event identifier: [LinkObject, ...]}
+
+    The linking objects of all of the events are fetched with one query
+    joined through EventLinkObject.
+    """
+
+    linkingObjects = {e.event_identifier: [] for e in eventObjects}
+    if not linkingObjects:
+        return linkingObjects
+    links = EventLinkObject.objects.filter(
+        event_id__in=list(linkingObjects)
+    ).select_related('linkobject_id')
+    for link in links:
+        linkingObjects[link.event_id_id].append(link.linkobject_id)
+    return linkingObjects
+
+
+@timed('serialize')
+def objectsToPremisEventXML(eventObjects, linkingObjects=None):
+    """
+    List of Event Django Objects -> list of XML
+
+    linkingObjects is a mapping as returned by linkingObjectsByEvent; it is
+    fetched for the events if not given.
+    """
+
+    eventObjects = list(eventObjects)
+    if linkingObjects is None:
+        linkingObjects = linkingObjectsByEvent(eventObjects)
+    return [
+        objectToPremisEventXML(e, linkingObjects.get(e.event_identifier, []))
+        for e in eventObjects
+    ]
+
+
+@timed('serialize')
 def objectToAgentXML(agentObject):
     """
     Agent Django object -> XML
@@ -275,11 +601,11 @@ def objectToAgentXML(agentObject):
     agentName = etree.SubElement(agentXML, PREMIS + "agentName")
     agentName.text = agentObject.agent_name
     agentType = etree.SubElement(agentXML, PREMIS + "agentType")
-    agentType.text = [tup for tup in AGENT_TYPE_CHOICES if
-                      tup[0] == agentObject.agent_type][0][1]
+    agentType.text = AGENT_TYPE_LABELS[agentObject.agent_type]
     return agentXML
 
 
+@timed('serialize')
 def objectToPremisAgentXML(agentObject, webRoot):
     """
     Agent Django object -> XML
@@ -301,6 +627,25 @@ def objectToPremisAgentXML(agentObject, webRoot):
     agentName = etree.SubElement(agentXML, PREMIS + "agentName")
     agentName.text = agentObject.agent_name
     agentType = etree.SubElement(agentXML, PREMIS + "agentType")
-    agentType.text = [tup for tup in AGENT_TYPE_CHOICES if
-                      tup[0] == agentObject.agent_type][0][1]
+    agentType.text = AGENT_TYPE_LABELS[agentObject.agent_type]
     return agentXML
+
+
+def makeMultiStatusXML(statuses):
+    """
+    List of (href, status code, description) -> DAV multistatus XML
+    """
+
+    multistatusXML = etree.Element(DAV + "multistatus", nsmap=DAV_NSMAP)
+    for href, status, description in statuses:
+        responseXML = etree.SubElement(multistatusXML, DAV + "response")
+        hrefXML = etree.SubElement(responseXML, DAV + "href")
+        hrefXML.text = href
+        statusXML = etree.SubElement(responseXML, DAV + "status")
+        statusXML.text = 'HTTP/1.1 %d %s' % (status, HTTPStatus(status).phrase)
+        if description:
+            descriptionXML = etree.SubElement(
+                responseXML, DAV + "responsedescription"
+            )
+            descriptionXML.text = description
+    return multistatusXML
@@ -7,6 +7,8 @@ These settings values will be used only if they are not found in the project
 settings.py module. If you want to override any of these values, just redefine
 them in that file rather than here.
 '''
+import os
+
 from django.conf import settings
 
 # Used in codalib/util.py
@@ -57,3 +59,80 @@ EVENT_TYPE_CHOICES = getattr(
 # Archival Resource Key Name Assigning Authority Number:
 # http://www.cdlib.org/services/uc3/naan_table.html
 ARK_NAAN = getattr(settings, 'ARK_NAAN', 67531)
+
+# Used in views.py and the ingest_spooled_events management command.
+# When enabled, APP/event/ spools POSTed entries to a local SQLite file and
+# returns 202 Accepted; the management command saves them in batches.
+PES_ASYNC_INGEST = getattr(settings, 'PES_ASYNC_INGEST', False)
+PES_INGEST_SPOOL_PATH = getattr(
+    settings, 'PES_INGEST_SPOOL_PATH',
+    os.path.join(str(getattr(settings, 'BASE_DIR', os.getcwd())),
+                 'pes_ingest_spool.sqlite3')
+)
+PES_INGEST_BATCH_SIZE = getattr(settings, 'PES_INGEST_BATCH_SIZE', 500)
+
+# Used in event_cache.py. 'local' keeps serialized events in a per-process
+# LRU cache of PES_EVENT_CACHE_MAX_ENTRIES entries; any other value is the
+# alias of a cache in CACHES. None disables the cache.
+PES_EVENT_CACHE = getattr(settings, 'PES_EVENT_CACHE', 'local')
+PES_EVENT_CACHE_MAX_ENTRIES = getattr(settings, 'PES_EVENT_CACHE_MAX_ENTRIES', 10000)
+
+# Used in models.py. How the total number of events is found for the event
+# list and unfiltered searches: 'counter' reads a count maintained as events
+# are added and deleted, 'estimated' uses the database's estimated row count
+# (PostgreSQL and MySQL only, otherwise the counter), and 'exact' runs COUNT(*).
+PES_EVENT_COUNT = getattr(settings, 'PES_EVENT_COUNT', 'counter')
+
+# Used in models.py. Agents are kept in memory by each process; the alias of
+# the cache in CACHES through which processes tell each other an agent has
+# changed. It must be shared by all processes, such as a memcached or Redis
+# cache, for changes to reach them at once. None skips the check. Either
+# way, each process reloads the agents once they are
+# PES_AGENT_REGISTRY_TIMEOUT seconds old; None keeps them until they change.
+PES_AGENT_REGISTRY_CACHE = getattr(settings, 'PES_AGENT_REGISTRY_CACHE', 'default')
+PES_AGENT_REGISTRY_TIMEOUT = getattr(settings, 'PES_AGENT_REGISTRY_TIMEOUT', 300)
+
+# Used in page_index.py. 'local' keeps the page boundary indexes of event
+# searches in a per-process cache, which is only kept up to date with a
+# single process; any other value is the alias of a cache in CACHES, which
+# must be shared when several processes serve. None pages through search
+# results with OFFSET instead.
+PES_PAGE_INDEX_CACHE = getattr(settings, 'PES_PAGE_INDEX_CACHE', 'local')
+# The most events read to build a search's page index within a request; a
+# search matching more is paged with OFFSET instead.
+PES_PAGE_INDEX_MAX_EVENTS = getattr(settings, 'PES_PAGE_INDEX_MAX_EVENTS', 100000)
+
+# Used in models.py. How the number of events matching a filtered search is
+# found: 'exact' runs COUNT(*), 'capped' stops counting past
+# PES_SEARCH_COUNT_CAP events and reports the cap as a lower bound, and
+# 'estimated' sums the daily event rollups (or, for linked object searches,
+# reads PostgreSQL's row estimate), otherwise counting as 'capped' does.
+PES_SEARCH_COUNT = getattr(settings, 'PES_SEARCH_COUNT', 'capped')
+PES_SEARCH_COUNT_CAP = getattr(settings, 'PES_SEARCH_COUNT_CAP', 10000)
+
+# Used in timing.py. Whether ServerTimingMiddleware sends the breakdown of
+# each request's time back in a Server-Timing header; it is logged either way.
+PES_SERVER_TIMING_HEADER = getattr(settings, 'PES_SERVER_TIMING_HEADER', True)
+
+# Used in metrics.py. Whether requests, ingested events and event cache
+# lookups are counted at all. PES_METRICS_PATH is the SQLite file the worker
+# processes on a host add their counts to, so metrics/ reports the totals of
+# all of them; None (the default) keeps each process's counts to itself.
+# Each process adds its counts to the file every PES_METRICS_FLUSH_INTERVAL
+# seconds from a background thread.
+PES_METRICS_ENABLED = getattr(settings, 'PES_METRICS_ENABLED', False)
+PES_METRICS_PATH = getattr(settings, 'PES_METRICS_PATH', None)
+PES_METRICS_FLUSH_INTERVAL = getattr(settings, 'PES_METRICS_FLUSH_INTERVAL', 10)
+
+# Used in slow_queries.py. SlowQueryMiddleware records the queries taking
+# longer than PES_SLOW_QUERY_THRESHOLD seconds to a SQLite file, keeping the
+# last PES_SLOW_QUERY_LIMIT of them, and saves the EXPLAIN plan of the given
+# share of them.
+PES_SLOW_QUERY_THRESHOLD = getattr(settings, 'PES_SLOW_QUERY_THRESHOLD', 0.5)
+PES_SLOW_QUERY_EXPLAIN_RATE = getattr(settings, 'PES_SLOW_QUERY_EXPLAIN_RATE', 0.1)
+PES_SLOW_QUERY_LIMIT = getattr(settings, 'PES_SLOW_QUERY_LIMIT', 1000)
+PES_SLOW_QUERY_PATH = getattr(
+    settings, 'PES_SLOW_QUERY_PATH',
+    os.path.join(str(getattr(settings, 'BASE_DIR', os.getcwd())),
+                 'pes_slow_queries.sqlite3')
+)
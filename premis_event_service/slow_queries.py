@@ -0,0 +1,202 @@
+"""
+A log of slow database queries, for finding them under production load.
+
+Add 'premis_event_service.slow_queries.SlowQueryMiddleware' to MIDDLEWARE
+to record every query of a request that takes longer than
+PES_SLOW_QUERY_THRESHOLD seconds, with the view that made it. A share
+(PES_SLOW_QUERY_EXPLAIN_RATE) of the slow SELECTs are run again under
+EXPLAIN and their plans kept with them. The queries go in a SQLite file at
+PES_SLOW_QUERY_PATH holding the last PES_SLOW_QUERY_LIMIT of them, which
+the pes_slow_queries management command browses.
+"""
+import logging
+import random
+import re
+import sqlite3
+import time
+from contextlib import closing
+
+from django.db import DatabaseError, transaction
+
+from premis_event_service import settings
+from premis_event_service.timing import instrument_queries, untracked_queries
+
+logger = logging.getLogger(__name__)
+
+# Longest SQL and parameters kept for a query.
+MAX_SQL_LENGTH = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS slow_query (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recorded REAL NOT NULL,
+    duration REAL NOT NULL,
+    view TEXT,
+    method TEXT,
+    path TEXT,
+    fingerprint TEXT NOT NULL,
+    sql TEXT NOT NULL,
+    params TEXT,
+    plan TEXT
+);
+CREATE INDEX IF NOT EXISTS slow_query_fingerprint ON slow_query (fingerprint);
+"""
+
+
+def fingerprint(sql):
+    """Return the SQL with its values and IN lists collapsed."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'%s|\b\d+\b', '?', sql)
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(...)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+class SlowQueryLog(object):
+    """
+    The last `limit` slow queries, kept in a SQLite file.
+    """
+
+    def __init__(self, path, limit=1000, timeout=30):
+        self.path = path
+        self.limit = limit
+        self.timeout = timeout
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return closing(conn)
+
+    def add(self, duration, sql, params=None, view=None, method=None, path=None,
+            plan=None):
+        """Record a query, dropping the oldest beyond the limit."""
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                query_id = conn.execute(
+                    'INSERT INTO slow_query (recorded, duration, view, method, path, '
+                    'fingerprint, sql, params, plan) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (time.time(), duration, view, method, path, fingerprint(sql),
+                     sql[:MAX_SQL_LENGTH],
+                     None if params is None else repr(params)[:MAX_SQL_LENGTH], plan)
+                ).lastrowid
+                conn.execute('DELETE FROM slow_query WHERE id <= ?', (query_id - self.limit,))
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+        return query_id
+
+    def recent(self, count=20, view=None):
+        """Return the last `count` queries, newest first."""
+        where, args = ('WHERE view = ?', [view]) if view else ('', [])
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT * FROM slow_query %s ORDER BY id DESC LIMIT ?' % where,
+                args + [count]
+            ).fetchall()
+
+    def get(self, query_id):
+        """Return a recorded query, or None."""
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT * FROM slow_query WHERE id = ?', (query_id,)
+            ).fetchone()
+
+    def summary(self, view=None):
+        """
+        Return the queries grouped by view and fingerprint, slowest in total
+        first, with the id of the latest query in each group with a plan.
+        """
+        where, args = ('WHERE view = ?', [view]) if view else ('', [])
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT view, fingerprint, COUNT(*) AS count, '
+                'SUM(duration) AS total, MAX(duration) AS slowest, '
+                'MAX(CASE WHEN plan IS NOT NULL THEN id END) AS plan_id '
+                'FROM slow_query %s GROUP BY view, fingerprint '
+                'ORDER BY total DESC' % where,
+                args
+            ).fetchall()
+
+    def clear(self):
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM slow_query').rowcount
+
+
+_log = None
+
+
+def get_slow_query_log():
+    """Return the log configured by PES_SLOW_QUERY_PATH."""
+    global _log
+    if _log is None or _log.path != settings.PES_SLOW_QUERY_PATH:
+        _log = SlowQueryLog(settings.PES_SLOW_QUERY_PATH, settings.PES_SLOW_QUERY_LIMIT)
+    return _log
+
+
+def explain(connection, sql, params):
+    """Return the plan of a query, as lines of the backend's EXPLAIN output."""
+    prefix = connection.ops.explain_query_prefix()
+    # In a savepoint, so a failed EXPLAIN doesn't break the transaction.
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute('%s %s' % (prefix, sql), params)
+            rows = cursor.fetchall()
+    return '\n'.join(' '.join(str(column) for column in row) for row in rows)
+
+
+class SlowQueryRecorder(object):
+    """
+    RequestQueries listener recording the slow queries of a request.
+    """
+
+    def __init__(self, request=None, threshold=0.5, explain_rate=0.1):
+        self.request = request
+        self.threshold = threshold
+        self.explain_rate = explain_rate
+
+    def __call__(self, connection, sql, params, many, duration):
+        if duration >= self.threshold:
+            self.record(connection, duration, sql, params, many)
+
+    def record(self, connection, duration, sql, params, many):
+        plan = None
+        if (not many and sql.lstrip()[:6].upper() == 'SELECT'
+                and random.random() < self.explain_rate):
+            # Not itself recorded, nor counted as one of the request's.
+            try:
+                with untracked_queries():
+                    plan = explain(connection, sql, params)
+            except DatabaseError as e:
+                plan = 'EXPLAIN failed: %s' % e
+        match = getattr(self.request, 'resolver_match', None)
+        try:
+            get_slow_query_log().add(
+                duration, sql, params,
+                view=match.view_name if match else None,
+                method=getattr(self.request, 'method', None),
+                path=getattr(self.request, 'path', None),
+                plan=plan,
+            )
+        except sqlite3.Error:
+            logger.warning('Could not record a slow query', exc_info=True)
+
+
+class SlowQueryMiddleware(object):
+    """Records the slow queries made while handling each request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = SlowQueryRecorder(
+            request, settings.PES_SLOW_QUERY_THRESHOLD, settings.PES_SLOW_QUERY_EXPLAIN_RATE
+        )
+        with instrument_queries() as queries:
+            queries.listeners.append(recorder)
+            try:
+                return self.get_response(request)
+            finally:
+                queries.listeners.remove(recorder)
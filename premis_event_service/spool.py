@@ -0,0 +1,165 @@
+"""
+A durable local spool for asynchronous event ingest.
+
+When asynchronous ingest is enabled, APP/event/ appends each POSTed entry
+to a SQLite file on local disk and answers 202 Accepted straight away. The
+ingest_spooled_events management command drains the spool in batches,
+so the database sees a few group commits instead of thousands of tiny
+transactions.
+"""
+import sqlite3
+import time
+
+from premis_event_service import settings
+
+PENDING = 'pending'
+CLAIMED = 'claimed'
+CREATED = 'created'
+DUPLICATE = 'duplicate'
+INVALID = 'invalid'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spooled_entry (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    body BLOB NOT NULL,
+    status TEXT NOT NULL,
+    event_identifier TEXT,
+    message TEXT,
+    received REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS spooled_entry_status
+    ON spooled_entry (status, updated);
+"""
+
+
+class IngestSpool(object):
+    """
+    Append-only queue of Atom entries stored in a SQLite file.
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path, timeout=self.timeout, isolation_level=None
+        )
+        conn.row_factory = sqlite3.Row
+        return _Connection(conn)
+
+    def append(self, body):
+        """Spool an entry and return its id."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT INTO spooled_entry (body, status, received, updated) '
+                'VALUES (?, ?, ?, ?)',
+                (body, PENDING, now, now)
+            )
+            return cursor.lastrowid
+
+    def get(self, spool_id):
+        """Return the row for a spooled entry, or None."""
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT id, status, event_identifier, message, received, updated '
+                'FROM spooled_entry WHERE id = ?',
+                (spool_id,)
+            ).fetchone()
+
+    def claim(self, batch_size, claim_timeout=300):
+        """
+        Claim up to batch_size pending entries and return (id, body) rows.
+
+        Entries claimed by a worker that hasn't completed them within
+        claim_timeout seconds are considered abandoned and are claimed again.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = conn.execute(
+                    'SELECT id, body FROM spooled_entry '
+                    'WHERE status = ? OR (status = ? AND updated < ?) '
+                    'ORDER BY id LIMIT ?',
+                    (PENDING, CLAIMED, now - claim_timeout, batch_size)
+                ).fetchall()
+                conn.executemany(
+                    'UPDATE spooled_entry SET status = ?, updated = ? WHERE id = ?',
+                    [(CLAIMED, now, row['id']) for row in rows]
+                )
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+        return rows
+
+    def complete(self, outcomes):
+        """
+        Record the outcome of claimed entries.
+
+        outcomes is a list of (id, status, event_identifier, message).
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                'UPDATE spooled_entry SET status = ?, event_identifier = ?, '
+                'message = ?, updated = ?, body = ? WHERE id = ?',
+                [(status, identifier, message, now, b'', spool_id)
+                 for spool_id, status, identifier, message in outcomes]
+            )
+            conn.execute('COMMIT')
+
+    def release(self, spool_ids):
+        """Return claimed entries to the pending state."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                'UPDATE spooled_entry SET status = ?, updated = ? WHERE id = ?',
+                [(PENDING, now, spool_id) for spool_id in spool_ids]
+            )
+
+    def prune(self, max_age):
+        """Delete finished entries last updated more than max_age seconds ago."""
+        with self._connect() as conn:
+            return conn.execute(
+                'DELETE FROM spooled_entry WHERE status NOT IN (?, ?) '
+                'AND updated < ?',
+                (PENDING, CLAIMED, time.time() - max_age)
+            ).rowcount
+
+    def pending_count(self):
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT COUNT(*) FROM spooled_entry WHERE status IN (?, ?)',
+                (PENDING, CLAIMED)
+            ).fetchone()[0]
+
+
+class _Connection(object):
+    """Context manager that closes a sqlite3 connection on exit."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *exc_info):
+        self.conn.close()
+
+
+_spool = None
+
+
+def get_spool():
+    """Return the spool configured by PES_INGEST_SPOOL_PATH."""
+    global _spool
+    if _spool is None or _spool.path != settings.PES_INGEST_SPOOL_PATH:
+        _spool = IngestSpool(settings.PES_INGEST_SPOOL_PATH)
+    return _spool
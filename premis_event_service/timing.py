@@ -0,0 +1,194 @@
+"""
+Per-request timing of database queries, XML parsing, serialization and
+template rendering.
+
+Add 'premis_event_service.timing.ServerTimingMiddleware' to MIDDLEWARE to
+time every request. The breakdown is sent back in a Server-Timing header
+(unless PES_SERVER_TIMING_HEADER is False) and logged as a line of JSON to
+the premis_event_service.timing logger at INFO.
+
+The phases are marked in views.py and presentation.py with phase() and
+timed(), which cost a context variable lookup when no request is being
+timed. Phases can overlap: the database time includes queries made while
+serializing, for example. A streamed response is timed up to the point it
+starts streaming.
+
+Queries are timed by a single connection.execute_wrapper per request,
+installed by instrument_queries(), which the timing, metrics and slow
+query middleware all share rather than each wrapping every query.
+"""
+import collections
+import contextvars
+import functools
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+from premis_event_service import settings
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('pes_request_timing', default=None)
+_queries = contextvars.ContextVar('pes_request_queries', default=None)
+
+
+class RequestQueries(object):
+    """
+    connection.execute_wrapper timing every query of a request. Each
+    listener is called as listener(connection, sql, params, many, seconds)
+    after a query.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.listeners = []
+        self.tracking = True
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.tracking:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - started
+            self.count += 1
+            self.seconds += seconds
+            for listener in list(self.listeners):
+                listener(context['connection'], sql, params, many, seconds)
+
+
+@contextmanager
+def instrument_queries():
+    """
+    Time the queries made in the block, returning the RequestQueries. The
+    wrapper is installed on every connection by the outermost block only;
+    nested blocks share it, so count and seconds include the queries made
+    before they started.
+    """
+    queries = _queries.get()
+    if queries is not None:
+        yield queries
+        return
+    queries = RequestQueries()
+    token = _queries.set(queries)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            yield queries
+    finally:
+        _queries.reset(token)
+
+
+@contextmanager
+def untracked_queries():
+    """
+    Leave the queries made in the block, such as the instrumentation's own,
+    out of the request's count and time, and don't pass them to listeners.
+    """
+    queries = _queries.get()
+    if queries is None or not queries.tracking:
+        yield
+        return
+    queries.tracking = False
+    try:
+        yield
+    finally:
+        queries.tracking = True
+
+
+class RequestTiming(object):
+    """Seconds spent in each phase of a request."""
+
+    def __init__(self):
+        self.phases = collections.OrderedDict()
+        self.active = set()
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def header(self, total, db=0.0, queries=0):
+        """Return the Server-Timing header value."""
+        metrics = ['db;dur=%.1f;desc="%d queries"' % (db * 1000, queries)]
+        metrics.extend(
+            '%s;dur=%.1f' % (name, seconds * 1000) for name, seconds in self.phases.items()
+        )
+        metrics.append('total;dur=%.1f' % (total * 1000))
+        return ', '.join(metrics)
+
+
+@contextmanager
+def phase(name):
+    """
+    Add the time spent in the block to the named phase of the request being
+    timed. Blocks of a phase nested within the same phase are not counted
+    twice.
+    """
+    timing = _current.get()
+    if timing is None or name in timing.active:
+        yield
+        return
+    timing.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.active.discard(name)
+        timing.add(name, time.perf_counter() - started)
+
+
+def timed(name):
+    """Decorator adding the time spent in a function to the named phase."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return function(*args, **kwargs)
+            with phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class ServerTimingMiddleware(object):
+    """Times each request and reports the breakdown."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = RequestTiming()
+        token = _current.set(timing)
+        started = time.perf_counter()
+        try:
+            with instrument_queries() as queries:
+                count, seconds = queries.count, queries.seconds
+                response = self.get_response(request)
+                db = queries.seconds - seconds
+                count = queries.count - count
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+        if settings.PES_SERVER_TIMING_HEADER:
+            response['Server-Timing'] = timing.header(total, db, count)
+        if logger.isEnabledFor(logging.INFO):
+            match = getattr(request, 'resolver_match', None)
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'streaming': response.streaming,
+                'total_ms': round(total * 1000, 1),
+                'db_ms': round(db * 1000, 1),
+                'queries': count,
+            }
+            for name, seconds in timing.phases.items():
+                record['%s_ms' % name] = round(seconds * 1000, 1)
+            logger.info(json.dumps(record), extra={'timing': record})
+        return response
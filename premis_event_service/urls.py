@@ -5,11 +5,16 @@ urlpatterns = [
     path('APP/', views.app, name='app'),
     path('APP/event/', views.app_event, name='app-event'),
     path('APP/event/<identifier>/', views.app_event, name='app-event-detail'),
+    path('APP/event/spool/<int:spool_id>/', views.app_event_spool, name='app-event-spool'),
     path('APP/agent/', views.app_agent, name='app-agent'),
     path('APP/agent/<identifier>/', views.app_agent, name='app-agent-detail'),
     path('event/', views.recent_event_list, name='event-list'),
     path('event/search/', views.event_search, name='event-search'),
     path('event/search.json', views.json_event_search, name='event-search-json'),
+    path('event/stats.json', views.json_event_stats, name='event-stats-json'),
+    path('event/export.ndjson', views.event_export, {'format': 'ndjson'},
+         name='event-export-ndjson'),
+    path('event/export.xml', views.event_export, {'format': 'xml'}, name='event-export-xml'),
     re_path(r'^event/find/(?P<linked_identifier>.+?)/(?P<event_type>.+?)?/$',
             views.findEvent, name='find-event'),
     path('event/<identifier>/', views.humanEvent, name='event-detail'),
@@ -18,4 +23,5 @@ urlpatterns = [
     path('agent/<identifier>.premis.xml', views.agentXML, name='agent-detail-premis-xml'),
     path('agent/<identifier>.json', views.json_agent, name='agent-detail-json'),
     path('agent/<identifier>/', views.humanAgent, name='agent-detail'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
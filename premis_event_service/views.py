@@ -1,5 +1,8 @@
 import re
 import math
+import base64
+import hashlib
+from calendar import timegm
 from datetime import datetime
 import json
 import urllib.parse
@@ -9,30 +12,336 @@ from django.conf import settings
 from django.urls import reverse
 from django.core.paginator import Paginator, EmptyPage
 from django.core.exceptions import FieldError
-from django.http import (HttpResponse, HttpResponseBadRequest,
-                         HttpResponseNotFound)
-from django.db.utils import IntegrityError
+from django.db.models import F, Q, Subquery, Sum
+from django.db.models.functions import TruncWeek, TruncMonth, TruncYear
+from django.http import (Http404, HttpResponse, HttpResponseBadRequest,
+                         HttpResponseNotFound, StreamingHttpResponse)
+from django.db.utils import DataError, IntegrityError
 from django.shortcuts import render, get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 
 from codalib import APP_AUTHOR as CODALIB_APP_AUTHOR
-from codalib.bagatom import (makeObjectFeed, addObjectFromXML,
-                             updateObjectFromXML, wrapAtom, makeServiceDocXML,)
+from codalib.bagatom import (makeObjectFeed, wrapAtom, makeServiceDocXML,
+                             getNodeByName, getNodesByName, ATOM)
 from codalib.xsdatetime import xsDateTime_parse
-from .forms import EventSearchForm
-from .models import Event, Agent, AGENT_TYPE_CHOICES
+from .forms import EventSearchForm, EventStatsForm
+from .models import (Event, EventLinkObject, EventRollup, LatestEvent, Agent,
+                     Counter, EVENT_COUNTER, normalize_object_identifier)
 from .presentation import (premisEventXMLToObject, premisAgentXMLToObject,
                            premisAgentXMLgetObject, objectToPremisEventXML,
                            objectToPremisAgentXML, objectToAgentXML,
-                           DuplicateEventError, PREMIS_NSMAP, xpath_map)
-from .settings import ARK_NAAN
+                           premisEventXMLListToObjects, makeMultiStatusXML,
+                           entryXMLToPremisEventXML, updateEventFromXML,
+                           linkingObjectsByEvent, objectsToPremisEventXML,
+                           DuplicateEventError, InvalidEventError,
+                           XPATH_EVALUATORS, PREMIS_NSMAP)
+from .settings import ARK_NAAN, PES_ASYNC_INGEST
+from .spool import get_spool
+from .timing import phase, timed
+from . import event_cache, page_index, settings as pes_settings
+from .metrics import count_ingested, exposition, get_metrics
 
 ARK_ID_REGEX = re.compile(r'ark:/'+str(ARK_NAAN)+r'/\w.*')
 MAINTENANCE_MSG = settings.MAINTENANCE_MSG
-EVENT_UPDATE_TRANSLATION_DICT = xpath_map
 XML_HEADER = b"<?xml version=\"1.0\"?>\n%s"
 
+# Building Atom documents counts as serialization in request timings.
+makeObjectFeed = timed('serialize')(makeObjectFeed)
+wrapAtom = timed('serialize')(wrapAtom)
+render = timed('render')(render)
+
+
+@timed('serialize')
+def xml_document(element):
+    """Return an element as a pretty printed XML document."""
+    return XML_HEADER % etree.tostring(element, pretty_print=True)
+
+
 EVENT_SEARCH_PER_PAGE = 200
 
+# The only Event columns json_event_search needs.
+JSON_EVENT_SEARCH_FIELDS = (
+    'ordinal', 'event_identifier', 'event_type', 'event_outcome',
+    'event_date_time',
+)
+JSON_CHUNK_SIZE = 8192
+
+# Events read per query by event_export.
+EVENT_EXPORT_CHUNK_SIZE = 1000
+
+# Fields the APP/event/ feed can be ordered by in cursor mode. Each page
+# is keyed on (field, ordinal), so the field needs no unique index.
+CURSOR_ORDER_FIELDS = (
+    'ordinal', 'event_added', 'event_date_time', 'event_identifier',
+    'event_type', 'event_outcome',
+)
+
+
+class EventFeedPaginator(Paginator):
+    """
+    Paginator that evaluates each page once, so the events on a page can
+    be serialized together before makeObjectFeed asks for them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pages = {}
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if number not in self._pages:
+            page = super().page(number)
+            page.object_list = list(page.object_list)
+            self._pages[number] = page
+        return self._pages[number]
+
+
+def encode_feed_cursor(event, order_field, backwards=False):
+    """
+    Return an opaque token for the feed page after (or, going backwards,
+    before) the given event.
+    """
+    value = getattr(event, order_field)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    data = json.dumps([order_field, value, event.ordinal, backwards])
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_feed_cursor(token):
+    """
+    Return (order_field, value, ordinal, backwards) from a cursor token,
+    raising ValueError if the token is malformed.
+    """
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        order_field, value, ordinal, backwards = json.loads(data)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor.')
+    if order_field not in CURSOR_ORDER_FIELDS or not isinstance(ordinal, int):
+        raise ValueError('Invalid cursor.')
+    return order_field, value, ordinal, bool(backwards)
+
+
+def cursor_page(events, order_field, descending, cursor=None, per_page=20):
+    """
+    Return (events on the page, has previous page, has next page) for a
+    page of events ordered by (order_field, ordinal).
+
+    Rather than counting and offsetting, the page is read from just past
+    the cursor's position, so deep pages cost the same as the first.
+    """
+    backwards = False
+    if cursor:
+        _, value, ordinal, backwards = cursor
+        # Going backwards, read the page before the cursor in reverse order.
+        after = 'lt' if descending != backwards else 'gt'
+        if order_field == 'ordinal':
+            keyset = Q(**{'ordinal__' + after: ordinal})
+        else:
+            keyset = Q(**{order_field + '__' + after: value}) | Q(
+                **{order_field: value, 'ordinal__' + after: ordinal}
+            )
+        events = events.filter(keyset)
+    fields = [order_field] if order_field == 'ordinal' else [order_field, 'ordinal']
+    if descending != backwards:
+        fields = ['-' + f for f in fields]
+    # One extra row tells us whether there is anything beyond this page.
+    page_events = list(events.order_by(*fields)[:per_page + 1])
+    has_more = len(page_events) > per_page
+    page_events = page_events[:per_page]
+    if backwards:
+        page_events.reverse()
+        return page_events, has_more, True
+    return page_events, cursor is not None, has_more
+
+
+def set_feed_link(feedXML, rel, href):
+    """Set the href of the feed's link with the given rel, adding it if needed."""
+    for link in feedXML.findall(ATOM + 'link'):
+        if link.get('rel') == rel:
+            break
+    else:
+        link = etree.Element(ATOM + 'link', rel=rel)
+        feedXML.findall(ATOM + 'link')[-1].addnext(link)
+    if href is None:
+        feedXML.remove(link)
+    else:
+        link.set('href', href)
+
+
+def app_event_cursor_feed(request, events, page_xml_function):
+    """
+    Return the APP/event/ feed paged by cursor tokens instead of page
+    numbers.
+    """
+    order_field = request.GET.get('orderby') or 'ordinal'
+    if order_field not in CURSOR_ORDER_FIELDS:
+        return HttpResponseBadRequest(
+            'Cursor paging can only order by: %s.\n' % ', '.join(CURSOR_ORDER_FIELDS),
+            content_type='text/plain'
+        )
+    if request.GET.get('orderdir'):
+        descending = request.GET.get('orderdir') == 'descending'
+    else:
+        # Newest first, unless ordering by some other field.
+        descending = order_field == 'ordinal'
+    cursor = None
+    if request.GET.get('cursor'):
+        try:
+            cursor = decode_feed_cursor(request.GET['cursor'])
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e) + '\n', content_type='text/plain')
+        if cursor[0] != order_field:
+            return HttpResponseBadRequest(
+                'The cursor does not match the requested order.\n',
+                content_type='text/plain'
+            )
+    page_events, has_previous, has_next = cursor_page(
+        events, order_field, descending, cursor, EVENT_SEARCH_PER_PAGE
+    )
+    etag = feed_page_etag(request, page_events, has_previous, has_next)
+    notModified = not_modified_response(request, etag)
+    if notModified is not None:
+        return notModified
+    if request.method == 'HEAD':
+        return set_validators(HttpResponse(content_type="application/atom+xml"), etag)
+    page_xml = page_xml_function(page_events)
+    webRoot = '%s://%s' % (request.scheme, request.META.get('HTTP_HOST'))
+    atomFeed = makeObjectFeed(
+        paginator=Paginator(page_events, EVENT_SEARCH_PER_PAGE),
+        objectToXMLFunction=lambda e: page_xml[e.pk],
+        feedId=request.path[1:],
+        webRoot=webRoot,
+        title="Event Entry Feed",
+        idAttr="event_identifier",
+        nameAttr="event_identifier",
+        dateAttr="event_date_time",
+        request=request,
+    )
+
+    def cursor_href(token):
+        args = request.GET.copy()
+        args.pop('page', None)
+        args['cursor'] = token
+        return '%s%s?%s' % (webRoot, request.path, args.urlencode())
+
+    # Finding the last page would need the count this mode avoids.
+    set_feed_link(atomFeed, 'last', None)
+    set_feed_link(atomFeed, 'first', cursor_href(''))
+    set_feed_link(
+        atomFeed, 'previous',
+        cursor_href(encode_feed_cursor(page_events[0], order_field, True))
+        if has_previous and page_events else None
+    )
+    set_feed_link(
+        atomFeed, 'next',
+        cursor_href(encode_feed_cursor(page_events[-1], order_field))
+        if has_next else None
+    )
+    atomFeedText = xml_document(atomFeed)
+    return set_validators(
+        HttpResponse(atomFeedText, content_type="application/atom+xml"), etag
+    )
+
+
+def make_etag(*parts):
+    """
+    Return a weak entity tag for a representation built from the given
+    values. It is weak because the Atom documents carry the time they were
+    generated, so equivalent responses are not byte for byte identical.
+    """
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return 'W/"%s"' % digest
+
+
+def epoch_seconds(value):
+    """
+    Return a datetime as seconds since the epoch. Naive values, as stored
+    with USE_TZ off, are in the current time zone.
+    """
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return timegm(value.utctimetuple())
+
+
+def set_validators(response, etag, last_modified=None):
+    """Set the ETag and, if given, Last-Modified headers of a response."""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(epoch_seconds(last_modified))
+    return response
+
+
+def not_modified_response(request, etag, last_modified=None):
+    """
+    Return a 304 Not Modified response if the request's If-None-Match or
+    If-Modified-Since header shows the client already has this version of
+    the representation, otherwise None.
+
+    Views call this once they know the validators but before serializing
+    anything, so a match costs no more than the lookup itself.
+    """
+    response = get_conditional_response(
+        request, etag=etag,
+        last_modified=(epoch_seconds(last_modified)
+                       if last_modified is not None else None),
+    )
+    if response is None:
+        return None
+    return set_validators(response, etag, last_modified)
+
+
+def feed_etag(request):
+    """
+    Return the entity tag of a page-numbered APP/event/ feed from the
+    state of the whole event table: its event counter, newest ordinal and
+    latest event_added. Adding, updating or deleting any event changes one
+    of them, and they are read in one query of index lookups rather than
+    by counting the feed and reading the page.
+    """
+    state = Counter.objects.filter(name=EVENT_COUNTER).annotate(
+        newest=Subquery(Event.objects.order_by('-ordinal').values('ordinal')[:1]),
+        changed=Subquery(Event.objects.order_by('-event_added').values('event_added')[:1]),
+    ).values_list('value', 'newest', 'changed')
+    state = next(iter(state), None)
+    if state is None:
+        # The counter isn't initialized yet; this does it.
+        Counter.objects.value(EVENT_COUNTER, Event.objects.all())
+        return feed_etag(request)
+    return make_etag(request.get_full_path(), *state)
+
+
+def feed_page_etag(request, page_events, *page_state):
+    """
+    Return the entity tag of an APP/event/ feed page from the ordinal
+    bounds and latest event_added of the events on it, plus whatever else
+    decides the page's links (the event count, or whether there are
+    neighbouring pages).
+    """
+    ordinals = [e.ordinal for e in page_events]
+    return make_etag(
+        request.get_full_path(),
+        len(page_events),
+        min(ordinals, default=None),
+        max(ordinals, default=None),
+        max((e.event_added for e in page_events), default=None),
+        page_state,
+    )
+
+
+def agent_etag(request, agentObject):
+    """Return the entity tag of a representation of an agent."""
+    return make_etag(
+        request.path,
+        agentObject.agent_identifier,
+        agentObject.agent_name,
+        agentObject.agent_type,
+        agentObject.agent_note,
+    )
+
 
 def get_request_body(request):
     """Get a request's body (POST data). Works with all Django versions."""
@@ -75,7 +384,7 @@ def app(request):
         "Atom Publishing Protocol (APP) Interface",
         collections
     )
-    serviceXMLText = XML_HEADER % etree.tostring(serviceXML, pretty_print=True)
+    serviceXMLText = xml_document(serviceXML)
     resp = HttpResponse(serviceXMLText, content_type="application/atom+xml")
     return resp
 
@@ -96,106 +405,107 @@ def humanEvent(request, identifier=None):
     )
 
 
-def last_page_ordinal(query_set, per_page=20):
-    # To evaluate the queryset, you have to iterate
-    # or use a step in the slice. And if you don't
-    # evaluate the queryset, you can't get the
-    # ordinal of the last item in the result set.
+def request_ordinal(request):
+    """Return the min_ordinal given in the query string, or None."""
     try:
-        evt = query_set.order_by('ordinal')[0:per_page:1][-1]
-    except Exception:
-        return 0
-    return evt.ordinal
-
-
-def get_page_offsets(query_set, page, page_range, page_lims, per_page=20):
-    """
-    Returns a tuple of tuples of form (page, ordinal) for accurate paging even
-    in the event that autoincremented ordinals are sparse.
-    """
-    if not page_range:
-        return ((1, ''),)
-    page_min_ord, page_max_ord = page_lims
-    p0 = page_range[0]
-    pN = page_range[-1]
-    query_set = query_set.only('ordinal')
-    limit = (page-p0+1) * per_page
-    ordinals = []
-    if limit:
-        offset_qs = query_set.filter(ordinal__gte=page_max_ord).order_by('ordinal')[0:limit]
-        ordinals = [evt.ordinal for ei, evt in enumerate(offset_qs) if ei and not ei % per_page]
-        ordinals = ordinals[::-1]
-    offsets_lo = [p for p in page_range if p < page]
-    offsets_lo = list(zip(offsets_lo, ordinals))
-    limit = (pN-page+1) * per_page if pN > page else 1
-    ordinals = []
-    if limit:
-        offset_qs = query_set.filter(ordinal__lte=page_max_ord).order_by('-ordinal')[0:limit]
-        ordinals = [evt.ordinal for ei, evt in enumerate(offset_qs) if not ei % per_page]
-    offsets_hi = [p for p in page_range if p >= page]
-    offsets_hi = list(zip(offsets_hi, ordinals))
-    return tuple(offsets_lo+offsets_hi)
-
-
-def paginate_events(valid, request, per_page=20):
-    total_events = None
-    events = None
+        return int(request.GET['min_ordinal'])
+    except (KeyError, ValueError):
+        return None
+
+
+def paginate_events(valid, request, per_page=20, fields=None):
+    """
+    Page through the events matching the search form's cleaned data.
+
+    If fields is given, only those columns are loaded and linking objects
+    are not prefetched. An unfiltered search given a min_ordinal, the
+    ordinal of the newest event on the page, reads the page with a seek on
+    it; the previous, next and last page links of unfiltered searches
+    carry one (prev_page_ord, next_page_ord, last_page_ord). Other pages
+    past the first are read through the search's page index, or with
+    OFFSET if the search is too large to index.
+
+    The total may not be exact (see Event.objects.search_count); if not,
+    max_page only goes as far as the pages known to exist.
+    """
     page = int(request.GET.get('page', 1))
-    offset = None
-    last_page_ord = per_page + 1
-    page_offset_qs = None
-    if any([v for k, v in valid.items() if k != 'min_ordinal']):
-        events = (Event.objects.search(**valid)
-                  .prefetch_related('linking_objects'))
-        page_offset_qs = Event.objects.search(**valid)
-        total_events = events.count()
-        offset = (page-1) * per_page
-        last_page_ord = last_page_ordinal(events)
-        # The min_ordinal is actually the "bottom" (end) of the current
-        # page and the top (start) of the next. This is because the
-        # ordinal is autoincrementing and acts as a proxy for
-        # date added, so we're paging from greatest to least.
-        if 'min_ordinal' in valid and valid['min_ordinal']:
-            events = events.filter(ordinal__lte=valid['min_ordinal'])[:per_page]
-        else:
-            events = events[offset:offset+per_page]
+    filtered = any(valid.values())
+    min_ordinal = None if filtered else request_ordinal(request)
+    if filtered:
+        events = Event.objects.search(**valid)
+        total_events, total_exact, total_estimated = Event.objects.search_count(**valid)
+        counted = total_exact
     else:
-        events = Event.objects.searchunfilt(request.GET.get('min_ordinal'))
-        page_offset_qs = Event.objects.searchunfilt()
-        total_events = Event.objects.all().count()
-        if total_events:
-            last_page_ord = last_page_ordinal(Event.objects.all())
-        events = events.prefetch_related('linking_objects')[0:per_page]
-    page_max_ord = 0
-    page_min_ord = 0
-    if events:
-        page_max_ord = max([e.ordinal for e in events])
-        page_min_ord = min([e.ordinal for e in events])
+        events = Event.objects.all()
+        total_events = Event.objects.total()
+        total_estimated = pes_settings.PES_EVENT_COUNT == 'estimated'
+        total_exact = not total_estimated
+        counted = pes_settings.PES_EVENT_COUNT == 'exact'
     max_page = int(math.ceil(total_events/float(per_page)))
-    if page > max_page and page > 1:
+    if total_exact and page > max_page and page > 1:
         raise EmptyPage()
+    page_events = events.only(*fields) if fields else events.prefetch_related('linking_objects')
+    if min_ordinal is not None:
+        page_events = list(
+            page_events.filter(ordinal__lte=min_ordinal).order_by('-ordinal')[:per_page]
+        )
+    elif page == 1:
+        page_events = list(page_events.order_by('-ordinal')[:per_page])
+    else:
+        # A total kept by the counter may drift, so only one that was
+        # counted can tell whether the index missed events.
+        index = page_index.get_index(
+            events, valid, per_page,
+            expected_count=total_events if counted else None
+        )
+        if index is None:
+            offset = (page-1) * per_page
+            page_events = list(page_events.order_by('-ordinal')[offset:offset+per_page])
+        else:
+            page_events = index.page(page_events, page)
+    has_next = page < max_page
+    if not total_exact:
+        if not page_events and page > 1:
+            raise EmptyPage()
+        # A full page may well have another after it.
+        has_next = has_next or len(page_events) == per_page
+        max_page = max(max_page, page + 1 if has_next else page)
+    page_max_ord = 0
+    page_min_ord = 0
+    if page_events:
+        page_max_ord = max([e.ordinal for e in page_events])
+        page_min_ord = min([e.ordinal for e in page_events])
     page_range = range(
         max(1, page-6),
         min(max_page+1, page+7)
     )
-    page_offsets = get_page_offsets(
-        page_offset_qs, page, page_range, (page_min_ord, page_max_ord),
-        per_page=per_page
-    )
-    prev_page_ord = page_max_ord+per_page
-    next_page_ord = page_min_ord
-    for p, poff in page_offsets:
-        if p == (page-1):
-            prev_page_ord = poff
-        elif p == (page+1):
-            next_page_ord = poff
+    prev_page_ord = next_page_ord = last_page_ord = None
+    if not filtered and page_events:
+        if has_next:
+            next_page_ord = page_min_ord - 1
+        if page > 2:
+            # The newest of the page's worth of events before this page.
+            newer = list(
+                Event.objects.filter(ordinal__gt=page_max_ord).order_by('ordinal')
+                .values_list('ordinal', flat=True)[:per_page]
+            )
+            prev_page_ord = newer[-1] if newer else None
+        if total_exact and page < max_page:
+            # The newest event on the last page, found from the oldest.
+            last_page_events = total_events - (max_page - 1) * per_page
+            last_page_ord = next(iter(
+                Event.objects.order_by('ordinal').values_list('ordinal', flat=True)
+                [last_page_events - 1:last_page_events]
+            ), None)
     context = {
-        'events': events, 'page_range': page_range, 'page_offsets': page_offsets,
+        'events': page_events, 'page_range': page_range,
         'page_max_ordinal': page_max_ord, 'page_min_ordinal': page_min_ord,
-        'last_page_ordinal': last_page_ord, 'page': page, 'max_page': max_page,
+        'page': page, 'max_page': max_page,
         'per_page': per_page, 'next_page': page+1, 'previous_page': page-1,
-        'next_page_ord': next_page_ord, 'prev_page_ord': prev_page_ord,
-        'total_events': total_events
+        'prev_page_ord': prev_page_ord, 'next_page_ord': next_page_ord,
+        'last_page_ord': last_page_ord, 'min_ordinal': min_ordinal,
+        'has_next': has_next, 'total_events': total_events,
+        'total_exact': total_exact, 'total_estimated': total_estimated,
     }
     return context
 
@@ -210,6 +520,55 @@ def event_search(request):
     return render(request, 'premis_event_service/search.html', context)
 
 
+def invalid_parameters_response(form):
+    """Return a 400 response listing the errors in a bound form."""
+    errors = []
+    for field, field_errors in form.errors.as_data().items():
+        errors.append('%s:' % field)
+        for field_error in field_errors:
+            if field_error.params is None:
+                message = field_error.message
+            else:
+                message = field_error.message % field_error.params
+            errors.append('\t%s: %s' % (field_error.code, message))
+    errors = '\n'.join(errors)
+    return HttpResponse(
+        'Invalid parameters.\n'+errors,
+        status=400,
+        content_type="text/plain"
+    )
+
+
+def linked_object_identifiers(events):
+    """
+    Return {event identifier: [linked object identifier, ...]} for the
+    events, read from EventLinkObject with one query.
+    """
+    identifiers = {e.event_identifier: [] for e in events}
+    if identifiers:
+        links = EventLinkObject.objects.filter(
+            event_id__in=list(identifiers)
+        ).values_list('event_id', 'linkobject_id')
+        for event_identifier, object_identifier in links:
+            identifiers[event_identifier].append(object_identifier)
+    return identifiers
+
+
+def stream_json(data):
+    """Encode data as indented JSON incrementally, in chunks of bytes."""
+    chunk = []
+    size = 0
+    for part in json.JSONEncoder(indent=4, sort_keys=True).iterencode(data):
+        chunk.append(part)
+        size += len(part)
+        if size >= JSON_CHUNK_SIZE:
+            yield ''.join(chunk).encode('utf-8')
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk).encode('utf-8')
+
+
 def json_event_search(request):
     """
     returns json search results for premis events
@@ -218,24 +577,11 @@ def json_event_search(request):
     if form.is_valid():
         valid = form.cleaned_data
     else:
-        errors = []
-        for field, field_errors in form.errors.as_data().items():
-            errors.append('%s:' % field)
-            for field_error in field_errors:
-                if field_error.params is None:
-                    message = field_error.message
-                else:
-                    message = field_error.message % field_error.params
-                errors.append('\t%s: %s' % (field_error.code, message))
-        errors = '\n'.join(errors)
-        return HttpResponse(
-            'Invalid parameters.\n'+errors,
-            status=400,
-            content_type="text/plain"
-        )
+        return invalid_parameters_response(form)
     # paginate
     paginated = paginate_events(
-        valid, request, per_page=EVENT_SEARCH_PER_PAGE
+        valid, request, per_page=EVENT_SEARCH_PER_PAGE,
+        fields=JSON_EVENT_SEARCH_FIELDS
     )
     args = {}
     args.update(valid)
@@ -245,11 +591,17 @@ def json_event_search(request):
     # prepare a results set and then append each event to it as a dict
     rel_links = []
     entries = []
-    # we will ALWAYS have a self, first and last relative link
+    # we will ALWAYS have a self and first relative link, and a last one
+    # if we know how many events there are
     args_first, args_cur, args_last = (args.copy() for _ in range(3))
     args_first['page'] = 1
     args_cur['page'] = paginated['page']
     args_last['page'] = paginated['max_page'] or 1
+    # Unfiltered searches page by seeking on the newest ordinal of a page.
+    if paginated['min_ordinal'] is not None:
+        args_cur['min_ordinal'] = paginated['min_ordinal']
+    if paginated['last_page_ord'] is not None:
+        args_last['min_ordinal'] = paginated['last_page_ord']
     # store links for adjacent events relative to the current event
     rel_links.extend(
         [
@@ -271,6 +623,10 @@ def json_event_search(request):
                     urllib.parse.urlencode(args_first)
                 )
             },
+        ]
+    )
+    if paginated['total_exact']:
+        rel_links.append(
             {
                 'rel': 'last',
                 'href': "%s://%s%s?%s" % (
@@ -280,11 +636,12 @@ def json_event_search(request):
                     urllib.parse.urlencode(args_last)
                 )
             },
-        ]
-    )
+        )
     # if we are past the first event, we can always add a previous event
     if paginated['page'] > 1:
-        args['page'] = args_cur['page'] - 1
+        args_previous = dict(args, page=args_cur['page'] - 1)
+        if paginated['prev_page_ord'] is not None:
+            args_previous['min_ordinal'] = paginated['prev_page_ord']
         rel_links.append(
             {
                 'rel': 'previous',
@@ -292,13 +649,15 @@ def json_event_search(request):
                     request.scheme,
                     request.META.get('HTTP_HOST'),
                     request.path,
-                    urllib.parse.urlencode(args)
+                    urllib.parse.urlencode(args_previous)
                 )
             },
         )
     # if our event is not the last in the list, we can add a next event
-    if paginated['page'] < paginated['max_page']:
-        args['page'] = args_cur['page'] + 1
+    if paginated['has_next']:
+        args_next = dict(args, page=args_cur['page'] + 1)
+        if paginated['next_page_ord'] is not None:
+            args_next['min_ordinal'] = paginated['next_page_ord']
         rel_links.append(
             {
                 'rel': 'next',
@@ -306,17 +665,13 @@ def json_event_search(request):
                     request.scheme,
                     request.META.get('HTTP_HOST'),
                     request.path,
-                    urllib.parse.urlencode(args)
+                    urllib.parse.urlencode(args_next)
                 )
             },
         )
+    linked = linked_object_identifiers(events)
     for entry in events:
-        linked_objects = ", ".join(
-            entry.linking_objects.values_list(
-                'object_identifier',
-                flat=True
-            )
-        )
+        linked_objects = ", ".join(linked[entry.event_identifier])
         entries.extend(
             [
                 {
@@ -337,17 +692,154 @@ def json_event_search(request):
                 paginated['per_page'],
             "opensearch:startIndex": "1",
             "opensearch:totalResults": total_events,
+            # False if totalResults is an estimate or a lower bound.
+            "totalResultsExact": paginated['total_exact'],
             "title": "Premis Event Search"
         }
     }
-    response = HttpResponse(content_type='application/json')
-    json.dump(
-        event_json,
-        fp=response,
-        indent=4,
-        sort_keys=True,
+    return StreamingHttpResponse(stream_json(event_json), content_type='application/json')
+
+
+# Functions of the rollup's day giving the start of the period it falls in.
+STATS_BUCKETS = {
+    'day': F, 'week': TruncWeek, 'month': TruncMonth, 'year': TruncYear,
+}
+
+
+def json_event_stats(request):
+    """
+    Return counts of events per day, week, month or year, optionally
+    broken down by event type and/or outcome, from the event rollups.
+    """
+    form = EventStatsForm(request.GET)
+    if not form.is_valid():
+        return invalid_parameters_response(form)
+    valid = form.cleaned_data
+    bucket = valid['bucket'] or 'day'
+    group_by = [f for f in ('event_type', 'event_outcome') if f in valid['group_by']]
+    rollups = EventRollup.objects.all()
+    if valid['start_date']:
+        rollups = rollups.filter(day__gte=valid['start_date'])
+    if valid['end_date']:
+        rollups = rollups.filter(day__lte=valid['end_date'])
+    if valid['event_type']:
+        rollups = rollups.filter(event_type=valid['event_type'])
+    if valid['event_outcome']:
+        rollups = rollups.filter(event_outcome=valid['event_outcome'])
+    rows = (
+        rollups.annotate(period=STATS_BUCKETS[bucket]('day'))
+        .values('period', *group_by)
+        .annotate(count=Sum('count'))
+        .filter(count__gt=0)
+        .order_by('period', *group_by)
+    )
+    results = []
+    for row in rows:
+        row['period'] = row['period'].isoformat()
+        results.append(row)
+    stats = {
+        'bucket': bucket,
+        'group_by': group_by,
+        'query': {k: v for k, v in request.GET.items()},
+        'results': results,
+        'total': sum(row['count'] for row in results),
+    }
+    return HttpResponse(
+        json.dumps(stats, indent=4, sort_keys=True), content_type='application/json'
+    )
+
+
+def iter_event_chunks(after=0, chunk_size=1000):
+    """
+    Yield (events, linking objects by event identifier) for every event
+    with an ordinal greater than after, in ordinal order.
+
+    Each chunk is read from just past the last ordinal of the one before,
+    so memory and the cost of each query stay flat however many events
+    there are.
+    """
+    while True:
+        events = list(
+            Event.objects.filter(ordinal__gt=after).order_by('ordinal')[:chunk_size]
+        )
+        if not events:
+            return
+        yield events, linkingObjectsByEvent(events)
+        after = events[-1].ordinal
+
+
+def event_to_json(event, linkingObjects):
+    """Return a dict of an event's fields for export."""
+    return {
+        'ordinal': event.ordinal,
+        'event_identifier': event.event_identifier,
+        'event_identifier_type': event.event_identifier_type,
+        'event_type': event.event_type,
+        'event_date_time': event.event_date_time.isoformat(),
+        'event_added': event.event_added.isoformat(),
+        'event_detail': event.event_detail,
+        'event_outcome': event.event_outcome,
+        'event_outcome_detail': event.event_outcome_detail,
+        'linking_agent_identifier_type': event.linking_agent_identifier_type,
+        'linking_agent_identifier_value': event.linking_agent_identifier_value,
+        'linking_agent_role': event.linking_agent_role,
+        'linking_objects': [
+            {
+                'object_identifier': o.object_identifier,
+                'object_type': o.object_type,
+                'object_role': o.object_role,
+            }
+            for o in linkingObjects
+        ],
+    }
+
+
+def export_ndjson(chunks):
+    for events, linkingObjects in chunks:
+        yield ''.join(
+            json.dumps(event_to_json(e, linkingObjects[e.event_identifier]),
+                       sort_keys=True) + '\n'
+            for e in events
+        ).encode('utf-8')
+
+
+def export_xml(chunks):
+    yield XML_HEADER % (
+        '<premis:premis xmlns:premis="%s" version="2.0">\n' % PREMIS_NSMAP['premis']
+    ).encode('utf-8')
+    for events, linkingObjects in chunks:
+        yield b''.join(
+            etree.tostring(eventXML) + b'\n'
+            for eventXML in objectsToPremisEventXML(events, linkingObjects)
+        )
+    yield b'</premis:premis>\n'
+
+
+EXPORT_FORMATS = {
+    'ndjson': (export_ndjson, 'application/x-ndjson'),
+    'xml': (export_xml, 'application/xml'),
+}
+
+
+def event_export(request, format='ndjson'):
+    """
+    Stream every event, oldest first, as newline delimited JSON or as
+    premis:event elements within a premis:premis document.
+
+    An 'after' parameter starts the export past the given ordinal, so an
+    interrupted export can be resumed.
+    """
+    try:
+        after = int(request.GET.get('after') or 0)
+    except ValueError:
+        return HttpResponseBadRequest(
+            "'after' must be an integer.\n", content_type='text/plain'
+        )
+    exporter, content_type = EXPORT_FORMATS[format]
+    return StreamingHttpResponse(
+        exporter(iter_event_chunks(after, EVENT_EXPORT_CHUNK_SIZE)),
+        content_type=content_type
     )
-    return response
 
 
 def recent_event_list(request):
@@ -366,7 +858,8 @@ def recent_event_list(request):
         'premis_event_service/recent_event_list.html',
         {
             'entries': events,
-            'num_events': Event.objects.count(),
+            'num_events': Event.objects.total(),
+            'num_events_estimated': pes_settings.PES_EVENT_COUNT == 'estimated',
             'maintenance_message': MAINTENANCE_MSG,
         }
     )
@@ -378,13 +871,19 @@ def json_agent(request, identifier=None):
     """
 
     # get data for json dictionary
-    a = get_object_or_404(Agent, agent_identifier=identifier)
+    a = Agent.objects.registry().get(identifier)
+    if a is None:
+        raise Http404('No Agent matches the given query.')
+    etag = agent_etag(request, a)
+    notModified = not_modified_response(request, etag)
+    if notModified is not None:
+        return notModified
     # dump the dict to as an HttpResponse
     response = HttpResponse(content_type='application/json')
     # construct the dictionary with values from aggregates
     jsonDict = {
         'id': "%s://%s%s" % (request.scheme, request.get_host(), a.get_absolute_url()),
-        'type': [c for c in AGENT_TYPE_CHOICES if c[0] == a.agent_type][0][1],
+        'type': a.agent_type_label,
         'name': a.agent_name,
         'note': a.agent_note,
     }
@@ -395,7 +894,7 @@ def json_agent(request, identifier=None):
         indent=4,
         sort_keys=True,
     )
-    return response
+    return set_validators(response, etag)
 
 
 def humanAgent(request, identifier=None):
@@ -403,22 +902,24 @@ def humanAgent(request, identifier=None):
     Return a human readable list of agests
     """
 
+    registry = Agent.objects.registry()
     if identifier:
-        agents = Agent.objects.filter(agent_identifier=identifier).values()
-        if not agents:
+        if identifier not in registry:
             return HttpResponseNotFound("Agent not found.", content_type='text/plain')
+        agents = [registry[identifier]]
     else:
-        agents = Agent.objects.all().values()
-    for a in agents:
-        a['agent_type'] = [
-            tup for tup in AGENT_TYPE_CHOICES if tup[0] == a['agent_type']
-        ][0][0]
+        agents = list(registry.values())
+    # The same dicts Agent.objects.values() would give.
+    agents = [
+        {f.attname: getattr(a, f.attname) for f in Agent._meta.concrete_fields}
+        for a in agents
+    ]
     return render(
         request,
         'premis_event_service/agent.html',
         {
             'agents': agents,
-            'num_agents': Agent.objects.count(),
+            'num_agents': len(registry),
             'maintenance_message': MAINTENANCE_MSG,
         }
     )
@@ -431,22 +932,22 @@ def eventXML(request, identifier=None):
 
 
 def findEvent(request, linked_identifier, event_type=None):
-    resultSet = Event.objects.filter(
-        linking_objects__object_identifier__contains=linked_identifier
-    )
-    if event_type:
-        resultSet = resultSet.filter(event_type__contains=event_type)
-    if not resultSet.count():
+    lateEvent = LatestEvent.objects.latest_event(linked_identifier, event_type)
+    if lateEvent is None:
+        # Events from before the latest events were recorded are looked up
+        # directly.
+        resultSet = Event.objects.filter(
+            linking_objects__object_key=normalize_object_identifier(linked_identifier)
+        )
+        if event_type:
+            resultSet = resultSet.filter(event_type__contains=event_type)
+        # The latest event; of those tied, the first added.
+        lateEvent = resultSet.order_by('-event_date_time', 'ordinal').first()
+    if lateEvent is None:
         return HttpResponseNotFound(
             "There is no event for matching those parameters"
         )
-    lateDate = resultSet[0].event_date_time
-    lateEvent = resultSet[0]
-    for singleEvent in resultSet:
-        if singleEvent.event_date_time > lateDate:
-            lateDate = singleEvent.event_date_time
-            lateEvent = singleEvent
-    eventXML = objectToPremisEventXML(lateEvent)
+    eventXML = event_cache.get_events_xml([lateEvent])[0]
     althref = request.build_absolute_uri(
         reverse('event-detail', args=[lateEvent.event_identifier, ])
     )
@@ -454,7 +955,7 @@ def findEvent(request, linked_identifier, event_type=None):
         eventXML, lateEvent.event_identifier, lateEvent.event_identifier,
         alt=althref
     )
-    atomText = XML_HEADER % etree.tostring(atomXML, pretty_print=True)
+    atomText = xml_document(atomXML)
     resp = HttpResponse(atomText, content_type="application/atom+xml")
     return resp
 
@@ -466,25 +967,23 @@ def agentXML(request, identifier):
 
     if 'premis' in request.path:
         identifier = identifier.replace('.premis', '')
-        try:
-            agentObject = Agent.objects.get(agent_identifier=identifier)
-        except Agent.DoesNotExist:
-            return HttpResponseNotFound(
-                "There is no agent with the identifier %s" % identifier
-            )
+    agentObject = Agent.objects.registry().get(identifier)
+    if agentObject is None:
+        return HttpResponseNotFound(
+            "There is no agent with the identifier %s" % identifier
+        )
+    etag = agent_etag(request, agentObject)
+    notModified = not_modified_response(request, etag)
+    if notModified is not None:
+        return notModified
+    if 'premis' in request.path:
         returnXML = objectToPremisAgentXML(
             agentObject,
             webRoot=request.scheme + '://' + request.get_host() + '/',
         )
-        returnText = XML_HEADER % etree.tostring(returnXML, pretty_print=True)
+        returnText = xml_document(returnXML)
         content_type = "application/xml"
     else:
-        try:
-            agentObject = Agent.objects.get(agent_identifier=identifier)
-        except Agent.DoesNotExist:
-            return HttpResponseNotFound(
-                "There is no agent with the identifier %s" % identifier
-            )
         agent_obj_xml = objectToAgentXML(agentObject)
         althref = request.build_absolute_uri(
             reverse('agent-detail', args=[identifier, ])
@@ -493,9 +992,112 @@ def agentXML(request, identifier):
             agent_obj_xml, identifier, identifier,
             alt=althref
         )
-        returnText = XML_HEADER % etree.tostring(return_atom, pretty_print=True)
+        returnText = xml_document(return_atom)
         content_type = "application/atom+xml"
-    return HttpResponse(returnText, content_type=content_type)
+    return set_validators(
+        HttpResponse(returnText, content_type=content_type), etag
+    )
+
+
+def app_event_batch(request, feedXML):
+    """
+    Create the events in an Atom feed of event entries
+
+    Returns a multi-status document with a 201, 409 or 400 result for each
+    entry, in the order the entries appear in the feed.
+    """
+    eventXMLList = [
+        entryXMLToPremisEventXML(entryXML)
+        for entryXML in getNodesByName(feedXML, "entry")
+    ]
+    results = premisEventXMLListToObjects(eventXMLList)
+    duplicates = sum(1 for r in results if isinstance(r, DuplicateEventError))
+    errors = sum(1 for r in results if isinstance(r, InvalidEventError))
+    count_ingested(len(results) - duplicates - errors, duplicates, errors)
+    statuses = []
+    for result in results:
+        if isinstance(result, DuplicateEventError):
+            statuses.append((
+                '%s://%s/APP/event/%s/' % (
+                    request.scheme, request.META['HTTP_HOST'], result
+                ),
+                409,
+                "An event with id='{}' exists.".format(result),
+            ))
+        elif isinstance(result, InvalidEventError):
+            statuses.append((
+                '%s://%s%s' % (
+                    request.scheme, request.META['HTTP_HOST'], request.path
+                ),
+                400,
+                str(result),
+            ))
+        else:
+            statuses.append((
+                '%s://%s/APP/event/%s/' % (
+                    request.scheme, request.META['HTTP_HOST'],
+                    result.event_identifier
+                ),
+                201,
+                None,
+            ))
+    multistatusXML = makeMultiStatusXML(statuses)
+    multistatusText = xml_document(multistatusXML)
+    resp = HttpResponse(multistatusText, content_type="application/xml")
+    resp.status_code = 207
+    return resp
+
+
+def app_event_spool_entry(request, entryXML):
+    """
+    Spool an event entry for the ingest worker and return 202 Accepted
+    """
+    if entryXMLToPremisEventXML(entryXML) is None:
+        return HttpResponse(
+            'Event element missing in request body.',
+            content_type='text/plain',
+            status=400
+        )
+    spool_id = get_spool().append(etree.tostring(entryXML))
+    status_url = request.build_absolute_uri(
+        reverse('app-event-spool', args=[spool_id])
+    )
+    resp = HttpResponse(
+        "Accepted for ingest. Status: %s\n" % status_url,
+        content_type="text/plain"
+    )
+    resp.status_code = 202
+    resp['Location'] = status_url
+    return resp
+
+
+def app_event_spool(request, spool_id):
+    """
+    Return the ingest status of a spooled event entry
+    """
+    spooled = get_spool().get(spool_id)
+    if spooled is None:
+        return HttpResponseNotFound(
+            "There is no spooled entry for id %s.\n" % spool_id
+        )
+    jsonDict = {
+        'id': spooled['id'],
+        'status': spooled['status'],
+        'message': spooled['message'],
+        'event': None,
+    }
+    if spooled['event_identifier']:
+        jsonDict['event'] = request.build_absolute_uri(
+            reverse('app-event-detail', args=[spooled['event_identifier']])
+        )
+    response = HttpResponse(content_type='application/json')
+    json.dump(
+        jsonDict,
+        fp=response,
+        indent=4,
+        sort_keys=True,
+    )
+    return response
 
 
 def app_event(request, identifier=None):
@@ -507,19 +1109,40 @@ def app_event(request, identifier=None):
     request_body = get_request_body(request)
     # are we POSTing a new identifier here?
     if request.method == 'POST' and not identifier:
-        xmlDoc = etree.fromstring(request_body)
-        try:
-            newEvent = addObjectFromXML(
-                xmlDoc, premisEventXMLToObject, "event", "event_identifier",
-                EVENT_UPDATE_TRANSLATION_DICT
+        with phase('parse'):
+            xmlDoc = etree.fromstring(request_body)
+        # A feed of entries is ingested as a single batch.
+        if xmlDoc.tag == ATOM + "feed":
+            return app_event_batch(request, xmlDoc)
+        if PES_ASYNC_INGEST:
+            return app_event_spool_entry(request, xmlDoc)
+        contentXML = getNodeByName(xmlDoc, "content")
+        if contentXML is None:
+            return HttpResponse(
+                'Content element missing in request body.',
+                content_type='text/plain',
+                status=400
             )
+        try:
+            newEvent = premisEventXMLToObject(getNodeByName(contentXML, "event"))
         except DuplicateEventError as e:
+            count_ingested(duplicate=1)
             return HttpResponse(
                 "An event with id='{}' exists.".format(e),
                 status=409, content_type="text/plain"
             )
-        if isinstance(newEvent, HttpResponse):
-            return newEvent
+        except InvalidEventError as e:
+            count_ingested(error=1)
+            return HttpResponse(
+                str(e), status=400, content_type="text/plain"
+            )
+        except (IntegrityError, DataError) as e:
+            count_ingested(error=1)
+            return HttpResponse(
+                "The event could not be saved: {}".format(e),
+                status=400, content_type="text/plain"
+            )
+        count_ingested(created=1)
         eventObjectXML = objectToPremisEventXML(newEvent)
         atomXML = wrapAtom(
             xml=eventObjectXML,
@@ -530,7 +1153,7 @@ def app_event(request, identifier=None):
             ),
             title=newEvent.event_identifier,
         )
-        atomText = XML_HEADER % etree.tostring(atomXML, pretty_print=True)
+        atomText = xml_document(atomXML)
         resp = HttpResponse(atomText, content_type="application/atom+xml")
         resp.status_code = 201
         resp['Location'] = '%s://%s/APP/event/%s/' % (
@@ -540,7 +1163,10 @@ def app_event(request, identifier=None):
         )
         return resp
     # if not, return a feed
-    elif request.method == 'GET' and not identifier:
+    # HEAD is answered here too, with the headers of the GET but without
+    # serializing anything, so clients can ping this endpoint to test for
+    # availability. See codalib's waitForURL func in util.py.
+    elif request.method in ('GET', 'HEAD') and not identifier:
         # negotiate the details of our feed here
         events = Event.objects.all()
         # parse the request get variables and filter the search
@@ -559,7 +1185,7 @@ def app_event(request, identifier=None):
         if request.GET.get('link_object_id'):
             linking_object_id = request.GET.get('link_object_id')
             events = events.filter(
-                linking_objects__object_identifier=linking_object_id
+                linking_objects__object_key=normalize_object_identifier(linking_object_id)
             )
         if request.GET.get('outcome'):
             outcome = request.GET.get('outcome')
@@ -567,6 +1193,16 @@ def app_event(request, identifier=None):
         if request.GET.get('type'):
             event_type = request.GET.get('type')
             events = events.filter(event_type=event_type)
+
+        def page_xml_function(page_events):
+            # Serialize the page in one go so cached fragments can be reused
+            # and the rest share a query for their linking objects.
+            return dict(zip(
+                [e.pk for e in page_events],
+                event_cache.get_events_xml(page_events)
+            ))
+        if 'cursor' in request.GET:
+            return app_event_cursor_feed(request, events, page_xml_function)
         if request.GET.get('orderby'):
             order_field = request.GET.get('orderby')
             unordered_events = events
@@ -588,10 +1224,23 @@ def app_event(request, identifier=None):
             page = int(request.GET['page']) if request.GET.get('page') else 1
         else:
             page = 1
+        # Known before counting or reading the page, so HEAD requests and
+        # conditional GETs need neither.
+        etag = feed_etag(request)
+        notModified = not_modified_response(request, etag)
+        if notModified is not None:
+            return notModified
+        if request.method == 'HEAD':
+            return set_validators(
+                HttpResponse(content_type="application/atom+xml"), etag
+            )
+        paginator = EventFeedPaginator(events, EVENT_SEARCH_PER_PAGE)
         try:
+            page_events = paginator.page(page).object_list if paginator.count else []
+            page_xml = page_xml_function(page_events)
             atomFeed = makeObjectFeed(
-                paginator=Paginator(events, EVENT_SEARCH_PER_PAGE),
-                objectToXMLFunction=objectToPremisEventXML,
+                paginator=paginator,
+                objectToXMLFunction=lambda e: page_xml[e.pk],
                 feedId=request.path[1:],
                 webRoot='%s://%s' % (request.scheme, request.META.get('HTTP_HOST')),
                 title="Event Entry Feed",
@@ -607,15 +1256,16 @@ def app_event(request, identifier=None):
                 status=400,
                 content_type='text/plain'
             )
-        atomFeedText = XML_HEADER % etree.tostring(atomFeed, pretty_print=True)
+        atomFeedText = xml_document(atomFeed)
         resp = HttpResponse(atomFeedText, content_type="application/atom+xml")
         resp.status_code = 200
-        return resp
+        return set_validators(resp, etag)
     # updating an existing record
     elif request.method == 'PUT' and identifier:
         try:
-            xmlDoc = etree.fromstring(request_body)
-            xmlDoc = xmlDoc.xpath('//premis:event', namespaces=PREMIS_NSMAP)[0]
+            with phase('parse'):
+                xmlDoc = etree.fromstring(request_body)
+            xmlDoc = XPATH_EVALUATORS['event'](xmlDoc)[0]
         except etree.LxmlError:
             return HttpResponse(
                 'Invalid request XML.',
@@ -635,7 +1285,8 @@ def app_event(request, identifier=None):
                 content_type='text/plain',
                 status=404
             )
-        updatedEvent = updateObjectFromXML(xmlDoc, event, EVENT_UPDATE_TRANSLATION_DICT)
+        event_cache.invalidate(event)
+        updatedEvent = updateEventFromXML(xmlDoc, event)
         # If XML identifier and resource ID don't match, bail.
         if updatedEvent.event_identifier != identifier:
             return HttpResponse(
@@ -650,13 +1301,13 @@ def app_event(request, identifier=None):
         )
         returnEvent = updatedEvent
         updatedEvent.save()
-        eventObjectXML = objectToPremisEventXML(returnEvent)
+        eventObjectXML = event_cache.get_event_xml(returnEvent)
         atomXML = wrapAtom(eventObjectXML, identifier, identifier)
-        atomText = XML_HEADER % etree.tostring(atomXML, pretty_print=True)
+        atomText = xml_document(atomXML)
         resp = HttpResponse(atomText, content_type="application/atom+xml")
         resp.status_code = 200
         return resp
-    if request.method == 'GET' and identifier:
+    if request.method in ('GET', 'HEAD') and identifier:
         # attempt to retrieve record -- error if unable
         try:
             event_object = Event.objects.get(event_identifier=identifier)
@@ -664,8 +1315,19 @@ def app_event(request, identifier=None):
             return HttpResponseNotFound(
                 "There is no event for identifier %s.\n" % identifier
             )
+        # event_added is bumped on every save, so it is all a client needs
+        # to tell whether its copy is current.
+        etag = make_etag(request.path, identifier, event_object.event_added)
+        notModified = not_modified_response(request, etag, event_object.event_added)
+        if notModified is not None:
+            return notModified
+        if request.method == 'HEAD':
+            return set_validators(
+                HttpResponse(content_type="application/atom+xml"),
+                etag, event_object.event_added
+            )
         returnEvent = event_object
-        eventObjectXML = objectToPremisEventXML(returnEvent)
+        eventObjectXML = event_cache.get_event_xml(returnEvent)
         althref = request.build_absolute_uri(
             reverse('event-detail', args=[identifier, ])
         )
@@ -680,16 +1342,10 @@ def app_event(request, identifier=None):
             author=CODALIB_APP_AUTHOR["name"],
             author_uri=CODALIB_APP_AUTHOR["uri"]
         )
-        atomText = XML_HEADER % etree.tostring(atomXML, pretty_print=True)
+        atomText = xml_document(atomXML)
         resp = HttpResponse(atomText, content_type="application/atom+xml")
         resp.status_code = 200
-        return resp
-    # This is here so clients can ping this endpoint to
-    # test for availability. See codalib's waitForURL func
-    # in util.py.
-    elif request.method == 'HEAD':
-        return HttpResponse(content_type="application/atom+xml")
-
+        return set_validators(resp, etag, event_object.event_added)
     elif request.method == 'DELETE' and identifier:
         # attempt to retrieve record -- error if unable
         try:
@@ -702,6 +1358,7 @@ def app_event(request, identifier=None):
         # grab the event, delete it, and inform the user.
         returnEvent = event_object
         eventObjectXML = objectToPremisEventXML(returnEvent)
+        event_cache.invalidate(event_object)
         event_object.delete()
         atomXML = wrapAtom(
             xml=eventObjectXML,
@@ -710,7 +1367,7 @@ def app_event(request, identifier=None):
             ),
             title=identifier,
         )
-        atomText = XML_HEADER % etree.tostring(atomXML, pretty_print=True)
+        atomText = xml_document(atomXML)
         resp = HttpResponse(atomText, content_type="application/atom+xml")
         resp.status_code = 200
         return resp
@@ -736,7 +1393,7 @@ def app_agent(request, identifier=None):
                 page = 1
             try:
                 atomFeed = makeObjectFeed(
-                    paginator=Paginator(Agent.objects.all(), 20),
+                    paginator=Paginator(list(Agent.objects.registry().values()), 20),
                     objectToXMLFunction=objectToAgentXML,
                     feedId=requestString[1:],
                     webRoot="%s://%s" % (request.scheme, request.META.get('HTTP_HOST')),
@@ -751,14 +1408,13 @@ def app_agent(request, identifier=None):
                     "That page doesn't exist.\n", status=400,
                     content_type='text/plain'
                 )
-            atomFeedText = XML_HEADER % etree.tostring(
-                atomFeed, pretty_print=True
-            )
+            atomFeedText = xml_document(atomFeed)
             resp = HttpResponse(atomFeedText, content_type="application/atom+xml")
             resp.status_code = 200
             return resp
         elif request.method == 'POST':
-            entry_etree = etree.XML(request_body)
+            with phase('parse'):
+                entry_etree = etree.XML(request_body)
             try:
                 agent_object = premisAgentXMLgetObject(entry_etree)
             except Exception:
@@ -788,10 +1444,7 @@ def app_agent(request, identifier=None):
                 agent_object.agent_name,
                 agent_object.agent_name
             )
-            entryText = XML_HEADER % etree.tostring(
-                returnEntry,
-                pretty_print=True
-            )
+            entryText = xml_document(returnEntry)
             resp = HttpResponse(entryText, content_type="application/atom+xml")
             resp.status_code = 201
             resp['Location'] = agent_object.agent_identifier + '/'
@@ -805,17 +1458,14 @@ def app_agent(request, identifier=None):
             return HttpResponseBadRequest("Invalid method for this URL.")
     # identifier supplied, will be a GET or DELETE
     else:
-        try:
-            agent_object = get_object_or_404(
-                Agent,
-                agent_identifier=identifier
-            )
-        except Exception:
+        agent_object = Agent.objects.registry().get(identifier)
+        if agent_object is None:
             return HttpResponseNotFound(
                 "There is no agent for identifier \'%s\'.\n" % identifier
             )
         if request.method == 'DELETE':
-            agent_object.delete()
+            # The registry's agents are shared, so delete a copy of our own.
+            Agent.objects.filter(pk=agent_object.pk).delete()
             resp = HttpResponse("Deleted %s.\n" % identifier)
             resp.status_code = 200
             return resp
@@ -826,10 +1476,7 @@ def app_agent(request, identifier=None):
             returnEntry = wrapAtom(
                 returnXML, agent_object.agent_name, agent_object.agent_name
             )
-            entryText = XML_HEADER % etree.tostring(
-                returnEntry,
-                pretty_print=True
-            )
+            entryText = xml_document(returnEntry)
             resp = HttpResponse(entryText, content_type="application/atom+xml")
             resp.status_code = 200
             return resp
@@ -846,10 +1493,7 @@ def app_agent(request, identifier=None):
                 author=CODALIB_APP_AUTHOR["name"],
                 author_uri=CODALIB_APP_AUTHOR["uri"]
             )
-            entryText = XML_HEADER % etree.tostring(
-                returnEntry,
-                pretty_print=True
-            )
+            entryText = xml_document(returnEntry)
             resp = HttpResponse(entryText, content_type="application/atom+xml")
             resp.status_code = 200
             return resp
@@ -858,3 +1502,13 @@ def app_agent(request, identifier=None):
         # in util.py.
         elif request.method == 'HEAD':
             return HttpResponse(content_type="application/atom+xml")
+
+
+def metrics(request):
+    """
+    Return the service's metrics in the Prometheus text format
+    """
+    return HttpResponse(
+        exposition(get_metrics().samples()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
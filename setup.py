@@ -17,7 +17,7 @@ dependency_links = ['codalib @ git+https://github.com/unt-libraries/codalib']
 setup(
     name="django-premis-event-service",
     version="4.0.0",
-    packages=find_packages(exclude=["tests", ]),
+    packages=find_packages(exclude=["tests", "benchmarks"]),
     include_package_data=True,
     license="BSD",
     description="A Django application for storing and querying PREMIS Events",
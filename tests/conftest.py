@@ -117,6 +117,28 @@ class AgentTestXML(object):
         return xml.format(**self.attributes)
 
 
+@pytest.fixture(autouse=True)
+def agent_registry():
+    """Start every test with an empty agent registry.
+
+    Rolling back a test's transaction sends no signals, so agents loaded
+    during one test would otherwise still be registered in the next.
+    """
+    from premis_event_service.models import Agent
+    Agent.objects.invalidate_registry()
+    yield
+    Agent.objects.invalidate_registry()
+
+
+@pytest.fixture(autouse=True)
+def page_indexes():
+    """Start every test without search page indexes, for the same reason."""
+    from premis_event_service import page_index
+    page_index.invalidate()
+    yield
+    page_index.invalidate()
+
+
 @pytest.fixture
 def event_xml():
     """Provides XML representing an Event object.
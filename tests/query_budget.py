@@ -0,0 +1,140 @@
+"""
+Count the queries a block of code makes and the rows they fetch, and
+describe them by SQL fingerprint and by the line of premis_event_service
+(and template) that issued them.
+
+    with QueryRecorder() as recorder:
+        client.get(url)
+    assert len(recorder) <= 4, recorder.report()
+"""
+import collections
+import os
+import traceback
+
+from django.db import connection
+from django.db.backends.utils import CursorWrapper
+
+import premis_event_service
+from premis_event_service.slow_queries import fingerprint
+
+PACKAGE_DIR = os.path.dirname(premis_event_service.__file__)
+FETCH_METHODS = ('fetchone', 'fetchmany', 'fetchall')
+
+_recorders = []
+
+
+def call_site():
+    """
+    Return the innermost line of premis_event_service on the stack, and of
+    the template being rendered if there is one.
+    """
+    template = None
+    for frame, lineno in traceback.walk_stack(None):
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = '%s:%s' % (origin.template_name, token.lineno)
+        filename = frame.f_code.co_filename
+        if filename.startswith(PACKAGE_DIR):
+            site = '%s:%d (%s)' % (
+                os.path.relpath(filename, os.path.dirname(PACKAGE_DIR)),
+                lineno, frame.f_code.co_name
+            )
+            return '%s via %s' % (site, template) if template else site
+    return template or 'outside premis_event_service'
+
+
+class Query(object):
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.fingerprint = fingerprint(sql)
+        self.call_site = call_site()
+        self.rows = 0
+
+
+def _counting_fetch(name):
+    def fetch(self, *args):
+        result = self.db.wrap_database_errors(getattr(self.cursor, name))(*args)
+        query = getattr(self, '_budget_query', None)
+        if query is not None:
+            if name == 'fetchone':
+                query.rows += result is not None
+            else:
+                query.rows += len(result)
+        return result
+    return fetch
+
+
+class QueryRecorder(object):
+    """Records the queries made on a connection while it is active."""
+
+    def __init__(self, using=connection):
+        self.connection = using
+        self.queries = []
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def rows(self):
+        return sum(query.rows for query in self.queries)
+
+    def __call__(self, execute, sql, params, many, context):
+        query = Query(sql)
+        self.queries.append(query)
+        context['cursor']._budget_query = query
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        if not _recorders:
+            # Django's cursor passes fetches straight through to the
+            # database's cursor, so the rows are counted by intercepting
+            # them on the wrapper class.
+            for name in FETCH_METHODS:
+                setattr(CursorWrapper, name, _counting_fetch(name))
+        _recorders.append(self)
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+        _recorders.remove(self)
+        if not _recorders:
+            for name in FETCH_METHODS:
+                delattr(CursorWrapper, name)
+
+    def counts(self):
+        """Return the number of queries for each (call site, fingerprint)."""
+        return collections.Counter((q.call_site, q.fingerprint) for q in self.queries)
+
+    def report(self, queries=None, title=None):
+        """Describe the queries, grouped by call site."""
+        queries = self.queries if queries is None else queries
+        bySite = collections.OrderedDict()
+        for query in queries:
+            group = bySite.setdefault(query.call_site, collections.OrderedDict())
+            count, rows = group.get(query.fingerprint, (0, 0))
+            group[query.fingerprint] = (count + 1, rows + query.rows)
+        lines = [title or '%d queries fetching %d rows:' % (
+            len(queries), sum(query.rows for query in queries)
+        )]
+        for site, group in bySite.items():
+            lines.append('  %s' % site)
+            for sql, (count, rows) in group.items():
+                lines.append('    %3dx %5d rows  %s' % (count, rows, sql[:300]))
+        return '\n'.join(lines)
+
+    def growth(self, smaller):
+        """
+        Describe the queries made here more times than in the smaller run,
+        or return None if there are none.
+        """
+        extra = self.counts() - smaller.counts()
+        if not extra:
+            return None
+        grown = [q for q in self.queries if (q.call_site, q.fingerprint) in extra]
+        return self.report(grown, 'Queries that grow with the page size:')
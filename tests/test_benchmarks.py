@@ -0,0 +1,19 @@
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.test import Client
+
+from benchmarks.scenarios import SCENARIOS, Workload
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.mark.parametrize('scenario', SCENARIOS, ids=lambda s: s.__name__)
+def test_scenario_runs(scenario):
+    call_command('pes_generate', '500', objects=30, seed=1, stdout=StringIO())
+    workload = Workload()
+
+    scenario(Client(HTTP_HOST='testserver'), workload, 0)
@@ -0,0 +1,249 @@
+import collections
+from datetime import date, datetime
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+from django.db.models import Sum
+
+from premis_event_service import models, views
+from premis_event_service.management.commands import pes_explain
+from . import conftest, factories
+
+
+pytestmark = pytest.mark.django_db
+
+
+def write_feed(tmp_path, entries):
+    """Write the entries of the given event fixtures to an Atom feed file."""
+    entry_xml = ''.join(e.entry_xml.replace('<?xml version="1.0"?>', '')
+                        for e in entries)
+    path = tmp_path / 'events.xml'
+    path.write_text(
+        '<?xml version="1.0"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom">{0}</feed>\n'.format(entry_xml)
+    )
+    return path
+
+
+class TestLoadPremisEvents:
+
+    def test_loads_entries(self, tmp_path):
+        entries = [conftest.EventTestXML() for _ in range(5)]
+        path = write_feed(tmp_path, entries)
+        call_command('load_premis_events', str(path), batch_size=2, stdout=StringIO())
+
+        assert models.Event.objects.count() == 5
+        for entry in entries:
+            event = models.Event.objects.get(event_identifier=entry.identifier)
+            assert event.linking_objects.count() == 1
+
+    def test_loads_premis_events(self, tmp_path):
+        events = [conftest.EventTestXML() for _ in range(3)]
+        path = tmp_path / 'events.xml'
+        path.write_text(
+            '<premis:events xmlns:premis="info:lc/xmlns/premis-v2">{0}</premis:events>'.format(
+                ''.join(e.obj_xml.replace('<?xml version="1.0"?>', '') for e in events)
+            )
+        )
+        call_command('load_premis_events', str(path), stdout=StringIO())
+        assert models.Event.objects.count() == 3
+
+    def test_reports_duplicates(self, tmp_path):
+        entries = [conftest.EventTestXML() for _ in range(2)]
+        path = write_feed(tmp_path, entries)
+        call_command('load_premis_events', str(path), stdout=StringIO())
+        out = StringIO()
+        call_command('load_premis_events', str(path), stdout=out)
+
+        assert models.Event.objects.count() == 2
+        assert '0 created, 2 duplicate' in out.getvalue()
+
+    def test_resumes_from_offset(self, tmp_path):
+        entries = [conftest.EventTestXML() for _ in range(4)]
+        path = write_feed(tmp_path, entries)
+        content = path.read_bytes()
+        offset = content.index(b'</entry>') + len(b'</entry>')
+
+        call_command('load_premis_events', str(path), offset=offset, stdout=StringIO())
+
+        assert models.Event.objects.count() == 3
+        assert not models.Event.objects.filter(
+            event_identifier=entries[0].identifier).exists()
+
+    def test_checkpoint_records_resume_offset(self, tmp_path):
+        entries = [conftest.EventTestXML() for _ in range(3)]
+        path = write_feed(tmp_path, entries)
+        checkpoint = tmp_path / 'checkpoint'
+        call_command(
+            'load_premis_events', str(path), batch_size=2,
+            checkpoint=str(checkpoint), stdout=StringIO())
+
+        content = path.read_bytes()
+        assert int(checkpoint.read_text()) == content.rindex(b'</entry>') + len(b'</entry>')
+
+        # Loading again resumes after the last saved entry.
+        out = StringIO()
+        call_command(
+            'load_premis_events', str(path), checkpoint=str(checkpoint), stdout=out)
+        assert 'Done: 0 created, 0 duplicate, 0 invalid.' in out.getvalue()
+
+
+def test_load_premis_events_reads_export(tmp_path, rf):
+    identifiers = {e.event_identifier for e in factories.EventFactory.create_batch(3)}
+    path = tmp_path / 'export.xml'
+    path.write_bytes(b''.join(
+        views.event_export(rf.get('/'), format='xml').streaming_content))
+    models.Event.objects.all().delete()
+
+    call_command('load_premis_events', str(path), stdout=StringIO())
+
+    assert set(models.Event.objects.values_list('event_identifier', flat=True)) == identifiers
+
+
+def test_reconcile_event_counts():
+    factories.EventFactory.create_batch(2)
+    models.Counter.objects.filter(name=models.EVENT_COUNTER).update(value=5)
+    out = StringIO()
+    call_command('reconcile_event_counts', stdout=out)
+    assert out.getvalue() == 'events: 5 corrected to 2\n'
+    assert models.Event.objects.total() == 2
+
+
+def test_backfill_event_rollups():
+    factories.EventFactory.create_batch(
+        3, event_date_time=datetime(2020, 1, 5, 10), event_type='t', event_outcome='o')
+    factories.EventFactory.create_batch(2, event_date_time=datetime(2020, 2, 1, 10))
+    expected = set(models.EventRollup.objects.values_list(
+        'day', 'event_type', 'event_outcome', 'count'))
+    models.EventRollup.objects.update(count=0)
+
+    call_command('backfill_event_rollups', chunk_size=2, stdout=StringIO())
+
+    assert set(models.EventRollup.objects.values_list(
+        'day', 'event_type', 'event_outcome', 'count')) == expected
+    assert (date(2020, 1, 5), 't', 'o', 3) in expected
+
+
+def test_backfill_event_rollups_failure_keeps_old_rollups(monkeypatch):
+    factories.EventFactory.create_batch(4)
+    expected = set(models.EventRollup.objects.values_list(
+        'day', 'event_type', 'event_outcome', 'count'))
+    adjust = models.EventRollup.objects.adjust
+    calls = []
+
+    def fail_on_second_chunk(counts):
+        calls.append(counts)
+        if len(calls) == 2:
+            raise DatabaseError('connection lost')
+        adjust(counts)
+    monkeypatch.setattr(models.EventRollup.objects, 'adjust', fail_on_second_chunk)
+
+    with pytest.raises(DatabaseError):
+        call_command('backfill_event_rollups', chunk_size=2, stdout=StringIO())
+
+    assert set(models.EventRollup.objects.values_list(
+        'day', 'event_type', 'event_outcome', 'count')) == expected
+
+
+def test_build_latest_events():
+    events = factories.EventFactory.create_batch(4, linking_objects=True)
+    for event in events[1:]:
+        event.linking_objects.add(events[0].linking_objects.first())
+    expected = set(models.LatestEvent.objects.values_list(
+        'linkobject_id', 'event_type', 'event_id'))
+    models.LatestEvent.objects.all().delete()
+
+    call_command('build_latest_events', chunk_size=3, stdout=StringIO())
+
+    assert set(models.LatestEvent.objects.values_list(
+        'linkobject_id', 'event_type', 'event_id')) == expected
+
+
+def test_backfill_object_keys():
+    link_objects = factories.LinkObjectFactory.create_batch(3)
+    factories.LinkObjectFactory.create(object_identifier='ark:/67531/MetaPTH1')
+    models.LinkObject.objects.update(object_key='')
+    out = StringIO()
+
+    call_command('backfill_object_keys', chunk_size=2, stdout=out)
+
+    assert out.getvalue() == 'Done: 4 linking objects updated.\n'
+    assert models.LinkObject.objects.get(object_identifier='ark:/67531/MetaPTH1').object_key \
+        == 'metapth1'
+    for link_object in link_objects:
+        link_object.refresh_from_db()
+        assert link_object.object_key == link_object.object_identifier
+
+
+def test_pes_explain():
+    factories.EventFactory.create_batch(2, linking_objects=True)
+    out = StringIO()
+
+    call_command('pes_explain', stdout=out)
+
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 32
+    assert lines[0].startswith('event_outcome: ')
+    assert lines[-1].endswith('of 31 search shapes flagged.')
+
+
+@pytest.mark.parametrize('plan,flagged', [
+    ('2 0 0 SCAN premis_event_service_event', True),
+    ('2 0 0 SCAN premis_event_service_event USING INDEX pes_event_date', False),
+    ('2 0 0 SCAN premis_event_service_event USING COVERING INDEX pes_event_date', False),
+    ('2 0 0 SEARCH premis_event_service_event USING INDEX pes_event_type (event_type=?)\n'
+     '5 0 0 SCAN premis_event_service_linkobject', True),
+])
+def test_pes_explain_sqlite_full_scans(plan, flagged):
+    pattern = dict(pes_explain.PLAN_FLAGS['sqlite'])['full scan']
+    assert bool(pattern.search(plan)) == flagged
+
+
+def test_pes_explain_prints_plans():
+    out = StringIO()
+    call_command('pes_explain', verbosity=2, stdout=out)
+    assert '    ' in out.getvalue()
+    assert 'premis_event_service_event' in out.getvalue()
+
+
+def test_pes_generate():
+    out = StringIO()
+
+    call_command('pes_generate', '300', objects=20, batch_size=100, seed=1, stdout=out)
+
+    assert 'Done: 300 events generated' in out.getvalue()
+    assert models.Event.objects.count() == 300
+    assert models.Event.objects.total() == 300
+    assert models.LinkObject.objects.count() == 20
+    assert models.EventLinkObject.objects.count() >= 300
+    assert models.EventRollup.objects.aggregate(Sum('count'))['count__sum'] == 300
+    assert models.LatestEvent.objects.exists()
+    # Skewed towards the first event type and outcome.
+    counts = collections.Counter(models.Event.objects.values_list('event_type', flat=True))
+    assert counts.most_common(1)[0][0] == factories.EVENT_TYPES[0]
+    assert models.Event.objects.filter(
+        event_outcome=factories.EVENT_OUTCOMES[0]
+    ).count() > 250
+
+
+def test_pes_generate_is_repeatable():
+    call_command('pes_generate', '5', seed=3, stdout=StringIO())
+    first = list(models.Event.objects.order_by('ordinal').values_list(
+        'event_identifier', 'event_type', 'event_outcome'
+    ))
+    models.Event.objects.all().delete()
+
+    call_command('pes_generate', '5', seed=3, stdout=StringIO())
+
+    assert list(models.Event.objects.order_by('ordinal').values_list(
+        'event_identifier', 'event_type', 'event_outcome'
+    )) == first
+
+
+def test_pes_generate_rejects_unknown_tier():
+    with pytest.raises(CommandError):
+        call_command('pes_generate', '5x', stdout=StringIO())
@@ -0,0 +1,102 @@
+from unittest.mock import patch
+
+from lxml import etree
+import pytest
+
+from premis_event_service import event_cache, models, presentation, views
+from . import factories
+
+
+pytestmark = [
+    pytest.mark.urls('premis_event_service.urls'),
+    pytest.mark.django_db,
+]
+
+
+@pytest.fixture(autouse=True)
+def cache():
+    """Provides an empty event cache."""
+    cache = event_cache.get_cache()
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+def counts(before):
+    after = event_cache.stats()
+    return after['hits'] - before['hits'], after['misses'] - before['misses']
+
+
+def test_get_event_xml_caches_fragment():
+    event = factories.EventFactory.create(linking_objects=True)
+    before = event_cache.stats()
+    first = etree.tostring(event_cache.get_event_xml(event))
+    second = etree.tostring(event_cache.get_event_xml(event))
+
+    assert first == second == etree.tostring(presentation.objectToPremisEventXML(event))
+    assert counts(before) == (1, 1)
+
+
+def test_get_events_xml_serializes_misses_together(django_assert_num_queries):
+    factories.EventFactory.create_batch(4, linking_objects=True)
+    events = list(models.Event.objects.all())
+    event_cache.get_event_xml(events[0])
+    expected = [etree.tostring(x) for x in presentation.objectsToPremisEventXML(events)]
+    events = list(models.Event.objects.all())
+
+    before = event_cache.stats()
+    with django_assert_num_queries(1):
+        actual = [etree.tostring(x) for x in event_cache.get_events_xml(events)]
+    assert actual == expected
+    assert counts(before) == (1, 3)
+
+
+def test_updated_event_misses():
+    event = factories.EventFactory.create()
+    event_cache.get_event_xml(event)
+    event.event_detail = 'changed'
+    event.save()
+
+    before = event_cache.stats()
+    event_xml = event_cache.get_event_xml(event)
+    assert counts(before) == (0, 1)
+    assert b'changed' in etree.tostring(event_xml)
+
+
+def test_disabled_cache():
+    event = factories.EventFactory.create()
+    before = event_cache.stats()
+    with patch('premis_event_service.settings.PES_EVENT_CACHE', None):
+        event_cache.get_event_xml(event)
+    assert counts(before) == (0, 0)
+
+
+def test_delete_invalidates(rf, cache):
+    event = factories.EventFactory.create()
+    event_cache.get_event_xml(event)
+    request = rf.delete('/', HTTP_HOST='example.com')
+    views.app_event(request, event.event_identifier)
+    assert cache.get(event_cache.cache_key(event)) is None
+
+
+def test_put_invalidates(event_xml, rf, cache):
+    event = factories.EventFactory.create(event_identifier=event_xml.identifier)
+    event_cache.get_event_xml(event)
+    request = rf.put(
+        '/', event_xml.entry_xml, content_type='application/xml', HTTP_HOST='example.com')
+    views.app_event(request, event.event_identifier)
+    assert cache.get(event_cache.cache_key(event)) is None
+
+
+def test_feed_uses_cached_fragments(rf):
+    factories.EventFactory.create_batch(5, linking_objects=True)
+    request = rf.get('/', HTTP_HOST='example.com')
+    first = etree.fromstring(views.app_event(request).content)
+
+    before = event_cache.stats()
+    second = etree.fromstring(views.app_event(request).content)
+    assert counts(before) == (5, 0)
+
+    def contents(feed):
+        return [etree.tostring(c) for c in feed.iter('{http://www.w3.org/2005/Atom}content')]
+    assert contents(first) == contents(second)
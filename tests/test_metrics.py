@@ -0,0 +1,188 @@
+import sqlite3
+import time
+
+import pytest
+
+from django.db.utils import IntegrityError
+from django.http import HttpResponse
+from django.urls import reverse
+
+from premis_event_service import metrics
+from premis_event_service.models import Event
+
+
+@pytest.fixture
+def process_metrics(monkeypatch):
+    """The metrics of a process that has just started, kept in memory."""
+    monkeypatch.setattr(metrics, '_metrics', None)
+    monkeypatch.setattr('premis_event_service.settings.PES_METRICS_ENABLED', True)
+    monkeypatch.setattr('premis_event_service.settings.PES_METRICS_PATH', None)
+    return metrics.get_metrics
+
+
+def test_processes_add_up_in_the_store(tmp_path):
+    path = str(tmp_path / 'metrics.sqlite3')
+    first = metrics.Metrics(path, flush_interval=60)
+    second = metrics.Metrics(path, flush_interval=60)
+
+    first.inc('pes_events_ingested_total', 'result="created"', 2)
+    second.inc('pes_events_ingested_total', 'result="created"', 3)
+    second.flush()
+
+    assert first.samples() == {('pes_events_ingested_total', 'result="created"'): 5}
+
+
+def test_counts_wait_for_the_flush_interval(tmp_path):
+    path = str(tmp_path / 'metrics.sqlite3')
+    metric = metrics.Metrics(path, flush_interval=60)
+
+    metric.inc('pes_events_ingested_total', 'result="error"')
+
+    assert metrics.MetricsStore(path).samples() == {}
+
+
+def test_counts_are_flushed_in_the_background(tmp_path):
+    path = str(tmp_path / 'metrics.sqlite3')
+    metric = metrics.Metrics(path, flush_interval=0.01)
+
+    metric.inc('pes_events_ingested_total', 'result="error"')
+
+    store = metrics.MetricsStore(path)
+    deadline = time.monotonic() + 5
+    while not store.samples() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.samples() == {('pes_events_ingested_total', 'result="error"'): 1}
+
+
+def test_failed_flush_keeps_the_counts(tmp_path, monkeypatch, caplog):
+    metric = metrics.Metrics(str(tmp_path / 'metrics.sqlite3'), flush_interval=60)
+    metric.inc('pes_events_ingested_total', 'result="created"')
+
+    def locked(samples):
+        raise sqlite3.OperationalError('database is locked')
+    monkeypatch.setattr(metric.store, 'add', locked)
+    metric.flush()
+
+    assert 'Could not flush metrics' in caplog.text
+    assert metric.pending == {('pes_events_ingested_total', 'result="created"'): 1}
+
+
+def test_histogram_buckets_are_cumulative():
+    metric = metrics.Metrics()
+
+    metric.observe('latency', 'view="a"', 0.2, (0.1, 0.5, 1))
+
+    assert metric.samples() == {
+        ('latency_bucket', 'view="a",le="0.5"'): 1,
+        ('latency_bucket', 'view="a",le="1"'): 1,
+        ('latency_bucket', 'view="a",le="+Inf"'): 1,
+        ('latency_sum', 'view="a"'): 0.2,
+        ('latency_count', 'view="a"'): 1,
+    }
+
+
+def test_exposition_orders_buckets_by_bound():
+    metric = metrics.Metrics()
+    metric.observe('pes_http_request_duration_seconds', 'view="app"', 0.003,
+                   metrics.LATENCY_BUCKETS)
+
+    text = metrics.exposition(metric.samples())
+
+    buckets = [line for line in text.splitlines() if '_bucket' in line]
+    assert buckets[0] == 'pes_http_request_duration_seconds_bucket{view="app",le="0.005"} 1'
+    assert buckets[1].startswith('pes_http_request_duration_seconds_bucket{view="app",le="0.01"}')
+    assert buckets[-1] == 'pes_http_request_duration_seconds_bucket{view="app",le="+Inf"} 1'
+    assert '# TYPE pes_http_request_duration_seconds histogram' in text
+    assert 'pes_http_request_duration_seconds_count{view="app"} 1' in text
+
+
+def test_labels_are_escaped():
+    assert metrics.format_labels(('view', 'a"b\\c')) == 'view="a\\"b\\\\c"'
+
+
+@pytest.mark.django_db
+def test_middleware_counts_requests_by_view(process_metrics, rf):
+    def view(request):
+        Event.objects.count()
+        return HttpResponse(status=201)
+
+    request = rf.post('/APP/event/')
+    request.resolver_match = type('Match', (), {'view_name': 'app-event'})
+    metrics.MetricsMiddleware(view)(request)
+    metrics.MetricsMiddleware(lambda request: HttpResponse(status=404))(rf.get('/nowhere/'))
+
+    samples = process_metrics().samples()
+    assert samples[(
+        'pes_http_requests_total', 'view="app-event",method="POST",status="201"'
+    )] == 1
+    assert samples[('pes_http_request_duration_seconds_count', 'view="app-event"')] == 1
+    assert samples[('pes_db_queries_total', 'view="app-event"')] == 1
+    assert samples[(
+        'pes_http_requests_total', 'view="unmatched",method="GET",status="404"'
+    )] == 1
+
+
+@pytest.mark.django_db
+def test_ingest_is_counted_by_result(process_metrics, client, event_xml):
+    post = lambda: client.post(  # noqa: E731
+        reverse('app-event'), event_xml.entry_xml,
+        content_type='application/xml', HTTP_HOST='example.com'
+    )
+    assert post().status_code == 201
+    assert post().status_code == 409
+
+    samples = process_metrics().samples()
+    assert samples[('pes_events_ingested_total', 'result="created"')] == 1
+    assert samples[('pes_events_ingested_total', 'result="duplicate"')] == 1
+
+
+@pytest.mark.django_db
+def test_ingest_save_errors_are_counted(process_metrics, client, event_xml, monkeypatch):
+    def fail(eventXML):
+        raise IntegrityError('NOT NULL constraint failed')
+    monkeypatch.setattr('premis_event_service.views.premisEventXMLToObject', fail)
+
+    response = client.post(
+        reverse('app-event'), event_xml.entry_xml,
+        content_type='application/xml', HTTP_HOST='example.com'
+    )
+
+    assert response.status_code == 400
+    assert process_metrics().samples()[('pes_events_ingested_total', 'result="error"')] == 1
+
+
+@pytest.mark.django_db
+def test_unwritable_store_does_not_fail_ingest(process_metrics, monkeypatch, tmp_path,
+                                               client, event_xml):
+    monkeypatch.setattr('premis_event_service.settings.PES_METRICS_PATH',
+                        str(tmp_path / 'missing' / 'metrics.sqlite3'))
+
+    response = client.post(
+        reverse('app-event'), event_xml.entry_xml,
+        content_type='application/xml', HTTP_HOST='example.com'
+    )
+
+    assert response.status_code == 201
+    assert process_metrics().samples()[('pes_events_ingested_total', 'result="created"')] == 1
+
+
+@pytest.mark.django_db
+def test_nothing_is_counted_unless_enabled(process_metrics, monkeypatch):
+    monkeypatch.setattr('premis_event_service.settings.PES_METRICS_ENABLED', False)
+
+    metrics.count_ingested(created=1)
+    metrics.count_cache_lookups(1, 1)
+
+    assert process_metrics().samples() == {}
+
+
+@pytest.mark.django_db
+def test_metrics_view(process_metrics, client):
+    metrics.count_ingested(created=3, error=1)
+
+    response = client.get(reverse('metrics'))
+
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    text = response.content.decode()
+    assert 'pes_events_ingested_total{result="created"} 3' in text
+    assert 'pes_events_ingested_total{result="error"} 1' in text
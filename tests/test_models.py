@@ -1,7 +1,14 @@
+import importlib
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.core.cache import caches
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
 from django.utils import timezone
 import pytest
 
-from premis_event_service import models
+from premis_event_service import models, settings
 from . import factories
 
 
@@ -17,12 +24,116 @@ class TestAgent:
         assert agent.get_absolute_url() == url
 
 
+@pytest.mark.django_db
+class TestAgentRegistry:
+
+    def test_registry(self):
+        agents = factories.AgentFactory.create_batch(3)
+        registry = models.Agent.objects.registry()
+        assert list(registry) == [
+            a.agent_identifier for a in sorted(agents, key=lambda a: a.agent_name)
+        ]
+        for agent in agents:
+            assert registry[agent.agent_identifier].agent_type_label == \
+                models.AGENT_TYPE_LABELS[agent.agent_type]
+
+    def test_registry_is_read_only(self):
+        registry = models.Agent.objects.registry()
+        with pytest.raises(TypeError):
+            registry['x'] = None
+
+    def test_registry_is_loaded_once(self, django_assert_num_queries):
+        factories.AgentFactory.create()
+        models.Agent.objects.registry()
+        with django_assert_num_queries(0):
+            models.Agent.objects.registry()
+
+    def test_save_and_delete_reload_registry(self):
+        agent = factories.AgentFactory.create()
+        assert agent.agent_identifier in models.Agent.objects.registry()
+        agent.agent_name = 'Renamed'
+        agent.save()
+        assert models.Agent.objects.registry()[agent.agent_identifier].agent_name == 'Renamed'
+        agent.delete()
+        assert agent.agent_identifier not in models.Agent.objects.registry()
+
+    def test_version_change_in_another_process_reloads_registry(
+            self, django_assert_num_queries):
+        agent = factories.AgentFactory.create()
+        models.Agent.objects.registry()
+        # Another process changes the agent and bumps the shared version.
+        models.Agent.objects.filter(pk=agent.pk).update(agent_name='Renamed')
+        cache = caches[settings.PES_AGENT_REGISTRY_CACHE]
+        cache.set(models.AGENT_REGISTRY_VERSION_KEY, 'elsewhere')
+
+        with django_assert_num_queries(1):
+            registry = models.Agent.objects.registry()
+
+        assert registry[agent.agent_identifier].agent_name == 'Renamed'
+
+    def test_registry_is_reloaded_after_its_timeout(self, monkeypatch):
+        agent = factories.AgentFactory.create()
+        models.Agent.objects.registry()
+        # Changed by a process whose version bump this cache doesn't see.
+        models.Agent.objects.filter(pk=agent.pk).update(agent_name='Renamed')
+        assert models.Agent.objects.registry()[agent.agent_identifier].agent_name != 'Renamed'
+
+        monkeypatch.setattr('premis_event_service.settings.PES_AGENT_REGISTRY_TIMEOUT', 0)
+
+        assert models.Agent.objects.registry()[agent.agent_identifier].agent_name == 'Renamed'
+
+    def test_local_version_cache_is_warned_about(self, monkeypatch, caplog):
+        monkeypatch.setattr(models.AgentManager, '_warned_local', False)
+
+        models.Agent.objects.registry()
+        models.Agent.objects.registry()
+
+        warnings = [r for r in caplog.records if 'PES_AGENT_REGISTRY_CACHE' in r.getMessage()]
+        assert len(warnings) == 1
+
+    def test_registry_without_version_cache(self, monkeypatch):
+        monkeypatch.setattr('premis_event_service.settings.PES_AGENT_REGISTRY_CACHE', None)
+        agent = factories.AgentFactory.create()
+        assert agent.agent_identifier in models.Agent.objects.registry()
+        agent.delete()
+        assert agent.agent_identifier not in models.Agent.objects.registry()
+
+
 class TestLinkObject:
 
     def test_str(self):
         link_object = factories.LinkObjectFactory.build()
         assert link_object.object_identifier == str(link_object)
 
+    @pytest.mark.django_db
+    def test_save_sets_object_key(self):
+        link_object = factories.LinkObjectFactory.create(
+            object_identifier='ark:/67531/MetaPTH1')
+        assert link_object.object_key == 'metapth1'
+
+    @pytest.mark.django_db
+    def test_migration_fills_object_keys(self):
+        migration = importlib.import_module(
+            'premis_event_service.migrations.0012_fill_object_keys')
+        factories.LinkObjectFactory.create(object_identifier='ark:/67531/MetaPTH1')
+        models.LinkObject.objects.update(object_key='')
+
+        migration.fill_object_keys(apps, SimpleNamespace(connection=connection))
+
+        assert models.LinkObject.objects.get().object_key == 'metapth1'
+
+
+@pytest.mark.parametrize('identifier,key', [
+    ('ark:/67531/metapth1', 'metapth1'),
+    ('ARK:/67531/metapth1', 'metapth1'),
+    ('ark:67531/metapth1', 'metapth1'),
+    (' metapth1 ', 'metapth1'),
+    ('ark:/12345/metapth1', 'ark:/12345/metapth1'),
+    ('http://example.com/Bag', 'http://example.com/bag'),
+])
+def test_normalize_object_identifier(identifier, key):
+    assert models.normalize_object_identifier(identifier) == key
+
 
 class TestEvent:
 
@@ -115,6 +226,16 @@ class TestEventManager:
 
         assert self.results_has_event(results, event)
 
+    def test_search_filters_by_bare_linked_object_id(self, manager):
+        factories.EventFactory.create_batch(3, linking_objects=True)
+        event = factories.EventFactory.create()
+        event.linking_objects.add(
+            factories.LinkObjectFactory.create(object_identifier='ark:/67531/metapth1'))
+
+        results = manager.search(linked_object_id='metapth1')
+
+        assert self.results_has_event(results, event)
+
     def test_search_filters_by_event_outcome(self, manager):
         event_outcome = 'Test Outcome'
 
@@ -134,3 +255,217 @@ class TestEventManager:
         results = manager.search(event_type=event_type)
 
         assert self.results_has_event(results, event)
+
+    def test_total_counts_saved_and_deleted_events(self, django_assert_num_queries):
+        events = factories.EventFactory.create_batch(3)
+        events[0].save()
+        events[1].delete()
+        with django_assert_num_queries(1):
+            assert models.Event.objects.total() == 2
+
+    @pytest.mark.parametrize('strategy', ['counter', 'estimated', 'exact'])
+    def test_total_strategies(self, strategy, monkeypatch):
+        monkeypatch.setattr('premis_event_service.settings.PES_EVENT_COUNT', strategy)
+        factories.EventFactory.create_batch(2)
+        # SQLite keeps no estimate, so 'estimated' falls back to the counter.
+        assert models.Event.objects.total() == 2
+
+    def test_total_initializes_missing_counter(self):
+        factories.EventFactory.create_batch(2)
+        models.Counter.objects.all().delete()
+        assert models.Event.objects.total() == 2
+        assert models.Counter.objects.get(name=models.EVENT_COUNTER).value == 2
+
+
+@pytest.mark.django_db
+class TestSearchCount:
+    EVENT_TYPE = 'http://purl.org/net/untl/vocabularies/preservationEvents/#fixityCheck'
+
+    @pytest.fixture
+    def events(self):
+        factories.EventFactory.create_batch(3, event_type='other')
+        return factories.EventFactory.create_batch(
+            5, event_type=self.EVENT_TYPE,
+            event_date_time=timezone.now().replace(2015, 1, 1)
+        )
+
+    @pytest.fixture
+    def strategy(self, monkeypatch):
+        def set_strategy(strategy, cap=10000):
+            monkeypatch.setattr('premis_event_service.settings.PES_SEARCH_COUNT', strategy)
+            monkeypatch.setattr('premis_event_service.settings.PES_SEARCH_COUNT_CAP', cap)
+        return set_strategy
+
+    def test_exact(self, events, strategy):
+        strategy('exact', cap=2)
+        assert models.Event.objects.search_count(event_type=self.EVENT_TYPE) == (5, True, False)
+
+    def test_capped_under_cap(self, events, strategy):
+        strategy('capped', cap=5)
+        assert models.Event.objects.search_count(event_type=self.EVENT_TYPE) == (5, True, False)
+
+    def test_capped_over_cap(self, events, strategy):
+        strategy('capped', cap=4)
+        assert models.Event.objects.search_count(event_type=self.EVENT_TYPE) == (4, False, False)
+
+    def test_estimated_from_rollups(self, events, strategy, django_assert_num_queries):
+        strategy('estimated')
+        with django_assert_num_queries(1):
+            count = models.Event.objects.search_count(
+                event_type=self.EVENT_TYPE,
+                start_date=timezone.now().replace(2014, 12, 31),
+                end_date=timezone.now().replace(2015, 1, 2),
+            )
+        assert count == (5, False, True)
+
+    def test_estimated_falls_back_to_capped(self, strategy):
+        strategy('estimated', cap=1)
+        event = factories.EventFactory.create(linking_objects=True)
+        # SQLite has no row estimate for a linked object search.
+        count = models.Event.objects.search_count(
+            linked_object_id=event.linking_objects.first().object_identifier
+        )
+        assert count == (1, True, False)
+
+
+@pytest.mark.django_db
+class TestCounterManager:
+
+    def test_reconcile(self):
+        factories.EventFactory.create_batch(3)
+        models.Counter.objects.filter(name=models.EVENT_COUNTER).update(value=10)
+        old_new = models.Counter.objects.reconcile(
+            models.EVENT_COUNTER, models.Event.objects.all())
+        assert old_new == (10, 3)
+        assert models.Event.objects.total() == 3
+
+    def test_adjust_ignores_missing_counter(self):
+        models.Counter.objects.adjust('missing', 1)
+        assert not models.Counter.objects.filter(name='missing').exists()
+
+    def test_estimate_without_backend_support(self):
+        assert models.Counter.objects.estimate(models.Event) is None
+
+
+@pytest.mark.django_db
+class TestEventRollup:
+
+    def rollups(self):
+        return {
+            (r.day, r.event_type, r.event_outcome): r.count
+            for r in models.EventRollup.objects.all()
+        }
+
+    def test_follows_saves_and_deletes(self):
+        day = timezone.datetime(2020, 1, 5, 10).date()
+        events = factories.EventFactory.create_batch(
+            3, event_date_time=timezone.datetime(2020, 1, 5, 10),
+            event_type='fixity', event_outcome='failure')
+        events[0].event_outcome = 'success'
+        events[0].save()
+        events[1].delete()
+
+        assert self.rollups() == {
+            (day, 'fixity', 'failure'): 1,
+            (day, 'fixity', 'success'): 1,
+        }
+
+    def test_adjust(self, django_assert_num_queries):
+        day = timezone.datetime(2020, 1, 5).date()
+        models.EventRollup.objects.adjust({(day, 'a', 'x'): 2})
+        # One read, one update, and one insert in a savepoint.
+        with django_assert_num_queries(5):
+            models.EventRollup.objects.adjust({
+                (day, 'a', 'x'): 3,
+                (day, 'b', 'x'): 1,
+                (day, 'c', 'x'): 4,
+            })
+        assert self.rollups() == {
+            (day, 'a', 'x'): 5,
+            (day, 'b', 'x'): 1,
+            (day, 'c', 'x'): 4,
+        }
+
+
+@pytest.mark.django_db
+class TestLatestEvent:
+
+    @pytest.fixture
+    def link(self):
+        return factories.LinkObjectFactory.create()
+
+    def create(self, link, day, event_type='fixity'):
+        event = factories.EventFactory.create(
+            event_date_time=timezone.datetime(2020, 1, day), event_type=event_type)
+        event.linking_objects.add(link)
+        return event
+
+    def latest(self, link, event_type='fixity'):
+        return models.LatestEvent.objects.latest_event(link.object_identifier, event_type)
+
+    def test_follows_added_links(self, link):
+        self.create(link, 2)
+        newest = self.create(link, 5)
+        self.create(link, 3)
+        other = self.create(link, 1, event_type='replication')
+        assert self.latest(link) == newest
+        assert self.latest(link, 'replication') == other
+        assert models.LatestEvent.objects.latest_event(link.object_identifier) == newest
+
+    def test_keeps_first_of_tied_events(self, link):
+        first = self.create(link, 2)
+        self.create(link, 2)
+        assert self.latest(link) == first
+
+    def test_follows_updates(self, link):
+        older = self.create(link, 2)
+        newest = self.create(link, 5)
+        newest.event_date_time = timezone.datetime(2020, 1, 1)
+        newest.save()
+        assert self.latest(link) == older
+        newest.event_type = 'replication'
+        newest.save()
+        assert self.latest(link, 'replication') == newest
+
+    def test_follows_deletes(self, link):
+        older = self.create(link, 2)
+        self.create(link, 5).delete()
+        assert self.latest(link) == older
+        older.delete()
+        assert self.latest(link) is None
+        assert not models.LatestEvent.objects.exists()
+
+    def test_follows_removed_links(self, link):
+        older = self.create(link, 2)
+        newest = self.create(link, 5)
+        newest.linking_objects.remove(link)
+        assert self.latest(link) == older
+        older.linking_objects.clear()
+        assert self.latest(link) is None
+
+    def test_migration_fills_latest_events(self, link, monkeypatch):
+        migration = importlib.import_module(
+            'premis_event_service.migrations.0013_fill_latest_events')
+        monkeypatch.setattr(migration, 'CHUNK_SIZE', 2)
+        older = self.create(link, 2)
+        newest = self.create(link, 5)
+        self.create(link, 3)
+        other = self.create(link, 1, event_type='replication')
+        # As left by an upgrade: only an event added since is recorded.
+        models.LatestEvent.objects.all().delete()
+        models.LatestEvent.objects.create(
+            linkobject=link, event_type='fixity', event=older,
+            event_date_time=older.event_date_time)
+
+        state = MigrationLoader(connection).project_state(
+            ('premis_event_service', '0012_fill_object_keys'))
+        migration.fill_latest_events(state.apps, SimpleNamespace(connection=connection))
+
+        assert self.latest(link) == newest
+        assert self.latest(link, 'replication') == other
+        assert models.LatestEvent.objects.count() == 2
+
+    def test_follows_links_added_from_object(self, link):
+        event = factories.EventFactory.create()
+        link.event_set.add(event)
+        assert self.latest(link, event.event_type) == event
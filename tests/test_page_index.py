@@ -0,0 +1,210 @@
+from datetime import date
+import pytest
+
+from django.core.paginator import EmptyPage
+
+from premis_event_service import models, page_index, views
+from . import factories
+
+
+pytestmark = [
+    pytest.mark.urls('premis_event_service.urls'),
+    pytest.mark.django_db,
+]
+
+EVENT_TYPE = 'http://purl.org/net/untl/vocabularies/preservationEvents/#fixityCheck'
+
+
+def page_ordinals(rf, valid, page, per_page=3, **params):
+    request = rf.get('/', dict(params, page=page))
+    context = views.paginate_events(valid, request, per_page=per_page)
+    return [e.ordinal for e in context['events']]
+
+
+@pytest.mark.parametrize('valid', [{}, {'event_type': EVENT_TYPE}])
+def test_pages_match_offset_paging(rf, valid):
+    factories.EventFactory.create_batch(10, event_type=EVENT_TYPE)
+    factories.EventFactory.create_batch(3, event_type='other')
+    expected = list(
+        models.Event.objects.search(**valid).values_list('ordinal', flat=True)
+        if valid else models.Event.objects.order_by('-ordinal')
+        .values_list('ordinal', flat=True)
+    )
+
+    pages = [page_ordinals(rf, valid, page) for page in range(1, len(expected) // 3 + 2)]
+
+    assert sum(pages, []) == expected
+    assert all(len(p) == 3 for p in pages[:-1])
+
+
+def test_page_past_the_end(rf):
+    factories.EventFactory.create_batch(4)
+    with pytest.raises(EmptyPage):
+        page_ordinals(rf, {}, 3)
+
+
+def test_index_is_extended_with_new_events(rf, django_assert_num_queries):
+    factories.EventFactory.create_batch(7)
+    page_ordinals(rf, {}, 2)
+    new = factories.EventFactory.create_batch(4)
+    events = models.Event.objects.all()
+
+    # Only the events from the last checkpoint on are read again.
+    with django_assert_num_queries(1):
+        index = page_index.get_index(events, {}, 3)
+
+    assert index.count == 11
+    assert page_ordinals(rf, {}, 2) == [new[0].ordinal] + [
+        e.ordinal for e in events.order_by('-ordinal')[4:6]
+    ]
+
+
+def test_deep_page_reads_one_page(rf, django_assert_num_queries):
+    factories.EventFactory.create_batch(20, event_type=EVENT_TYPE)
+    valid = {'event_type': EVENT_TYPE}
+    page_ordinals(rf, valid, 2)
+
+    # The count, extending the index, the page and its linking objects.
+    with django_assert_num_queries(4):
+        ordinals = page_ordinals(rf, valid, 7)
+
+    assert ordinals == list(
+        models.Event.objects.order_by('ordinal').values_list('ordinal', flat=True)[:2]
+    )[::-1]
+
+
+def test_deleted_event_rebuilds_index(rf):
+    events = factories.EventFactory.create_batch(7)
+    page_ordinals(rf, {}, 2)
+    events[-1].delete()
+    assert page_ordinals(rf, {}, 2) == [e.ordinal for e in events[2::-1]]
+
+
+def test_missed_events_rebuild_index(rf):
+    events = factories.EventFactory.create_batch(7)
+    cache = page_index.get_cache()
+    key = page_index.cache_key(cache, {}, 3)
+    # An index that never saw the oldest event.
+    cache.set(key, page_index.PageIndex(3, [events[1].ordinal, events[4].ordinal], 6))
+
+    index = page_index.get_index(models.Event.objects.all(), {}, 3, expected_count=7)
+
+    assert index.count == 7
+    assert index.checkpoints == [events[0].ordinal, events[3].ordinal, events[6].ordinal]
+
+
+def test_disabled_index_pages_with_offset(rf, monkeypatch):
+    monkeypatch.setattr('premis_event_service.settings.PES_PAGE_INDEX_CACHE', None)
+    events = factories.EventFactory.create_batch(7)
+    assert page_ordinals(rf, {}, 3) == [events[0].ordinal]
+
+
+def test_search_signature_is_normalized():
+    assert page_index.search_signature({
+        'linked_object_id': 'ark:/67531/metapth1', 'event_type': '',
+        'start_date': date(2020, 1, 1),
+    }) == page_index.search_signature({
+        'start_date': date(2020, 1, 1), 'linked_object_id': 'METAPTH1',
+        'event_outcome': None,
+    })
+
+
+def test_unfiltered_pages_seek_on_their_links(rf, django_assert_num_queries):
+    events = factories.EventFactory.create_batch(10)
+    expected = [e.ordinal for e in events[::-1]]
+    context = views.paginate_events({}, rf.get('/'), per_page=3)
+    pages = [[e.ordinal for e in context['events']]]
+    while context['next_page_ord'] is not None:
+        request = rf.get('/', {'page': context['next_page'],
+                               'min_ordinal': context['next_page_ord']})
+        context = views.paginate_events({}, request, per_page=3)
+        pages.append([e.ordinal for e in context['events']])
+
+    assert pages == [expected[0:3], expected[3:6], expected[6:9], expected[9:]]
+    assert context['prev_page_ord'] == expected[6]
+
+    # The count, the page and its linking objects, and the previous and
+    # last pages' ordinals; no index is built.
+    request = rf.get('/', {'page': 3, 'min_ordinal': expected[6]})
+    with django_assert_num_queries(5):
+        context = views.paginate_events({}, request, per_page=3)
+    assert context['last_page_ord'] == expected[9]
+    assert [e.ordinal for e in context['events']] == expected[6:9]
+
+
+def test_updates_rebuild_only_the_indexes_they_affect(rf):
+    event = factories.EventFactory.create(event_type=EVENT_TYPE)
+    factories.EventFactory.create_batch(3, event_type='other')
+    cache = page_index.get_cache()
+    keys = {
+        name: page_index.cache_key(cache, valid, 3) for name, valid in (
+            ('type', {'event_type': EVENT_TYPE}),
+            ('other', {'event_type': 'other'}),
+            ('outcome', {'event_outcome': event.event_outcome}),
+            ('all', {}),
+        )
+    }
+
+    event.event_type = 'other'
+    event.save()
+
+    changed = {
+        name for name, valid in (
+            ('type', {'event_type': EVENT_TYPE}),
+            ('other', {'event_type': 'other'}),
+            ('outcome', {'event_outcome': event.event_outcome}),
+            ('all', {}),
+        ) if page_index.cache_key(cache, valid, 3) != keys[name]
+    }
+    assert changed == {'type', 'other'}
+
+
+def test_deletes_and_links_rebuild_the_indexes_they_affect():
+    event = factories.EventFactory.create(linking_objects=True)
+    link_object = factories.LinkObjectFactory.create()
+    cache = page_index.get_cache()
+    linked = {'linked_object_id': link_object.object_identifier}
+    before = page_index.cache_key(cache, linked, 3)
+
+    event.linking_objects.add(link_object)
+    assert page_index.cache_key(cache, linked, 3) != before
+
+    before = {valid: page_index.cache_key(cache, dict(valid), 3)
+              for valid in ((), (('event_type', event.event_type),))}
+    event.delete()
+    assert all(page_index.cache_key(cache, dict(valid), 3) != key
+               for valid, key in before.items())
+
+
+def test_large_searches_are_not_indexed(rf, monkeypatch, django_assert_num_queries):
+    monkeypatch.setattr('premis_event_service.settings.PES_PAGE_INDEX_MAX_EVENTS', 5)
+    events = factories.EventFactory.create_batch(7)
+
+    assert page_index.get_index(models.Event.objects.all(), {}, 3) is None
+    # The overflow is remembered rather than read again.
+    with django_assert_num_queries(0):
+        assert page_index.get_index(models.Event.objects.all(), {}, 3) is None
+    assert page_ordinals(rf, {}, 3) == [events[0].ordinal]
+
+
+def test_drifting_counter_does_not_rebuild_index(rf, django_assert_num_queries):
+    factories.EventFactory.create_batch(7)
+    page_ordinals(rf, {}, 2)
+    models.Counter.objects.filter(name=models.EVENT_COUNTER).update(value=8)
+
+    # The counter, extending the index, the page and its linking objects,
+    # and the last page's ordinal.
+    with django_assert_num_queries(5):
+        page_ordinals(rf, {}, 2)
+
+
+def test_changes_missed_by_the_cache_rebuild_counted_searches(rf, monkeypatch):
+    events = factories.EventFactory.create_batch(7, event_type=EVENT_TYPE)
+    valid = {'event_type': EVENT_TYPE}
+    page_ordinals(rf, valid, 2)
+
+    # As if deleted by another process, whose local cache was invalidated.
+    monkeypatch.setattr(page_index, 'invalidate', lambda terms=None: None)
+    events[0].delete()
+
+    assert page_ordinals(rf, valid, 2) == [e.ordinal for e in events[3:0:-1]]
@@ -11,6 +11,7 @@ from premis_event_service import presentation, models
 from premis_event_service import settings
 from . import factories
 
+from codalib.bagatom import getNodeByName, getNodesByName, updateObjectFromXML
 from codalib.xsdatetime import xsDateTime_format, localize_datetime
 
 
@@ -175,6 +176,22 @@ class TestPremisEventXMLToObject:
         with pytest.raises(presentation.DuplicateEventError):
             presentation.premisEventXMLToObject(tree)
 
+    def test_duplicate_uuid_event_id_raises_duplicate_error(self, event_xml):
+        tree = etree.fromstring(event_xml.obj_xml)
+        factories.EventFactory.create(event_identifier=event_xml.identifier)
+        with pytest.raises(presentation.DuplicateEventError):
+            presentation.premisEventXMLToObject(tree)
+        assert models.Event.objects.count() == 1
+
+    def test_query_count(self, event_xml, django_assert_max_num_queries):
+        tree = etree.fromstring(event_xml.obj_xml)
+        # Event insert, event counter update, rollup read and insert (in a
+        # savepoint), link object lookup and insert, link insert, and latest
+        # event read and insert (in a savepoint), plus the savepoint pair
+        # from running inside the test transaction.
+        with django_assert_max_num_queries(15):
+            presentation.premisEventXMLToObject(tree)
+
     @pytest.mark.xfail(reason='Validation error is raised on save(). The exception '
                               'this function tests will never be raised.')
     def test_invalid_datetime_string_raises_exception(self, event_xml):
@@ -224,6 +241,98 @@ class TestPremisEventXMLToObject:
         assert isinstance(event.event_date_time, datetime)
 
 
+class TestPremisEventXMLToFields:
+
+    def test_matches_xpath_map(self, event_xml):
+        tree = etree.fromstring(event_xml.obj_xml)
+        fields, _ = presentation.premisEventXMLToFields(tree)
+        expected = updateObjectFromXML(tree, models.Event(), presentation.xpath_map)
+        for field_name in presentation.xpath_map:
+            if not field_name.startswith('@'):
+                assert fields[field_name] == getattr(expected, field_name)
+
+    def test_returns_linking_object_nodes(self, event_xml):
+        tree = etree.fromstring(event_xml.obj_xml)
+        _, nodes = presentation.premisEventXMLToFields(tree)
+        assert [etree.QName(n).localname for n in nodes] == ['linkingObjectIdentifier']
+
+    def test_linking_object_nodes_match_by_local_name(self):
+        tree = etree.fromstring(
+            '<premis:event xmlns:premis="info:lc/xmlns/premis-v2">'
+            '<premis:linkingObjectIdentifier/>'
+            '<linkingObjectIdentifier/>'
+            '<other:linkingObjectIdentifier xmlns:other="urn:other"/>'
+            '<premis:eventOutcomeInformation><premis:linkingObjectIdentifier/>'
+            '</premis:eventOutcomeInformation>'
+            '</premis:event>'
+        )
+        _, nodes = presentation.premisEventXMLToFields(tree)
+        assert nodes == getNodesByName(tree, 'linkingObjectIdentifier')
+        assert len(nodes) == 3
+
+    def test_missing_elements_are_omitted(self):
+        tree = etree.fromstring(
+            '<premis:event xmlns:premis="info:lc/xmlns/premis-v2">'
+            '<!-- comment --><premis:eventType>type</premis:eventType>'
+            '</premis:event>'
+        )
+        fields, nodes = presentation.premisEventXMLToFields(tree)
+        assert fields == {'event_type': 'type'}
+        assert nodes == []
+
+
+@pytest.mark.django_db
+class TestPremisEventXMLListToObjects:
+
+    def test_returns_events(self, event_xml):
+        tree = etree.fromstring(event_xml.obj_xml)
+        results = presentation.premisEventXMLListToObjects([tree])
+        assert len(results) == 1
+        assert isinstance(results[0], models.Event)
+        assert models.Event.objects.filter(
+            event_identifier=event_xml.identifier).exists()
+
+    def test_sets_linking_object_keys(self, event_xml):
+        tree = etree.fromstring(event_xml.obj_xml)
+        event, = presentation.premisEventXMLListToObjects([tree])
+        for link_object in event.linking_objects.all():
+            assert link_object.object_key == models.normalize_object_identifier(
+                link_object.object_identifier)
+
+    def test_reuses_existing_linking_objects(self, event_xml):
+        obj_xml = event_xml.obj_xml
+        tree = etree.fromstring(obj_xml)
+        xml_obj = etree_to_objectify(tree)
+        identifier = xml_obj.linkingObjectIdentifier.linkingObjectIdentifierValue.text
+        factories.LinkObjectFactory.create(object_identifier=identifier)
+        other_xml = etree.fromstring(
+            obj_xml.replace(event_xml.identifier, 'other-identifier'))
+
+        results = presentation.premisEventXMLListToObjects([tree, other_xml])
+        assert models.LinkObject.objects.count() == 1
+        for event in results:
+            assert list(event.linking_objects.values_list(
+                'object_identifier', flat=True)) == [identifier]
+
+    def test_updates_event_count(self, event_xml):
+        factories.EventFactory.create()
+        obj_xml = event_xml.obj_xml
+        trees = [etree.fromstring(obj_xml),
+                 etree.fromstring(obj_xml.replace(event_xml.identifier, 'other-identifier'))]
+        presentation.premisEventXMLListToObjects(trees)
+        assert models.Counter.objects.get(name=models.EVENT_COUNTER).value == 3
+
+    def test_duplicate_event_id_returns_duplicate_error(self, event_xml):
+        tree = etree.fromstring(event_xml.obj_xml)
+        factories.EventFactory.create(event_identifier=event_xml.identifier)
+        results = presentation.premisEventXMLListToObjects([tree])
+        assert isinstance(results[0], presentation.DuplicateEventError)
+
+    def test_missing_event_returns_invalid_event_error(self):
+        results = presentation.premisEventXMLListToObjects([None])
+        assert isinstance(results[0], presentation.InvalidEventError)
+
+
 @pytest.mark.django_db
 class TestPremisAgentXMLToObject:
 
@@ -531,6 +640,108 @@ class TestObjectToPremisEventXML:
         premis_schema.assertValid(event_xml)
 
 
+def tree_walking_event_xml(eventObject):
+    """The original objectToPremisEventXML, kept to check that the faster
+    serializer's output hasn't changed.
+    """
+    eventXML = etree.Element("%sevent" % presentation.PREMIS, nsmap=presentation.PREMIS_NSMAP)
+    for fieldName, chain in presentation.translateDict.items():
+        baseName = chain[0]
+        baseNode = getNodeByName(eventXML, baseName)
+        chain = chain[1:]
+        if baseNode is None:
+            baseNode = etree.SubElement(eventXML, presentation.PREMIS + baseName)
+        for chainItem in chain:
+            parentNode = baseNode
+            baseNode = getNodeByName(eventXML, chainItem)
+            if baseNode is None:
+                baseNode = etree.SubElement(parentNode, presentation.PREMIS + chainItem)
+        try:
+            baseNode.text = getattr(eventObject, fieldName)
+        except TypeError:
+            value = getattr(eventObject, fieldName)
+            if isinstance(value, datetime):
+                if value.tzinfo is None:
+                    value = localize_datetime(value)
+                baseNode.text = xsDateTime_format(value)
+    for linking_object in eventObject.linking_objects.all():
+        linkObjectIDXML = etree.SubElement(
+            eventXML, presentation.PREMIS + "linkingObjectIdentifier")
+        etree.SubElement(
+            linkObjectIDXML, presentation.PREMIS + "linkingObjectIdentifierType"
+        ).text = linking_object.object_type
+        etree.SubElement(
+            linkObjectIDXML, presentation.PREMIS + "linkingObjectIdentifierValue"
+        ).text = linking_object.object_identifier
+        etree.SubElement(
+            linkObjectIDXML, presentation.PREMIS + "linkingObjectRole"
+        ).text = linking_object.object_role
+    return eventXML
+
+
+@pytest.mark.django_db
+class TestObjectToPremisEventXMLOutput:
+
+    def test_matches_tree_walking_serializer(self):
+        event = factories.EventFactory(linking_objects=True, linking_objects__count=2)
+        expected = etree.tostring(tree_walking_event_xml(event), pretty_print=True)
+        actual = etree.tostring(presentation.objectToPremisEventXML(event), pretty_print=True)
+        assert actual == expected
+
+    def test_matches_tree_walking_serializer_with_empty_fields(self):
+        event = factories.EventFactory(event_detail='', event_outcome_detail='')
+        event.linking_agent_identifier_type = None
+        expected = etree.tostring(tree_walking_event_xml(event))
+        actual = etree.tostring(presentation.objectToPremisEventXML(event))
+        assert actual == expected
+
+    def test_batch_matches_single(self, django_assert_num_queries):
+        factories.EventFactory.create_batch(
+            5, linking_objects=True, linking_objects__count=2)
+        events = list(models.Event.objects.all())
+        expected = [etree.tostring(tree_walking_event_xml(e)) for e in events]
+        with django_assert_num_queries(1):
+            actual = [etree.tostring(x)
+                      for x in presentation.objectsToPremisEventXML(events)]
+        assert actual == expected
+
+    def test_batch_uses_given_linking_objects(self, django_assert_num_queries):
+        factories.EventFactory.create_batch(3, linking_objects=True)
+        events = list(models.Event.objects.all())
+        linkingObjects = presentation.linkingObjectsByEvent(events)
+        expected = [etree.tostring(tree_walking_event_xml(e)) for e in events]
+        with django_assert_num_queries(0):
+            actual = [etree.tostring(x) for x in
+                      presentation.objectsToPremisEventXML(events, linkingObjects)]
+        assert actual == expected
+
+
+@pytest.mark.django_db
+class TestLinkingObjectsByEvent:
+
+    def test_maps_events_to_linking_objects(self, django_assert_num_queries):
+        events = factories.EventFactory.create_batch(
+            3, linking_objects=True, linking_objects__count=2)
+        events.append(factories.EventFactory.create())
+        with django_assert_num_queries(1):
+            linkingObjects = presentation.linkingObjectsByEvent(events)
+            actual = {
+                identifier: sorted(o.object_identifier for o in objects)
+                for identifier, objects in linkingObjects.items()
+            }
+        expected = {
+            e.event_identifier: sorted(e.linking_objects.values_list(
+                'object_identifier', flat=True))
+            for e in events
+        }
+        assert actual == expected
+        assert actual[events[-1].event_identifier] == []
+
+    def test_no_events(self, django_assert_num_queries):
+        with django_assert_num_queries(0):
+            assert presentation.linkingObjectsByEvent([]) == {}
+
+
 @pytest.mark.django_db
 class TestObjectToAgentXML:
 
@@ -0,0 +1,141 @@
+"""
+Query budgets for every URL of premis_event_service.
+
+Each endpoint is requested at every page size in PAGE_SIZES, against a
+store holding two pages of events, and must make no more queries than its
+budget, fetch no more rows than its budget allows for the page size, and
+make the same queries whatever the page size. A failure lists the queries
+by SQL fingerprint and call site.
+"""
+import collections
+
+import pytest
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from premis_event_service import page_index, urls, views
+from premis_event_service.models import Agent
+from . import factories
+from .query_budget import QueryRecorder
+
+
+pytestmark = pytest.mark.django_db
+
+PAGE_SIZES = (5, 20)
+
+# At most `queries` queries, fetching at most rows + rows_per_event * the
+# page size rows.
+Budget = collections.namedtuple('Budget', 'queries rows rows_per_event')
+
+Store = collections.namedtuple('Store', 'event agent link_object')
+
+Endpoint = collections.namedtuple('Endpoint', 'name args params budget status')
+
+
+def endpoint(name, budget, args=None, params=None, status=200):
+    return Endpoint(name, args or (lambda store: []), params or {}, budget, status)
+
+
+ENDPOINTS = [
+    endpoint('app', Budget(0, 0, 0)),
+    endpoint('app-event', Budget(4, 2, 4), params={'page': 2}),
+    endpoint('app-event', Budget(2, 1, 4), params={'cursor': ''}),
+    endpoint('app-event-detail', Budget(2, 4, 0),
+             args=lambda store: [store.event.event_identifier]),
+    endpoint('app-event-spool', Budget(0, 0, 0), args=lambda store: [1], status=404),
+    endpoint('app-agent', Budget(1, 0, 1)),
+    endpoint('app-agent-detail', Budget(1, 0, 1),
+             args=lambda store: [store.agent.agent_identifier]),
+    endpoint('event-list', Budget(3, 41, 0)),
+    endpoint('event-search', Budget(4, 1, 6), params={'page': 2}),
+    endpoint('event-search', Budget(3, 1, 6), params={'page': 2, 'min_ordinal': 10 ** 9}),
+    endpoint('event-search-json', Budget(4, 1, 6), params={'page': 2}),
+    endpoint('event-stats-json', Budget(1, 8, 0),
+             params={'group_by': ['event_type', 'event_outcome']}),
+    endpoint('event-export-ndjson', Budget(5, 0, 8)),
+    endpoint('event-export-xml', Budget(5, 0, 8)),
+    endpoint('find-event', Budget(2, 4, 0),
+             args=lambda store: [store.link_object.object_key]),
+    endpoint('event-detail', Budget(2, 4, 0),
+             args=lambda store: [store.event.event_identifier]),
+    endpoint('agent-list', Budget(1, 0, 1)),
+    endpoint('agent-detail-xml', Budget(1, 0, 1),
+             args=lambda store: [store.agent.agent_identifier]),
+    endpoint('agent-detail-premis-xml', Budget(1, 0, 1),
+             args=lambda store: [store.agent.agent_identifier]),
+    endpoint('agent-detail-json', Budget(1, 0, 1),
+             args=lambda store: [store.agent.agent_identifier]),
+    endpoint('agent-detail', Budget(1, 0, 1),
+             args=lambda store: [store.agent.agent_identifier]),
+    endpoint('metrics', Budget(0, 0, 0)),
+    endpoint('admin:premis_event_service_event_changelist', Budget(6, 4, 8)),
+]
+
+
+def endpoint_id(endpoint):
+    return '%s?%s' % (endpoint.name, '&'.join(endpoint.params)) if endpoint.params \
+        else endpoint.name
+
+
+def populate(size):
+    """Fill the store with two pages of events for the given page size."""
+    link_object = factories.LinkObjectFactory.create(object_identifier='ark:/67531/budget')
+    events = factories.EventFactory.create_batch(
+        size * 2, linking_objects=True, linking_objects__count=2
+    )
+    for event in events:
+        event.linking_objects.add(link_object)
+    agents = factories.AgentFactory.create_batch(size)
+    return Store(events[-1], agents[-1], link_object)
+
+
+def measure(endpoint, size, client, monkeypatch):
+    monkeypatch.setattr(views, 'EVENT_SEARCH_PER_PAGE', size)
+    monkeypatch.setattr(views, 'EVENT_EXPORT_CHUNK_SIZE', size)
+    with transaction.atomic():
+        store = populate(size)
+        # Loaded on first use, like a process that has just started.
+        Agent.objects.invalidate_registry()
+        page_index.invalidate()
+        url = reverse(endpoint.name, args=endpoint.args(store))
+        with QueryRecorder() as recorder:
+            response = client.get(url, endpoint.params)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        transaction.set_rollback(True)
+    assert response.status_code == endpoint.status, recorder.report()
+    return recorder
+
+
+@pytest.fixture
+def budget_client(monkeypatch, tmp_path):
+    # Measure the uncached path, and keep the spool out of the tree.
+    monkeypatch.setattr('premis_event_service.settings.PES_EVENT_CACHE', None)
+    monkeypatch.setattr('premis_event_service.settings.PES_INGEST_SPOOL_PATH',
+                        str(tmp_path / 'spool.sqlite3'))
+    client = Client(HTTP_HOST='testserver')
+    client.force_login(User.objects.create_superuser('budget', 'budget@example.com', 'x'))
+    return client
+
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS, ids=endpoint_id)
+def test_query_budget(endpoint, budget_client, monkeypatch):
+    recorders = [
+        measure(endpoint, size, budget_client, monkeypatch) for size in PAGE_SIZES
+    ]
+
+    for size, recorder in zip(PAGE_SIZES, recorders):
+        assert len(recorder) <= endpoint.budget.queries, recorder.report()
+        max_rows = endpoint.budget.rows + endpoint.budget.rows_per_event * size
+        assert recorder.rows <= max_rows, recorder.report()
+    for smaller, larger in zip(recorders, recorders[1:]):
+        growth = larger.growth(smaller)
+        assert growth is None, growth
+
+
+def test_every_url_has_a_budget():
+    names = {pattern.name for pattern in urls.urlpatterns}
+    assert names - {endpoint.name for endpoint in ENDPOINTS} == set()
@@ -0,0 +1,101 @@
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+from premis_event_service import slow_queries
+from . import factories
+
+
+@pytest.fixture
+def slow_query_log(monkeypatch, tmp_path):
+    monkeypatch.setattr('premis_event_service.settings.PES_SLOW_QUERY_PATH',
+                        str(tmp_path / 'slow.sqlite3'))
+    monkeypatch.setattr('premis_event_service.settings.PES_SLOW_QUERY_LIMIT', 3)
+    return slow_queries.get_slow_query_log()
+
+
+@pytest.fixture
+def recording_client(client, settings, monkeypatch, slow_query_log):
+    """A client whose every query counts as slow and is explained."""
+    settings.MIDDLEWARE = ['premis_event_service.slow_queries.SlowQueryMiddleware']
+    monkeypatch.setattr('premis_event_service.settings.PES_SLOW_QUERY_THRESHOLD', 0)
+    monkeypatch.setattr('premis_event_service.settings.PES_SLOW_QUERY_EXPLAIN_RATE', 1)
+    return client
+
+
+def test_fingerprint():
+    assert slow_queries.fingerprint(
+        "SELECT * FROM t WHERE a = 'x''y' AND b IN (1, 2,3)  AND c = %s"
+    ) == 'SELECT * FROM t WHERE a = ? AND b IN (...) AND c = ?'
+
+
+def test_log_keeps_the_latest_queries(slow_query_log):
+    for n in range(5):
+        slow_query_log.add(n, 'SELECT %d' % n)
+
+    assert [q['sql'] for q in slow_query_log.recent()] == ['SELECT 4', 'SELECT 3', 'SELECT 2']
+
+
+def test_summary_groups_by_view_and_fingerprint(slow_query_log):
+    slow_query_log.add(0.5, 'SELECT 1', view='a')
+    slow_query_log.add(1.0, 'SELECT 2', view='a', plan='SCAN t')
+    slow_query_log.add(0.1, 'SELECT 3', view='b')
+
+    summary = [dict(group) for group in slow_query_log.summary()]
+
+    assert summary == [
+        {'view': 'a', 'fingerprint': 'SELECT ?', 'count': 2, 'total': 1.5,
+         'slowest': 1.0, 'plan_id': 2},
+        {'view': 'b', 'fingerprint': 'SELECT ?', 'count': 1, 'total': 0.1,
+         'slowest': 0.1, 'plan_id': None},
+    ]
+
+
+@pytest.mark.django_db
+def test_middleware_records_queries_with_their_view_and_plan(recording_client, slow_query_log):
+    link_object = factories.LinkObjectFactory.create(object_identifier='ark:/67531/slow')
+    factories.EventFactory.create().linking_objects.add(link_object)
+
+    response = recording_client.get(reverse('find-event', args=[link_object.object_key]))
+
+    assert response.status_code == 200
+    queries = slow_query_log.recent()
+    assert queries
+    assert {query['view'] for query in queries} == {'find-event'}
+    assert all(query['plan'] for query in queries)
+    assert 'premis_event_service' in queries[0]['plan']
+
+
+@pytest.mark.django_db
+def test_fast_queries_are_not_recorded(client, settings, slow_query_log):
+    settings.MIDDLEWARE = ['premis_event_service.slow_queries.SlowQueryMiddleware']
+
+    client.get(reverse('agent-list'))
+
+    assert slow_query_log.recent() == []
+
+
+def test_pes_slow_queries(slow_query_log):
+    slow_query_log.add(0.75, 'SELECT a FROM t WHERE b = 1', view='find-event',
+                       method='GET', path='/event/find/x/', plan='SCAN t')
+    out = StringIO()
+
+    call_command('pes_slow_queries', stdout=out)
+    call_command('pes_slow_queries', recent=5, stdout=out)
+    call_command('pes_slow_queries', show=1, stdout=out)
+
+    lines = out.getvalue().splitlines()
+    assert lines[0] == 'find-event: 1x, 750 ms in total, slowest 750 ms, plan in #1'
+    assert lines[1] == '    SELECT a FROM t WHERE b = ?'
+    assert lines[2] == '1 query shapes.'
+    assert lines[3].endswith('750 ms find-event /event/find/x/ (plan)')
+    assert lines[-2:] == ['Plan:', '    SCAN t']
+
+
+def test_pes_slow_queries_show_unknown(slow_query_log):
+    with pytest.raises(CommandError):
+        call_command('pes_slow_queries', show=1)
@@ -0,0 +1,142 @@
+import json
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from lxml import etree
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.urls import reverse
+
+from premis_event_service import models, spool, views
+from premis_event_service.management.commands import ingest_spooled_events
+from . import conftest
+
+
+pytestmark = [
+    pytest.mark.urls('premis_event_service.urls'),
+]
+
+
+@pytest.fixture
+def ingest_spool(tmp_path):
+    """Provides an empty IngestSpool used by the views and command."""
+    path = str(tmp_path / 'spool.sqlite3')
+    with patch('premis_event_service.settings.PES_INGEST_SPOOL_PATH', path):
+        yield spool.get_spool()
+
+
+class TestIngestSpool:
+
+    def test_append_returns_pending_entry(self, ingest_spool):
+        spool_id = ingest_spool.append(b'<entry/>')
+        assert ingest_spool.get(spool_id)['status'] == spool.PENDING
+        assert ingest_spool.pending_count() == 1
+
+    def test_claim_returns_entries_once(self, ingest_spool):
+        ids = [ingest_spool.append(b'<entry/>') for _ in range(3)]
+        rows = ingest_spool.claim(2)
+        assert [r['id'] for r in rows] == ids[:2]
+        assert [r['id'] for r in ingest_spool.claim(2)] == ids[2:]
+        assert ingest_spool.claim(2) == []
+
+    def test_claim_retries_abandoned_entries(self, ingest_spool):
+        spool_id = ingest_spool.append(b'<entry/>')
+        ingest_spool.claim(1)
+        assert [r['id'] for r in ingest_spool.claim(1, claim_timeout=-1)] == [spool_id]
+
+    def test_complete_records_outcome(self, ingest_spool):
+        spool_id = ingest_spool.append(b'<entry/>')
+        ingest_spool.claim(1)
+        ingest_spool.complete([(spool_id, spool.CREATED, 'abc', None)])
+        row = ingest_spool.get(spool_id)
+        assert row['status'] == spool.CREATED
+        assert row['event_identifier'] == 'abc'
+        assert ingest_spool.pending_count() == 0
+
+    def test_prune_keeps_unfinished_entries(self, ingest_spool):
+        finished = ingest_spool.append(b'<entry/>')
+        pending = ingest_spool.append(b'<entry/>')
+        ingest_spool.claim(1)
+        ingest_spool.complete([(finished, spool.CREATED, 'abc', None)])
+        assert ingest_spool.prune(-1) == 1
+        assert ingest_spool.get(finished) is None
+        assert ingest_spool.get(pending) is not None
+
+
+@pytest.mark.django_db
+class TestAsyncIngest:
+
+    def post(self, rf, body):
+        request = rf.post(
+            '/', body, content_type='application/xml', HTTP_HOST='example.com')
+        with patch('premis_event_service.views.PES_ASYNC_INGEST', True):
+            return views.app_event(request)
+
+    def test_post_returns_accepted(self, ingest_spool, event_xml, rf):
+        response = self.post(rf, event_xml.entry_xml)
+        assert response.status_code == 202
+        assert response['Location'].endswith('/APP/event/spool/1/')
+        assert models.Event.objects.count() == 0
+
+    def test_post_without_event_returns_bad_request(self, ingest_spool, rf):
+        response = self.post(rf, '<entry xmlns="http://www.w3.org/2005/Atom"/>')
+        assert response.status_code == 400
+        assert ingest_spool.pending_count() == 0
+
+    def test_worker_saves_spooled_events(self, ingest_spool, event_xml, rf):
+        self.post(rf, event_xml.entry_xml)
+        self.post(rf, event_xml.entry_xml)
+        call_command('ingest_spooled_events', once=True, batch_size=10)
+
+        assert models.Event.objects.filter(
+            event_identifier=event_xml.identifier).exists()
+        assert ingest_spool.get(1)['status'] == spool.CREATED
+        assert ingest_spool.get(2)['status'] == spool.DUPLICATE
+
+    def poisoned(self, poison, error):
+        """Patch the worker's batch save to fail on entries for the event `poison`."""
+        save = ingest_spooled_events.premisEventXMLListToObjects
+
+        def premisEventXMLListToObjects(eventXMLList):
+            if any(poison in etree.tostring(x).decode() for x in eventXMLList):
+                raise error
+            return save(eventXMLList)
+        return patch.object(
+            ingest_spooled_events, 'premisEventXMLListToObjects', premisEventXMLListToObjects)
+
+    def test_worker_isolates_a_failing_entry(self, ingest_spool, rf):
+        entries = [conftest.EventTestXML() for _ in range(3)]
+        for entry in entries:
+            self.post(rf, entry.entry_xml)
+
+        with self.poisoned(entries[1].identifier, ValueError('poison')):
+            call_command('ingest_spooled_events', once=True, batch_size=10,
+                         stderr=StringIO())
+
+        assert [ingest_spool.get(n)['status'] for n in (1, 2, 3)] == [
+            spool.CREATED, spool.INVALID, spool.CREATED]
+        assert ingest_spool.get(2)['message'] == 'poison'
+        assert models.Event.objects.count() == 2
+
+    def test_worker_retries_after_a_transient_error(self, ingest_spool, event_xml, rf):
+        self.post(rf, event_xml.entry_xml)
+
+        with self.poisoned(event_xml.identifier, OperationalError('gone away')):
+            with pytest.raises(OperationalError):
+                call_command('ingest_spooled_events', once=True)
+
+        assert ingest_spool.get(1)['status'] == spool.PENDING
+
+    def test_status_view(self, ingest_spool, event_xml, rf, client):
+        self.post(rf, event_xml.entry_xml)
+        call_command('ingest_spooled_events', once=True)
+        response = client.get(reverse('app-event-spool', args=[1]))
+        data = json.loads(response.content.decode('utf-8'))
+        assert data['status'] == spool.CREATED
+        assert data['event'].endswith('/APP/event/{0}/'.format(event_xml.identifier))
+
+    def test_status_view_returns_not_found(self, ingest_spool, client):
+        response = client.get(reverse('app-event-spool', args=[1]))
+        assert response.status_code == 404
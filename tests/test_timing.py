@@ -0,0 +1,146 @@
+import json
+import logging
+
+import pytest
+
+from django.db import connection
+from django.http import HttpResponse
+from django.urls import reverse
+
+from premis_event_service import metrics, slow_queries, timing
+from premis_event_service.models import Event
+from . import factories
+
+
+TIMED_MIDDLEWARE = ['premis_event_service.timing.ServerTimingMiddleware']
+
+
+def server_timing(response):
+    """Server-Timing header -> dict of metric name to its parameters."""
+    metrics = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+def test_phase_does_nothing_outside_a_request():
+    with timing.phase('parse'):
+        pass
+
+    assert timing.timed('parse')(lambda: 1)() == 1
+
+
+def test_nested_phases_are_counted_once():
+    requestTiming = timing.RequestTiming()
+    token = timing._current.set(requestTiming)
+    try:
+        with timing.phase('serialize'):
+            with timing.phase('serialize'):
+                pass
+    finally:
+        timing._current.reset(token)
+
+    assert list(requestTiming.phases) == ['serialize']
+
+
+@pytest.mark.django_db
+def test_middleware_times_queries_and_phases(rf):
+    def view(request):
+        Event.objects.count()
+        with timing.phase('render'):
+            pass
+        return HttpResponse()
+
+    response = timing.ServerTimingMiddleware(view)(rf.get('/'))
+
+    metrics = server_timing(response)
+    assert metrics['db']['desc'] == '"1 queries"'
+    assert list(metrics) == ['db', 'render', 'total']
+    assert float(metrics['total']['dur']) >= float(metrics['render']['dur'])
+
+
+def test_middleware_logs_a_json_line(rf, caplog):
+    middleware = timing.ServerTimingMiddleware(lambda request: HttpResponse(status=204))
+
+    with caplog.at_level(logging.INFO, logger='premis_event_service.timing'):
+        middleware(rf.post('/APP/event/'))
+
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record['method'] == 'POST'
+    assert record['path'] == '/APP/event/'
+    assert record['status'] == 204
+    assert record['queries'] == 0
+    assert caplog.records[-1].timing == record
+
+
+@pytest.mark.django_db
+def test_middleware_share_one_query_wrapper(rf, monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, '_metrics', None)
+    monkeypatch.setattr('premis_event_service.settings.PES_METRICS_ENABLED', True)
+    monkeypatch.setattr('premis_event_service.settings.PES_SLOW_QUERY_PATH',
+                        str(tmp_path / 'slow.sqlite3'))
+    monkeypatch.setattr('premis_event_service.settings.PES_SLOW_QUERY_THRESHOLD', 0)
+    # The EXPLAIN of the slow query is not counted as one of the request's.
+    monkeypatch.setattr('premis_event_service.settings.PES_SLOW_QUERY_EXPLAIN_RATE', 1)
+    wrappers = []
+
+    def view(request):
+        wrappers.extend(connection.execute_wrappers)
+        Event.objects.count()
+        return HttpResponse()
+
+    middleware = timing.ServerTimingMiddleware(
+        metrics.MetricsMiddleware(slow_queries.SlowQueryMiddleware(view))
+    )
+    response = middleware(rf.get('/'))
+
+    assert len(wrappers) == 1
+    assert server_timing(response)['db']['desc'] == '"1 queries"'
+    assert metrics.get_metrics().samples()[('pes_db_queries_total', 'view="unmatched"')] == 1
+    recorded = slow_queries.get_slow_query_log().recent()
+    assert len(recorded) == 1
+    assert recorded[0]['plan']
+
+
+def test_header_can_be_turned_off(rf, monkeypatch):
+    monkeypatch.setattr('premis_event_service.settings.PES_SERVER_TIMING_HEADER', False)
+
+    response = timing.ServerTimingMiddleware(lambda request: HttpResponse())(rf.get('/'))
+
+    assert not response.has_header('Server-Timing')
+
+
+@pytest.fixture
+def timed_client(client, settings):
+    settings.MIDDLEWARE = TIMED_MIDDLEWARE
+    return client
+
+
+@pytest.mark.django_db
+class TestTimedViews:
+
+    def test_feed_times_serialization(self, timed_client):
+        factories.EventFactory.create_batch(3, linking_objects=True)
+
+        metrics = server_timing(timed_client.get(reverse('app-event')))
+
+        assert 'serialize' in metrics
+        assert 'render' not in metrics
+
+    def test_search_times_rendering(self, timed_client):
+        factories.EventFactory.create_batch(3, linking_objects=True)
+
+        metrics = server_timing(timed_client.get(reverse('event-search')))
+
+        assert 'render' in metrics
+        assert int(metrics['db']['desc'].split()[0].strip('"')) > 0
+
+    def test_ingest_times_parsing(self, timed_client, event_xml):
+        response = timed_client.post(
+            reverse('app-event'), event_xml.entry_xml,
+            content_type='application/xml', HTTP_HOST='example.com'
+        )
+
+        assert response.status_code == 201
+        assert 'parse' in server_timing(response)
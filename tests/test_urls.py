@@ -76,3 +76,25 @@ def test_premis_agentXML():
 def test_json_agent():
     url = resolve('/agent/agentId.json')
     assert url.func == views.json_agent
+
+
+def test_app_event_spool():
+    url = resolve('/APP/event/spool/1/')
+    assert url.func == views.app_event_spool
+
+
+def test_event_export_ndjson():
+    url = resolve('/event/export.ndjson')
+    assert url.func == views.event_export
+    assert url.kwargs == {'format': 'ndjson'}
+
+
+def test_event_export_xml():
+    url = resolve('/event/export.xml')
+    assert url.func == views.event_export
+    assert url.kwargs == {'format': 'xml'}
+
+
+def test_event_stats_json():
+    url = resolve('/event/stats.json')
+    assert url.func == views.json_event_stats
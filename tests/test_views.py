@@ -1,17 +1,19 @@
 import json
 import random
 
-from lxml import objectify
+from lxml import etree, objectify
 import pytest
 from urllib.parse import quote
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.http import Http404
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from premis_event_service import views, models
 from premis_event_service.settings import EVENT_TYPE_CHOICES, EVENT_OUTCOME_CHOICES
-from . import factories
+from . import conftest, factories
 
 
 pytestmark = [
@@ -178,6 +180,43 @@ def test_agentXML_returns_not_found_with_premis_identifier(rf):
     assert response.status_code == 404
 
 
+@pytest.mark.parametrize('view,path', [
+    (views.json_agent, '/agent/x.json'),
+    (views.agentXML, '/agent/x.xml'),
+    (views.agentXML, '/agent/x.premis.xml'),
+])
+def test_agent_conditional_get(rf, view, path):
+    agent = factories.AgentFactory.create()
+    response = view(rf.get(path), agent.agent_identifier)
+    etag = response['ETag']
+
+    response = view(rf.get(path, HTTP_IF_NONE_MATCH=etag), agent.agent_identifier)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+    assert response.content == b''
+
+    agent.agent_note = 'Changed.'
+    agent.save()
+    response = view(rf.get(path, HTTP_IF_NONE_MATCH=etag), agent.agent_identifier)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.parametrize('view,path', [
+    (views.json_agent, '/agent/x.json'),
+    (views.agentXML, '/agent/x.xml'),
+    (views.agentXML, '/agent/x.premis.xml'),
+    (views.humanAgent, '/agent/x/'),
+    (views.app_agent, '/APP/agent/x/'),
+])
+def test_agent_views_use_registry(rf, view, path, django_assert_num_queries):
+    agent = factories.AgentFactory.create()
+    models.Agent.objects.registry()
+    with django_assert_num_queries(0):
+        response = view(rf.get(path, HTTP_HOST='example.com'), agent.agent_identifier)
+    assert response.status_code == 200
+
+
 def test_eventXML(rf):
     request = rf.get('/')
     response = views.eventXML(request)
@@ -236,6 +275,50 @@ def test_findEvent_finds_multiple_events(rf):
     assert new_event.event_identifier not in response.content.decode('utf-8')
 
 
+@pytest.mark.parametrize('identifier', [
+    'ark:/67531/metapth12345', 'metapth12345', 'ARK:/67531/MetaPTH12345',
+])
+def test_findEvent_accepts_either_ark_form(rf, identifier):
+    event = factories.EventFactory.create()
+    event.linking_objects.add(
+        factories.LinkObjectFactory.create(object_identifier='ark:/67531/metapth12345'))
+    response = views.findEvent(rf.get('/'), identifier)
+    assert event.event_identifier in response.content.decode('utf-8')
+
+
+def test_findEvent_without_latest_events(rf):
+    event = factories.EventFactory.create(linking_objects=True)
+    models.LatestEvent.objects.all().delete()
+    response = views.findEvent(
+        rf.get('/'), event.linking_objects.first().object_identifier, event.event_type)
+    assert event.event_identifier in response.content.decode('utf-8')
+
+
+@pytest.mark.parametrize('latest_events', [True, False])
+def test_findEvent_matches_part_of_the_event_type(rf, latest_events):
+    event = factories.EventFactory.create(
+        linking_objects=True,
+        event_type='http://purl.org/net/untl/vocabularies/preservationEvents/#fixityCheck')
+    if not latest_events:
+        models.LatestEvent.objects.all().delete()
+    response = views.findEvent(
+        rf.get('/'), event.linking_objects.first().object_identifier, 'fixityCheck')
+    assert response.status_code == 200
+    assert event.event_identifier in response.content.decode('utf-8')
+
+
+def test_findEvent_query_count(rf, django_assert_num_queries, monkeypatch):
+    monkeypatch.setattr('premis_event_service.settings.PES_EVENT_CACHE', None)
+    event = factories.EventFactory.create(linking_objects=True, linking_objects__count=3)
+    linking_object = event.linking_objects.first()
+    for other in factories.EventFactory.create_batch(3):
+        other.linking_objects.add(linking_object)
+
+    # One query for the latest event and one for its linking objects.
+    with django_assert_num_queries(2):
+        views.findEvent(rf.get('/'), linking_object.object_identifier)
+
+
 class TestAppAgent:
     """Tests for views.app_agent."""
     CONTENT_TYPE = 'application/atom+xml'
@@ -295,6 +378,35 @@ class TestAppAgent:
         response = views.app_agent(request, 'fake-identifier')
         assert response.status_code == 404
 
+    def test_list_head_reads_neither_count_nor_page(self, rf, django_assert_num_queries):
+        factories.EventFactory.create_batch(3, linking_objects=True)
+        views.app_event(rf.get('/', HTTP_HOST='example.com'))
+
+        with django_assert_num_queries(1):
+            response = views.app_event(rf.head('/?page=2', HTTP_HOST='example.com'))
+
+        assert response.status_code == 200
+        assert response['ETag'].startswith('W/"')
+
+    def test_list_modified_by_updated_event(self, rf):
+        events = factories.EventFactory.create_batch(3)
+        etag = views.app_event(rf.get('/'))['ETag']
+        models.Event.objects.filter(pk=events[1].pk).update(
+            event_added=events[-1].event_added + timedelta(seconds=1))
+
+        assert views.app_event(rf.get('/'))['ETag'] != etag
+
+    def test_last_modified_is_utc(self, rf, settings):
+        settings.TIME_ZONE = 'America/Chicago'
+        event = factories.EventFactory.create()
+        models.Event.objects.filter(pk=event.pk).update(
+            event_added=datetime(2026, 1, 15, 21, 43, 38))
+
+        response = views.app_event(rf.get('/', HTTP_HOST='example.com'), event.event_identifier)
+
+        # 21:43:38 in Chicago is 03:43:38 the next day in UTC.
+        assert response['Last-Modified'] == 'Fri, 16 Jan 2026 03:43:38 GMT'
+
     def test_delete_returns_ok(self, rf):
         agent = factories.AgentFactory.create()
         request = rf.delete('/')
@@ -345,6 +457,88 @@ class TestAppAgent:
         assert updated_agent.agent_name in response.content.decode('utf-8')
         assert updated_agent.agent_type in response.content.decode('utf-8')
 
+    def feed_links(self, response):
+        xml = etree.fromstring(response.content)
+        return {
+            link.get('rel'): link.get('href')
+            for link in xml.findall('{http://www.w3.org/2005/Atom}link')
+        }
+
+    def follow_cursor(self, rf, rel, url='/?cursor='):
+        """Follow the feed's rel links from url; return the titles of each page."""
+        pages = []
+        while url:
+            response = views.app_event(rf.get(url, HTTP_HOST='example.com'))
+            assert response.status_code == 200
+            titles = [str(e.title) for e in getattr(
+                objectify.fromstring(response.content), 'entry', [])]
+            pages.append(titles)
+            url = self.feed_links(response).get(rel, '').replace('http://example.com', '')
+        return pages
+
+    def test_list_cursor_pages_newest_first(self, rf, monkeypatch):
+        monkeypatch.setattr(views, 'EVENT_SEARCH_PER_PAGE', 3)
+        events = factories.EventFactory.create_batch(7)
+        expected = [e.event_identifier for e in reversed(events)]
+
+        pages = self.follow_cursor(rf, 'next')
+
+        assert pages == [expected[0:3], expected[3:6], expected[6:]]
+
+    def test_list_cursor_previous_links(self, rf, monkeypatch):
+        monkeypatch.setattr(views, 'EVENT_SEARCH_PER_PAGE', 3)
+        factories.EventFactory.create_batch(7)
+        forward = self.follow_cursor(rf, 'next')
+        last_page = views.app_event(rf.get('/?cursor=', HTTP_HOST='example.com'))
+        for _ in range(2):
+            url = self.feed_links(last_page)['next'].replace('http://example.com', '')
+            last_page = views.app_event(rf.get(url, HTTP_HOST='example.com'))
+        url = self.feed_links(last_page)['previous'].replace('http://example.com', '')
+
+        backward = self.follow_cursor(rf, 'previous', url)
+
+        assert backward == forward[1::-1]
+
+    def test_list_cursor_orders_ties_by_ordinal(self, rf, monkeypatch):
+        monkeypatch.setattr(views, 'EVENT_SEARCH_PER_PAGE', 2)
+        events = factories.EventFactory.create_batch(3, event_type='b')
+        events += factories.EventFactory.create_batch(3, event_type='a')
+        expected = [e.event_identifier for e in sorted(
+            events, key=lambda e: (e.event_type, e.ordinal))]
+
+        pages = self.follow_cursor(rf, 'next', '/?cursor=&orderby=event_type')
+
+        assert sum(pages, []) == expected
+
+    def test_list_cursor_links(self, rf, monkeypatch):
+        monkeypatch.setattr(views, 'EVENT_SEARCH_PER_PAGE', 3)
+        factories.EventFactory.create_batch(4)
+        response = views.app_event(rf.get('/?cursor=', HTTP_HOST='example.com'))
+        links = self.feed_links(response)
+        assert sorted(links) == ['first', 'next', 'self']
+        assert links['first'] == 'http://example.com/?cursor='
+
+    def test_list_cursor_does_not_count(self, rf, monkeypatch, django_assert_num_queries):
+        monkeypatch.setattr(views, 'EVENT_SEARCH_PER_PAGE', 3)
+        monkeypatch.setattr('premis_event_service.settings.PES_EVENT_CACHE', None)
+        factories.EventFactory.create_batch(10, linking_objects=True)
+        response = views.app_event(rf.get('/?cursor=', HTTP_HOST='example.com'))
+        url = self.feed_links(response)['next'].replace('http://example.com', '')
+
+        # One query for the page of events and one for their linking objects.
+        with django_assert_num_queries(2):
+            views.app_event(rf.get(url, HTTP_HOST='example.com'))
+
+    @pytest.mark.parametrize('query', [
+        'cursor=garbage',
+        'cursor=&orderby=event_detail',
+        'cursor=%s&orderby=event_type' % views.encode_feed_cursor(
+            models.Event(ordinal=1, event_identifier='x'), 'event_identifier'),
+    ])
+    def test_list_cursor_bad_request(self, rf, query):
+        response = views.app_event(rf.get('/?' + query))
+        assert response.status_code == 400
+
     def test_get_with_identifier_returns_ok(self, rf):
         agent = factories.AgentFactory.create()
         request = rf.get('/')
@@ -473,6 +667,127 @@ class TestAppEvent:
         expected_response = "An event with id='{}' exists.".format(event_xml.identifier)
         assert expected_response in response.content.decode('utf-8')
 
+    def test_post_invalid_datetime_returns_bad_request(self, event_xml, rf):
+        event_xml.attributes['event_date_time'] = 'invalid-datetime'
+        request = rf.post(
+            '/',
+            event_xml.entry_xml,
+            content_type='application/xml',
+            HTTP_HOST='example.com')
+
+        response = views.app_event(request)
+        assert response.status_code == 400
+        assert models.Event.objects.count() == 0
+
+    def feed_xml(self, *entries):
+        """Wrap the entry XML of the given event fixtures in an Atom feed."""
+        entry_xml = ''.join(e.entry_xml.replace('<?xml version="1.0"?>', '')
+                            for e in entries)
+        return '<feed xmlns="http://www.w3.org/2005/Atom">{0}</feed>'.format(entry_xml)
+
+    def multistatus(self, response):
+        """Map each href in a multistatus response to its status line."""
+        xml = etree.fromstring(response.content)
+        return [
+            (r.findtext('{DAV:}href'), r.findtext('{DAV:}status'))
+            for r in xml.iterfind('{DAV:}response')
+        ]
+
+    def test_post_feed_returns_multi_status(self, rf):
+        entries = [conftest.EventTestXML() for _ in range(3)]
+        request = rf.post(
+            '/',
+            self.feed_xml(*entries),
+            content_type='application/xml',
+            HTTP_HOST='example.com')
+
+        response = views.app_event(request)
+        assert response.status_code == 207
+        statuses = self.multistatus(response)
+        assert len(statuses) == 3
+        for entry, (href, status) in zip(entries, statuses):
+            assert href == 'http://example.com/APP/event/{0}/'.format(entry.identifier)
+            assert status == 'HTTP/1.1 201 Created'
+
+    def test_post_feed_creates_events(self, rf):
+        entries = [conftest.EventTestXML() for _ in range(3)]
+        request = rf.post(
+            '/',
+            self.feed_xml(*entries),
+            content_type='application/xml',
+            HTTP_HOST='example.com')
+
+        views.app_event(request)
+        assert models.Event.objects.count() == 3
+        for entry in entries:
+            event = models.Event.objects.get(event_identifier=entry.identifier)
+            assert event.linking_objects.count() == 1
+
+    def test_post_feed_reports_duplicates_and_errors(self, rf):
+        existing, new, invalid = (conftest.EventTestXML() for _ in range(3))
+        factories.EventFactory.create(event_identifier=existing.identifier)
+        invalid.attributes['event_date_time'] = 'invalid-datetime'
+        request = rf.post(
+            '/',
+            self.feed_xml(existing, new, new, invalid),
+            content_type='application/xml',
+            HTTP_HOST='example.com')
+
+        response = views.app_event(request)
+        statuses = [status for _, status in self.multistatus(response)]
+        assert statuses == [
+            'HTTP/1.1 409 Conflict',
+            'HTTP/1.1 201 Created',
+            'HTTP/1.1 409 Conflict',
+            'HTTP/1.1 400 Bad Request',
+        ]
+        assert models.Event.objects.count() == 2
+
+    def test_post_feed_reports_rejected_entries(self, rf):
+        valid, rejected = conftest.EventTestXML(), conftest.EventTestXML()
+        rejected.attributes['event_type'] = ''
+        request = rf.post(
+            '/',
+            self.feed_xml(valid, rejected).replace(
+                '<premis:eventType></premis:eventType>', '<premis:eventType/>'),
+            content_type='application/xml',
+            HTTP_HOST='example.com')
+
+        response = views.app_event(request)
+        statuses = [status for _, status in self.multistatus(response)]
+        assert statuses == ['HTTP/1.1 201 Created', 'HTTP/1.1 400 Bad Request']
+        assert list(models.Event.objects.values_list('event_identifier', flat=True)) \
+            == [valid.identifier]
+
+    def test_post_feed_replaces_repeated_identifiers_that_are_not_uuids(self, rf):
+        entries = [conftest.EventTestXML() for _ in range(2)]
+        for entry in entries:
+            entry.attributes['event_identifier'] = 'foo'
+        request = rf.post(
+            '/',
+            self.feed_xml(*entries),
+            content_type='application/xml',
+            HTTP_HOST='example.com')
+
+        response = views.app_event(request)
+        statuses = [status for _, status in self.multistatus(response)]
+        assert statuses == ['HTTP/1.1 201 Created'] * 2
+        assert models.Event.objects.count() == 2
+
+    def test_post_feed_query_count(self, rf, django_assert_max_num_queries):
+        entries = [conftest.EventTestXML() for _ in range(20)]
+        request = rf.post(
+            '/',
+            self.feed_xml(*entries),
+            content_type='application/xml',
+            HTTP_HOST='example.com')
+
+        # Rolling up the new events, and recording the latest event for
+        # each object, each take a read and an insert inside a savepoint,
+        # however many events, days and objects there are.
+        with django_assert_max_num_queries(16):
+            views.app_event(request)
+
     def test_put_returns_ok(self, event_xml, rf):
         identifier = event_xml.identifier
         factories.EventFactory.create(event_identifier=identifier)
@@ -514,6 +829,20 @@ class TestAppEvent:
         xml = objectify.fromstring(response.content.decode('utf-8'))
         assert len(xml.entry) == self.RESULTS_PER_PAGE
 
+    @pytest.mark.parametrize('per_page', [5, 20])
+    def test_list_query_count_is_constant(self, rf, monkeypatch, per_page,
+                                          django_assert_num_queries):
+        monkeypatch.setattr(views, 'EVENT_SEARCH_PER_PAGE', per_page)
+        monkeypatch.setattr('premis_event_service.settings.PES_EVENT_CACHE', None)
+        factories.EventFactory.create_batch(
+            per_page, linking_objects=True, linking_objects__count=2)
+
+        # The feed's entity tag, the count, the page of events, and their
+        # linking objects.
+        with django_assert_num_queries(4):
+            response = views.app_event(rf.get('/', HTTP_HOST='example.com'))
+        assert len(objectify.fromstring(response.content).entry) == per_page
+
     @pytest.mark.xfail(reason='Global name DATE_FORMAT is not defined.')
     def test_list_filtering_by_start_date(self, rf):
         datetime_obj = datetime.now().replace(2015, 1, 1)
@@ -534,6 +863,15 @@ class TestAppEvent:
         response = views.app_event(request)
         assert self.response_has_event(response, event)
 
+    def test_list_filtering_by_bare_linking_object_id(self, rf):
+        factories.EventFactory.create_batch(3, linking_objects=True)
+        event = factories.EventFactory.create()
+        event.linking_objects.add(
+            factories.LinkObjectFactory.create(object_identifier='ark:/67531/metapth1'))
+
+        response = views.app_event(rf.get('/?link_object_id=metapth1'))
+        assert self.response_has_event(response, event)
+
     def test_list_filtering_by_linking_object_id(self, rf):
         factories.EventFactory.create_batch(30)
         event = factories.EventFactory.create(linking_objects=True)
@@ -624,6 +962,76 @@ class TestAppEvent:
         response = views.app_event(request, event.event_identifier)
         assert event.event_identifier in response.content.decode('utf-8')
 
+    def test_get_with_identifier_validators(self, rf):
+        event = factories.EventFactory.create()
+        request = rf.get('/', HTTP_HOST='example.com')
+        response = views.app_event(request, event.event_identifier)
+        assert response['ETag'].startswith('W/"')
+        assert 'Last-Modified' in response
+
+    @pytest.mark.parametrize('header', ['ETag', 'Last-Modified'])
+    def test_get_with_identifier_not_modified(self, rf, monkeypatch, header,
+                                              django_assert_num_queries):
+        monkeypatch.setattr('premis_event_service.settings.PES_EVENT_CACHE', None)
+        event = factories.EventFactory.create(linking_objects=True)
+        response = views.app_event(
+            rf.get('/', HTTP_HOST='example.com'), event.event_identifier)
+        conditional = {
+            'ETag': 'HTTP_IF_NONE_MATCH',
+            'Last-Modified': 'HTTP_IF_MODIFIED_SINCE',
+        }[header]
+        request = rf.get('/', HTTP_HOST='example.com', **{conditional: response[header]})
+
+        # Only the event is read; its linking objects are not.
+        with django_assert_num_queries(1):
+            response = views.app_event(request, event.event_identifier)
+
+        assert response.status_code == 304
+        assert response.content == b''
+
+    def test_get_with_identifier_modified_after_save(self, rf):
+        event = factories.EventFactory.create()
+        response = views.app_event(
+            rf.get('/', HTTP_HOST='example.com'), event.event_identifier)
+        etag = response['ETag']
+        event.event_detail = 'Changed.'
+        event.save()
+        request = rf.get('/', HTTP_HOST='example.com', HTTP_IF_NONE_MATCH=etag)
+
+        response = views.app_event(request, event.event_identifier)
+
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    @pytest.mark.parametrize('query', ['', 'cursor='])
+    def test_list_not_modified(self, rf, monkeypatch, query, django_assert_num_queries):
+        monkeypatch.setattr('premis_event_service.settings.PES_EVENT_CACHE', None)
+        factories.EventFactory.create_batch(3, linking_objects=True)
+        response = views.app_event(rf.get('/?' + query, HTTP_HOST='example.com'))
+        etag = response['ETag']
+        request = rf.get('/?' + query, HTTP_HOST='example.com', HTTP_IF_NONE_MATCH=etag)
+
+        # No query for the linking objects, nor for the count and page of
+        # the page-numbered feed.
+        with django_assert_num_queries(1):
+            response = views.app_event(request)
+
+        assert response.status_code == 304
+
+    @pytest.mark.parametrize('query', ['', 'cursor='])
+    def test_list_modified_by_new_and_deleted_events(self, rf, query):
+        events = factories.EventFactory.create_batch(3)
+        etags = [views.app_event(rf.get('/?' + query))['ETag']]
+        factories.EventFactory.create()
+        etags.append(views.app_event(rf.get('/?' + query))['ETag'])
+        events[0].delete()
+        etags.append(views.app_event(rf.get('/?' + query))['ETag'])
+
+        assert len(set(etags)) == 3
+
+        response = views.app_event(rf.get('/?' + query, HTTP_IF_NONE_MATCH=etags[0]))
+        assert response.status_code == 200
+
     def test_delete_returns_ok(self, rf):
         event = factories.EventFactory.create()
         request = rf.delete('/', HTTP_HOST='example.com')
@@ -743,6 +1151,14 @@ class TestEventSearch:
 
         assert self.response_has_event(response, event)
 
+    def test_capped_total(self, client, monkeypatch):
+        monkeypatch.setattr('premis_event_service.settings.PES_SEARCH_COUNT_CAP', 3)
+        factories.EventFactory.create_batch(5, event_outcome=EVENT_OUTCOME_CHOICES[1][0])
+        response = client.get(
+            reverse('event-search'), {'event_outcome': EVENT_OUTCOME_CHOICES[1][0]})
+        assert response.context['total_exact'] is False
+        assert b'More than 3 matching events.' in response.content
+
 
 class TestJsonEventSearch:
     """Tests for views.json_event_search."""
@@ -754,9 +1170,12 @@ class TestJsonEventSearch:
     REL_NEXT = 'next'
     REL_PREVIOUS = 'previous'
 
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
     def response_has_entry(self, response, event):
         """True if the event is the only Event in the response content."""
-        data = json.loads(response.content.decode('utf-8'))
+        data = json.loads(self.content(response).decode('utf-8'))
         entries = data['feed']['entry']
         filtered_entry = entries[0]
 
@@ -767,7 +1186,7 @@ class TestJsonEventSearch:
         return True
 
     def response_includes_event(self, response, event):
-        events = json.loads(response.content.decode('utf-8'))['feed']['entry']
+        events = json.loads(self.content(response).decode('utf-8'))['feed']['entry']
         event_ids = [e['identifier'] for e in events]
         return event.event_identifier in event_ids
 
@@ -787,7 +1206,7 @@ class TestJsonEventSearch:
         """
         request = rf.get('/')
         response = views.json_event_search(request)
-        data = json.loads(response.content.decode('utf-8'))
+        data = json.loads(self.content(response).decode('utf-8'))
         assert data.get('feed') is not None
         assert data.get('feed', {}).get('entry') is not None
         assert not len(data.get('feed', {}).get('entry'))
@@ -798,14 +1217,14 @@ class TestJsonEventSearch:
         factories.EventFactory.create_batch(per_page*4)
         request = rf.get('/')
         response = views.json_event_search(request)
-        data = json.loads(response.content.decode('utf-8'))
+        data = json.loads(self.content(response).decode('utf-8'))
         assert len(data['feed']['entry']) == per_page
 
     def test_opensearch_query(self, rf):
         factories.EventFactory.create_batch(10)
         request = rf.get('/fakefield=true')
         response = views.json_event_search(request)
-        data = json.loads(response.content.decode('utf-8'))
+        data = json.loads(self.content(response).decode('utf-8'))
 
         assert data['feed']['opensearch:Query'] == request.GET
 
@@ -813,7 +1232,7 @@ class TestJsonEventSearch:
         factories.EventFactory.create_batch(10)
         request = rf.get('/')
         response = views.json_event_search(request)
-        data = json.loads(response.content.decode('utf-8'))
+        data = json.loads(self.content(response).decode('utf-8'))
 
         assert data['feed']['opensearch:itemsPerPage'] == self.RESULTS_PER_PAGE
 
@@ -821,7 +1240,7 @@ class TestJsonEventSearch:
         factories.EventFactory.create_batch(10)
         request = rf.get('/')
         response = views.json_event_search(request)
-        data = json.loads(response.content.decode('utf-8'))
+        data = json.loads(self.content(response).decode('utf-8'))
 
         assert data['feed']['opensearch:startIndex'] == '1'
 
@@ -830,7 +1249,7 @@ class TestJsonEventSearch:
         factories.EventFactory.create_batch(num_events)
         request = rf.get('/')
         response = views.json_event_search(request)
-        data = json.loads(response.content.decode('utf-8'))
+        data = json.loads(self.content(response).decode('utf-8'))
 
         assert data['feed']['opensearch:totalResults'] == num_events
 
@@ -839,7 +1258,7 @@ class TestJsonEventSearch:
         factories.EventFactory.create_batch(num_events)
         request = rf.get('/?page=2')
         response = views.json_event_search(request)
-        data = json.loads(response.content.decode('utf-8'))
+        data = json.loads(self.content(response).decode('utf-8'))
 
         assert len(data['feed']['link']) == 5
 
@@ -906,3 +1325,184 @@ class TestJsonEventSearch:
         response = views.json_event_search(request)
 
         assert self.response_includes_event(response, event)
+
+    def test_linked_objects(self, rf):
+        event = factories.EventFactory.create(linking_objects=True, linking_objects__count=2)
+        factories.EventFactory.create()
+        response = views.json_event_search(rf.get('/'))
+        entries = json.loads(self.content(response))['feed']['entry']
+        linked = {e['identifier']: e['linked_objects'] for e in entries}
+
+        expected = sorted(event.linking_objects.values_list('object_identifier', flat=True))
+        assert sorted(linked[event.event_identifier].split(', ')) == expected
+        assert len([v for v in linked.values() if v == '']) == 1
+
+    def test_query_count_does_not_grow_with_page(self, rf):
+        factories.EventFactory.create_batch(2, linking_objects=True)
+        with CaptureQueriesContext(connection) as few:
+            self.content(views.json_event_search(rf.get('/')))
+        factories.EventFactory.create_batch(20, linking_objects=True)
+        with CaptureQueriesContext(connection) as many:
+            self.content(views.json_event_search(rf.get('/')))
+        assert len(many) == len(few)
+
+    def test_capped_total(self, rf, monkeypatch):
+        monkeypatch.setattr(views, 'EVENT_SEARCH_PER_PAGE', 2)
+        monkeypatch.setattr('premis_event_service.settings.PES_SEARCH_COUNT', 'capped')
+        monkeypatch.setattr('premis_event_service.settings.PES_SEARCH_COUNT_CAP', 3)
+        events = factories.EventFactory.create_batch(7, event_outcome=EVENT_OUTCOME_CHOICES[1][0])
+        outcome = EVENT_OUTCOME_CHOICES[1][0]
+        request = rf.get('/', {'event_outcome': outcome, 'page': 3}, HTTP_HOST='example.com')
+
+        feed = json.loads(self.content(views.json_event_search(request)))['feed']
+
+        assert feed['opensearch:totalResults'] == 3
+        assert feed['totalResultsExact'] is False
+        assert [e['identifier'] for e in feed['entry']] == [
+            e.event_identifier for e in events[2:0:-1]
+        ]
+        assert sorted(link['rel'] for link in feed['link']) == [
+            'first', 'next', 'previous', 'self'
+        ]
+
+    def test_capped_total_last_page(self, rf, monkeypatch):
+        monkeypatch.setattr(views, 'EVENT_SEARCH_PER_PAGE', 2)
+        monkeypatch.setattr('premis_event_service.settings.PES_SEARCH_COUNT', 'capped')
+        monkeypatch.setattr('premis_event_service.settings.PES_SEARCH_COUNT_CAP', 3)
+        factories.EventFactory.create_batch(7, event_outcome=EVENT_OUTCOME_CHOICES[1][0])
+        outcome = EVENT_OUTCOME_CHOICES[1][0]
+        request = rf.get('/', {'event_outcome': outcome, 'page': 4}, HTTP_HOST='example.com')
+
+        feed = json.loads(self.content(views.json_event_search(request)))['feed']
+
+        assert len(feed['entry']) == 1
+        assert 'next' not in [link['rel'] for link in feed['link']]
+
+    def test_unfiltered_second_page(self, rf, monkeypatch):
+        monkeypatch.setattr(views, 'EVENT_SEARCH_PER_PAGE', 3)
+        events = factories.EventFactory.create_batch(5)
+        response = views.json_event_search(rf.get('/?page=2'))
+        entries = json.loads(self.content(response))['feed']['entry']
+        assert [e['identifier'] for e in entries] == [
+            e.event_identifier for e in events[1::-1]
+        ]
+
+    def test_output_is_indented_sorted_json(self, rf):
+        factories.EventFactory.create_batch(3, linking_objects=True)
+        content = self.content(views.json_event_search(rf.get('/')))
+        data = json.loads(content)
+        assert content.decode('utf-8') == json.dumps(data, indent=4, sort_keys=True)
+
+
+class TestEventExport:
+    """Tests for views.event_export."""
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_ndjson_has_every_event_in_ordinal_order(self, rf, monkeypatch):
+        monkeypatch.setattr(views, 'EVENT_EXPORT_CHUNK_SIZE', 3)
+        events = factories.EventFactory.create_batch(7, linking_objects=True)
+        response = views.event_export(rf.get('/'), format='ndjson')
+        assert response['Content-Type'] == 'application/x-ndjson'
+
+        lines = self.content(response).decode('utf-8').splitlines()
+        records = [json.loads(line) for line in lines]
+        assert [r['event_identifier'] for r in records] == \
+            [e.event_identifier for e in events]
+        assert records[0]['linking_objects'] == [{
+            'object_identifier': o.object_identifier,
+            'object_type': o.object_type,
+            'object_role': o.object_role,
+        } for o in events[0].linking_objects.all()]
+
+    def test_after(self, rf):
+        events = factories.EventFactory.create_batch(4)
+        response = views.event_export(
+            rf.get('/?after=%d' % events[1].ordinal), format='ndjson')
+        records = [json.loads(line) for line in self.content(response).splitlines()]
+        assert [r['ordinal'] for r in records] == [e.ordinal for e in events[2:]]
+
+    def test_after_must_be_integer(self, rf):
+        response = views.event_export(rf.get('/?after=x'), format='ndjson')
+        assert response.status_code == 400
+
+    def test_xml(self, rf, monkeypatch):
+        monkeypatch.setattr(views, 'EVENT_EXPORT_CHUNK_SIZE', 2)
+        events = factories.EventFactory.create_batch(3, linking_objects=True)
+        response = views.event_export(rf.get('/'), format='xml')
+        assert response['Content-Type'] == 'application/xml'
+
+        root = etree.fromstring(self.content(response))
+        expected = [etree.tostring(views.objectToPremisEventXML(e)) for e in events]
+        assert [etree.tostring(e, with_tail=False) for e in root] == expected
+
+    def test_empty(self, rf):
+        response = views.event_export(rf.get('/'), format='xml')
+        assert len(etree.fromstring(self.content(response))) == 0
+        response = views.event_export(rf.get('/'), format='ndjson')
+        assert self.content(response) == b''
+
+    def test_queries_per_chunk(self, rf, monkeypatch, django_assert_num_queries):
+        monkeypatch.setattr(views, 'EVENT_EXPORT_CHUNK_SIZE', 5)
+        factories.EventFactory.create_batch(10, linking_objects=True)
+        response = views.event_export(rf.get('/'), format='ndjson')
+        # Two chunks of events and their linking objects, and the empty
+        # read that ends the export.
+        with django_assert_num_queries(5):
+            self.content(response)
+
+
+class TestJsonEventStats:
+    """Tests for views.json_event_stats."""
+
+    @pytest.fixture
+    def events(self):
+        factories.EventFactory.create_batch(
+            3, event_date_time=datetime(2020, 1, 6, 10), event_type='t', event_outcome='f')
+        factories.EventFactory.create_batch(
+            2, event_date_time=datetime(2020, 1, 20, 10), event_type='t', event_outcome='s')
+        factories.EventFactory.create(
+            event_date_time=datetime(2021, 3, 1, 10), event_type='u', event_outcome='s')
+
+    def stats(self, rf, query=''):
+        response = views.json_event_stats(rf.get('/' + query))
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/json'
+        return json.loads(response.content)
+
+    def test_per_day(self, rf, events):
+        stats = self.stats(rf)
+        assert stats['results'] == [
+            {'period': '2020-01-06', 'count': 3},
+            {'period': '2020-01-20', 'count': 2},
+            {'period': '2021-03-01', 'count': 1},
+        ]
+        assert stats['total'] == 6
+
+    def test_per_month_grouped(self, rf, events):
+        stats = self.stats(rf, '?bucket=month&group_by=event_outcome&group_by=event_type')
+        assert stats['group_by'] == ['event_type', 'event_outcome']
+        assert stats['results'] == [
+            {'period': '2020-01-01', 'event_type': 't', 'event_outcome': 'f', 'count': 3},
+            {'period': '2020-01-01', 'event_type': 't', 'event_outcome': 's', 'count': 2},
+            {'period': '2021-03-01', 'event_type': 'u', 'event_outcome': 's', 'count': 1},
+        ]
+
+    def test_filters(self, rf, events):
+        stats = self.stats(rf, '?event_outcome=s&start_date=2020-01-07&end_date=2020-12-31'
+                               '&bucket=year')
+        assert stats['results'] == [{'period': '2020-01-01', 'count': 2}]
+
+    def test_deleted_events_are_not_counted(self, rf, events):
+        models.Event.objects.filter(event_type='u').delete()
+        assert self.stats(rf, '?bucket=year')['results'] == [
+            {'period': '2020-01-01', 'count': 5}]
+
+    def test_invalid_parameters(self, rf):
+        response = views.json_event_stats(rf.get('/?bucket=fortnight'))
+        assert response.status_code == 400
+
+    def test_single_query(self, rf, events, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            views.json_event_stats(rf.get('/?bucket=week'))